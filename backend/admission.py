@@ -0,0 +1,187 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from fastapi.responses import ORJSONResponse
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))  # requests in progress, all classes
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+SERVICE_TIME_SMOOTHING = 0.2  # weight of the newest request in the moving average of service time
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, reason: str, retry_after: int = ADMISSION_RETRY_AFTER):
+        super().__init__(f"Request shed: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# A group of endpoints sharing a concurrency limit. Lower `priority` is served
+# first when slots free up; a request waits at most `max_wait` seconds for a slot.
+class PriorityClass:
+    def __init__(self, name: str, priority: int, limit: int, max_wait: float, queue_size: int):
+        self.name = name
+        self.priority = priority
+        self.limit = max(1, limit)
+        self.max_wait = max_wait
+        self.queue_size = max(0, queue_size)
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.service_time = 0.0  # moving average, seconds
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "expected_wait": 0, "timeout": 0}
+        self.max_queue_ms = 0.0
+
+    # Overridable per class, e.g. ADMISSION_OCR_LIMIT=8
+    @classmethod
+    def from_env(cls, name: str, priority: int, limit: int, max_wait: float, queue_size: int) -> "PriorityClass":
+        prefix = f"ADMISSION_{name.upper()}_"
+        return cls(name, priority, int(os.getenv(prefix + "LIMIT", str(limit))),
+                   float(os.getenv(prefix + "MAX_WAIT", str(max_wait))), int(os.getenv(prefix + "QUEUE", str(queue_size))))
+
+    # Little's law estimate of how long a new arrival would queue
+    def expected_wait(self) -> float:
+        return (len(self.waiters) + 1) * self.service_time / self.limit
+
+    def observe_service(self, seconds: float):
+        if self.service_time == 0.0:
+            self.service_time = seconds
+        else:
+            self.service_time += SERVICE_TIME_SMOOTHING * (seconds - self.service_time)
+
+    def info(self) -> Dict:
+        return {
+            "priority": self.priority,
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": len(self.waiters),
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "service_ms": round(self.service_time * 1000, 2),
+            "max_queue_ms": round(self.max_queue_ms, 2),
+        }
+
+
+# Concurrency limits per priority class under one overall limit. A request
+# is admitted at once when its class and the total have room; otherwise it
+# queues, unless the queue is full or the expected wait already exceeds the
+# class's max_wait, in which case it is shed immediately rather than after
+# timing out. Freed slots go to the highest-priority class with waiters.
+class AdmissionController:
+    def __init__(self, classes: List[PriorityClass], max_concurrency: int = ADMISSION_MAX_CONCURRENCY):
+        self.classes = {c.name: c for c in classes}
+        self.max_concurrency = max(1, max_concurrency)
+        self.active = 0
+        self._by_priority = sorted(classes, key=lambda c: c.priority)
+
+    def _has_room(self, cls: PriorityClass) -> bool:
+        return cls.active < cls.limit and self.active < self.max_concurrency
+
+    # Waiting requests of a more important class get freed slots first
+    def _blocked_by_priority(self, cls: PriorityClass) -> bool:
+        return any(other.waiters and other.active < other.limit
+                   for other in self._by_priority if other.priority < cls.priority)
+
+    def _admit(self, cls: PriorityClass):
+        cls.active += 1
+        cls.admitted += 1
+        self.active += 1
+
+    def _shed(self, cls: PriorityClass, reason: str) -> Overloaded:
+        cls.shed[reason] += 1
+        return Overloaded(reason, max(ADMISSION_RETRY_AFTER, round(cls.expected_wait())))
+
+    async def acquire(self, name: str):
+        cls = self.classes[name]
+        if not cls.waiters and self._has_room(cls) and not self._blocked_by_priority(cls):
+            self._admit(cls)
+            return
+        if len(cls.waiters) >= cls.queue_size:
+            raise self._shed(cls, "queue_full")
+        if cls.expected_wait() > cls.max_wait:
+            raise self._shed(cls, "expected_wait")
+
+        waiter = asyncio.get_running_loop().create_future()
+        cls.waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), cls.max_wait)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                cls.waiters.remove(waiter)
+                raise self._shed(cls, "timeout")
+        except asyncio.CancelledError:
+            # Client went away while queued; give back the slot if it was granted meanwhile
+            if waiter.done() and not waiter.cancelled():
+                self.release(name)
+            else:
+                waiter.cancel()
+                cls.waiters.remove(waiter)
+            raise
+        cls.max_queue_ms = max(cls.max_queue_ms, (time.perf_counter() - started) * 1000)
+
+    def release(self, name: str, service_seconds: Optional[float] = None):
+        cls = self.classes[name]
+        cls.active -= 1
+        self.active -= 1
+        if service_seconds is not None:
+            cls.observe_service(service_seconds)
+        self._dispatch()
+
+    def _dispatch(self):
+        for cls in self._by_priority:
+            while cls.waiters and self._has_room(cls):
+                waiter = cls.waiters.popleft()
+                if waiter.done():
+                    continue
+                self._admit(cls)
+                waiter.set_result(None)
+            if self.active >= self.max_concurrency:
+                return
+
+    def info(self) -> Dict:
+        return {"max_concurrency": self.max_concurrency, "active": self.active,
+                "classes": {name: cls.info() for name, cls in self.classes.items()}}
+
+
+# ASGI middleware putting the mapped routes under admission control. Shed
+# requests get a fast 503 with Retry-After; the slot is held until the
+# response (streamed ones included) has been sent.
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController, routes: List[Tuple[str, str]],
+                 enabled: bool = ADMISSION_ENABLED):
+        self.app = app
+        self.controller = controller
+        self.routes = routes  # (path or "prefix/*", class name)
+        self.enabled = enabled
+
+    def class_for(self, path: str) -> Optional[str]:
+        for pattern, name in self.routes:
+            if pattern.endswith("/*") and path.startswith(pattern[:-1]) or path == pattern:
+                return name
+        return None
+
+    async def __call__(self, scope, receive, send):
+        name = self.class_for(scope["path"]) if self.enabled and scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.controller.acquire(name)
+        except Overloaded as e:
+            response = ORJSONResponse({"detail": "Service is busy, please retry shortly", "reason": e.reason},
+                                    status_code=503, headers={"Retry-After": str(e.retry_after)})
+            await response(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name, time.perf_counter() - started)
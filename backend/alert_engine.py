@@ -1,31 +1,167 @@
-from typing import List, Dict
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Dict, Tuple
 from alert_types import HealthProfile, ProductAnalysis, Alert
+from ingredient_matcher import (
+    MATCHER, AhoCorasick, ALLERGY_KEYWORDS, NON_VEGETARIAN_INGREDIENTS, NON_VEGAN_INGREDIENTS, GLUTEN_INGREDIENTS
+)
 
-class AlertEngine:
-    
-    @staticmethod
-    def generate_alerts(health_profile: HealthProfile, product: ProductAnalysis) -> List[Alert]:
+RULE_CACHE_SIZE = int(os.getenv("ALERT_RULE_CACHE_SIZE", "1024"))
+
+# Condition-specific nutrient checks: (condition, product attribute, alert type, wording, high, medium, high note)
+NUTRIENT_RULES = (
+    ('diabetes', 'sugar', 'sugar', 'sugar content', 2.5, 1.5, 'Not recommended for diabetics'),
+    ('hypertension', 'salt', 'salt', 'salt content', 0.5, 0.3, 'Not recommended for hypertension'),
+    ('heart_disease', 'saturated_fat', 'fat', 'saturated fat', 1.0, 0.5, 'Not recommended for heart conditions'),
+)
+
+# Dietary preference checks: (label, triggering preferences, keywords, message)
+DIETARY_RULES = (
+    ('diet:non_vegetarian', ('vegetarian', 'vegan'), NON_VEGETARIAN_INGREDIENTS,
+     "🚨 Contains non-vegetarian ingredients - Not suitable for vegetarians"),
+    ('diet:non_vegan', ('vegan',), NON_VEGAN_INGREDIENTS,
+     "🚨 Contains animal products - Not suitable for vegans"),
+    ('diet:gluten', ('gluten_free',), GLUTEN_INGREDIENTS,
+     "🚨 Contains gluten - Not suitable for gluten-free diet"),
+)
+
+
+@dataclass(frozen=True)
+class NutrientRule:
+    attribute: str
+    alert_type: str
+    wording: str
+    high_threshold: float
+    medium_threshold: float
+    high_note: str
+
+
+# Immutable, hashable rule set compiled from a HealthProfile. Everything that
+# only depends on the profile (thresholds, allergen keywords, dietary exclusions)
+# is resolved once, so evaluating a product is a single pass over its ingredients.
+@dataclass(frozen=True)
+class CompiledRuleSet:
+    profile_hash: str
+    nutrient_rules: Tuple[NutrientRule, ...]
+    allergies: Tuple[str, ...]  # in profile order, one alert each
+    dietary_rules: Tuple[Tuple[str, str], ...]  # (label, message)
+    automaton: AhoCorasick = field(compare=False, hash=False, repr=False)
+
+    def evaluate(self, product: ProductAnalysis) -> List[Alert]:
         alerts = []
         
-        # Diabetes - Sugar alerts
-        if 'diabetes' in health_profile.conditions:
-            alerts.extend(AlertEngine.check_diabetes_alerts(product.sugar, health_profile))
+        for rule in self.nutrient_rules:
+            value = getattr(product, rule.attribute)
+            if value > rule.high_threshold:
+                alerts.append(Alert(
+                    level='high',
+                    message=f"🚨 High {rule.wording} ({value:.1f}g) - {rule.high_note}",
+                    alert_type=rule.alert_type
+                ))
+            elif value > rule.medium_threshold:
+                alerts.append(Alert(
+                    level='medium',
+                    message=f"⚠️ Moderate {rule.wording} ({value:.1f}g) - Consume with caution",
+                    alert_type=rule.alert_type
+                ))
         
-        # Hypertension - Salt alerts
-        if 'hypertension' in health_profile.conditions:
-            alerts.extend(AlertEngine.check_hypertension_alerts(product.salt, health_profile))
+        if not self.allergies and not self.dietary_rules:
+            return alerts
         
-        # Heart disease - Fat alerts
-        if 'heart_disease' in health_profile.conditions:
-            alerts.extend(AlertEngine.check_heart_disease_alerts(product.saturated_fat, health_profile))
+        # One pass over each ingredient for all allergen and dietary keywords
+        lowered = [ingredient.lower() for ingredient in product.ingredients]
+        found = set()
+        for ingredient in lowered:
+            for _, _, labels in self.automaton.iter_matches(ingredient):
+                found |= labels
         
-        # Allergy checks
-        alerts.extend(AlertEngine.check_allergy_alerts(health_profile.allergies, product.ingredients))
+        for allergy in self.allergies:
+            if allergy in ALLERGY_KEYWORDS:
+                detected = f'allergy:{allergy}' in found
+            else:
+                # Unmapped allergies keep the plain substring check (as typed, against lowercased ingredients)
+                detected = any(allergy in ingredient for ingredient in lowered)
+            if detected:
+                alerts.append(Alert(
+                    level='high',
+                    message=f"🚨 CONTAINS {allergy.upper()} - Potential allergen detected! Avoid this product.",
+                    alert_type='allergy'
+                ))
         
-        # Dietary preference checks
-        alerts.extend(AlertEngine.check_dietary_preference_alerts(health_profile.dietary_preferences, product.ingredients))
+        for label, message in self.dietary_rules:
+            if label in found:
+                alerts.append(Alert(level='high', message=message, alert_type='general'))
         
         return alerts
+
+
+def profile_hash(profile: HealthProfile) -> str:
+    return hashlib.sha256(profile.model_dump_json().encode('utf-8')).hexdigest()
+
+
+def _compile_rules(profile: HealthProfile, digest: str) -> CompiledRuleSet:
+    conditions = set(profile.conditions)
+    nutrient_rules = tuple(
+        NutrientRule(attribute, alert_type, wording, high, medium, note)
+        for condition, attribute, alert_type, wording, high, medium, note in NUTRIENT_RULES
+        if condition in conditions
+    )
+    
+    automaton = AhoCorasick()
+    for allergy in profile.allergies:
+        # Unmapped allergies are checked by substring in evaluate()
+        if allergy in ALLERGY_KEYWORDS:
+            automaton.add_all(ALLERGY_KEYWORDS[allergy], f'allergy:{allergy}')
+    
+    preferences = set(profile.dietary_preferences)
+    dietary_rules = []
+    for label, triggers, keywords, message in DIETARY_RULES:
+        if preferences.intersection(triggers):
+            automaton.add_all(keywords, label)
+            dietary_rules.append((label, message))
+    
+    return CompiledRuleSet(
+        profile_hash=digest,
+        nutrient_rules=nutrient_rules,
+        allergies=tuple(profile.allergies),
+        dietary_rules=tuple(dietary_rules),
+        automaton=automaton.build(),
+    )
+
+
+# Bounded LRU of compiled rule sets keyed by profile content hash
+_rule_cache: "OrderedDict[str, CompiledRuleSet]" = OrderedDict()
+_rule_cache_lock = threading.Lock()
+
+
+def compile_rules(profile: HealthProfile) -> CompiledRuleSet:
+    digest = profile_hash(profile)
+    with _rule_cache_lock:
+        rules = _rule_cache.get(digest)
+        if rules is not None:
+            _rule_cache.move_to_end(digest)
+            return rules
+    rules = _compile_rules(profile, digest)
+    with _rule_cache_lock:
+        _rule_cache[digest] = rules
+        while len(_rule_cache) > RULE_CACHE_SIZE:
+            _rule_cache.popitem(last=False)
+    return rules
+
+
+class AlertEngine:
+    
+    @staticmethod
+    def compile(health_profile: HealthProfile) -> CompiledRuleSet:
+        return compile_rules(health_profile)
+    
+    @staticmethod
+    def generate_alerts(health_profile: HealthProfile, product: ProductAnalysis) -> List[Alert]:
+        # Profile setup is compiled once per distinct profile and reused across products
+        return compile_rules(health_profile).evaluate(product)
     
     @staticmethod
     def check_diabetes_alerts(sugar: float, profile: HealthProfile) -> List[Alert]:
@@ -98,38 +234,36 @@ class AlertEngine:
     def check_allergy_alerts(allergies: List[str], ingredients: List[str]) -> List[Alert]:
         alerts = []
         
-        allergy_map = {
-            'nuts': ['nut', 'almond', 'walnut', 'peanut', 'cashew', 'pistachio', 'hazelnut'],
-            'dairy': ['milk', 'cheese', 'butter', 'yogurt', 'cream', 'whey', 'casein'],
-            'gluten': ['wheat', 'barley', 'rye', 'gluten', 'bread', 'pasta'],
-            'soy': ['soy', 'soya', 'tofu', 'soybean'],
-            'eggs': ['egg', 'albumin', 'mayonnaise']
-        }
+        # One scan per ingredient collects every allergen group at once
+        found = set()
+        for ingredient in ingredients:
+            found |= MATCHER.scan(ingredient).labels
         
         for allergy in allergies:
-            allergy_keywords = allergy_map.get(allergy, [allergy])
-            
-            for ingredient in ingredients:
-                ingredient_lower = ingredient.lower()
-                if any(keyword in ingredient_lower for keyword in allergy_keywords):
-                    alerts.append(Alert(
-                        level='high',
-                        message=f"🚨 CONTAINS {allergy.upper()} - Potential allergen detected! Avoid this product.",
-                        alert_type='allergy'
-                    ))
-                    break  # Only one alert per allergy type
+            if allergy in ALLERGY_KEYWORDS:
+                detected = f'allergy:{allergy}' in found
+            else:
+                # Unmapped allergies fall back to a plain substring check
+                detected = any(allergy in ingredient.lower() for ingredient in ingredients)
+            if detected:
+                alerts.append(Alert(
+                    level='high',
+                    message=f"🚨 CONTAINS {allergy.upper()} - Potential allergen detected! Avoid this product.",
+                    alert_type='allergy'
+                ))
         
         return alerts
     
     @staticmethod
     def check_dietary_preference_alerts(preferences: List[str], ingredients: List[str]) -> List[Alert]:
         alerts = []
-        ingredients_lower = [ingredient.lower() for ingredient in ingredients]
+        found = set()
+        for ingredient in ingredients:
+            found |= MATCHER.scan(ingredient).labels
         
         # Vegetarian/Vegan checks
         if 'vegetarian' in preferences or 'vegan' in preferences:
-            non_veg_ingredients = ['meat', 'chicken', 'fish', 'pork', 'beef', 'gelatin', 'rennet']
-            if any(any(item in ing for item in non_veg_ingredients) for ing in ingredients_lower):
+            if 'diet:non_vegetarian' in found:
                 alerts.append(Alert(
                     level='high',
                     message="🚨 Contains non-vegetarian ingredients - Not suitable for vegetarians",
@@ -138,8 +272,7 @@ class AlertEngine:
         
         # Vegan specific checks
         if 'vegan' in preferences:
-            non_vegan_ingredients = ['milk', 'cheese', 'butter', 'honey', 'egg', 'yogurt', 'whey']
-            if any(any(item in ing for item in non_vegan_ingredients) for ing in ingredients_lower):
+            if 'diet:non_vegan' in found:
                 alerts.append(Alert(
                     level='high',
                     message="🚨 Contains animal products - Not suitable for vegans",
@@ -148,12 +281,11 @@ class AlertEngine:
         
         # Gluten-free checks
         if 'gluten_free' in preferences:
-            gluten_ingredients = ['wheat', 'barley', 'rye', 'gluten']
-            if any(any(item in ing for item in gluten_ingredients) for ing in ingredients_lower):
+            if 'diet:gluten' in found:
                 alerts.append(Alert(
                     level='high',
                     message="🚨 Contains gluten - Not suitable for gluten-free diet",
                     alert_type='general'
                 ))
         
-        return alerts
\ No newline at end of file
+        return alerts
@@ -0,0 +1,107 @@
+import hashlib
+import os
+from typing import Any, Callable, Dict, Optional
+
+import orjson
+
+from cache import TieredCache
+
+ANALYSIS_STORE_SIZE = int(os.getenv("ANALYSIS_STORE_SIZE", "20000"))
+ANALYSIS_STORE_PATH = os.getenv("ANALYSIS_STORE_PATH", "cache/analyses.sqlite3")  # empty string disables the disk tier
+ANALYSIS_STORE_TTL = float(os.getenv("ANALYSIS_STORE_TTL", str(7 * 24 * 3600)))
+
+
+# Short digest over everything the product-only analysis depends on (rules
+# revision, keyword lists, lookup tables). Any change yields a new version.
+def rules_version(*parts: Any) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+# Product-only analyses, materialized once per (rules version, barcode, product
+# content) and stored already serialized as JSON. `build` turns a product into
+# that JSON; `inputs` picks the product fields it reads, so a product whose
+# relevant fields change upstream gets a fresh analysis. Entries from other
+# rules versions are never read and are purged from disk when the store opens.
+class AnalysisStore:
+    def __init__(
+        self,
+        build: Callable[[Dict], str],
+        version: str,
+        inputs: Callable[[Dict], Any],
+        max_entries: int = ANALYSIS_STORE_SIZE,
+        disk_path: Optional[str] = ANALYSIS_STORE_PATH,
+        ttl: float = ANALYSIS_STORE_TTL,
+        shared=None,
+    ):
+        self.build = build
+        self.version = version
+        self.inputs = inputs
+        self.max_entries = max_entries
+        self.disk_path = disk_path or None
+        self.ttl = ttl
+        self.shared = shared
+        self.materialized = 0
+        self.purged = 0
+        self._cache: Optional[TieredCache] = None
+
+    # Opened on first use, like the OCR result cache
+    @property
+    def cache(self) -> TieredCache:
+        if self._cache is None:
+            self._cache = TieredCache(self.max_entries, self.disk_path, table="analyses", shared=self.shared)
+            if self._cache.disk is not None:
+                purge = self._cache.queue_disk(self._cache.disk.delete_except_prefix, f"{self.version}:")
+                purge.add_done_callback(self._purge_done)
+        return self._cache
+
+    def _purge_done(self, future):
+        if future.exception() is None:
+            self.purged = future.result()
+
+    @property
+    def loaded(self) -> bool:
+        return self._cache is not None
+
+    @property
+    def stats(self):
+        return self.cache.stats
+
+    def key(self, barcode: str, product: Dict) -> str:
+        inputs = orjson.dumps(self.inputs(product), option=orjson.OPT_SORT_KEYS)
+        return f"{self.version}:{barcode}:{hashlib.blake2b(inputs, digest_size=8).hexdigest()}"
+
+    # The stored JSON for this product, building and storing it on a miss
+    async def get(self, barcode: str, product: Dict) -> str:
+        key = self.key(barcode, product)
+        entry = await self.cache.aget(key)
+        if entry is not None:
+            return entry.value
+        return self.put(key, product)
+
+    # Materialize ahead of demand without counting a lookup; True when it had to be built
+    async def warm(self, barcode: str, product: Dict) -> bool:
+        key = self.key(barcode, product)
+        if await self.cache.apeek(key) is not None:
+            return False
+        self.put(key, product)
+        return True
+
+    def put(self, key: str, product: Dict) -> str:
+        value = self.build(product)
+        self.cache.set(key, value, self.ttl)
+        self.materialized += 1
+        return value
+
+    def info(self) -> Dict:
+        if not self.loaded:
+            return {"loaded": False, "rules_version": self.version}
+        return {**self._cache.info(), "rules_version": self.version, "materialized": self.materialized,
+                "purged_old_versions": self.purged}
+
+    def close(self):
+        if self.loaded:
+            self._cache.close()
@@ -0,0 +1,104 @@
+# Microbenchmarks of the per-request analysis functions over a corpus of real
+# ingredient lists (benchmarks/ingredient_corpus.py):
+#
+#   parse_ingredients, generate_alerts, calculate_health_score   (/analyze-product)
+#   extract_ingredients, categorize_text                          (OCR post-processing)
+#   AlertEngine.generate_alerts                                   (health-profile alerts)
+#
+#   python benchmarks/bench_analysis.py
+#   python benchmarks/bench_analysis.py --corpus cache/off_index.sqlite3 --limit 20000
+#   python benchmarks/bench_analysis.py --output results/analysis.json
+#
+# Per-call percentiles come from timing each call; ops_per_sec from timing
+# whole passes, so it doesn't include the timer's own overhead.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the benchmark from touching the real caches
+for _name in ("PRODUCT_CACHE_PATH", "OCR_CACHE_PATH", "ANALYSIS_STORE_PATH", "POPULARITY_PATH", "OFF_LOCAL_INDEX_PATH"):
+    os.environ[_name] = ""
+
+import main as api  # noqa: E402
+from alert_engine import AlertEngine  # noqa: E402
+from alert_types import HealthProfile, ProductAnalysis as AlertProduct  # noqa: E402
+from benchmarks.ingredient_corpus import HEALTH_PROFILES, load_corpus, ocr_text_blocks, synthetic_products  # noqa: E402
+from benchmarks.results import latency_summary, write_results  # noqa: E402
+
+
+def bench(fn, cases, rounds: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        for case in cases:
+            fn(*case)
+
+    per_call_us = []
+    for _ in range(rounds):
+        for case in cases:
+            started = time.perf_counter_ns()
+            fn(*case)
+            per_call_us.append((time.perf_counter_ns() - started) / 1000)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for case in cases:
+            fn(*case)
+    elapsed = time.perf_counter() - started
+    return {**latency_summary(per_call_us, unit="us"), "ops_per_sec": round(len(cases) * rounds / elapsed, 1)}
+
+
+def build_cases(texts):
+    products = list(synthetic_products(len(texts), texts).values())
+    parsed = [api.parse_ingredients(p['ingredients_text']) for p in products]
+    alerts = [api.generate_alerts(p, ingredients) for p, ingredients in zip(products, parsed)]
+    blocks = [ocr_text_blocks(text, seed=i) for i, text in enumerate(texts)]
+    profiles = [HealthProfile(**profile) for profile in HEALTH_PROFILES]
+    alert_products = [
+        AlertProduct(sugar=p['nutriments']['sugars_100g'], salt=p['nutriments']['salt_100g'],
+                     saturated_fat=p['nutriments']['saturated-fat_100g'], additives=[],
+                     ingredients=[i.name for i in ingredients], nova_group=p['nova_group'])
+        for p, ingredients in zip(products, parsed)
+    ]
+    return {
+        "parse_ingredients": (api.parse_ingredients, [(p['ingredients_text'],) for p in products]),
+        "generate_alerts": (api.generate_alerts, list(zip(products, parsed))),
+        "calculate_health_score": (api.calculate_health_score, list(zip(products, parsed, alerts))),
+        "extract_ingredients": (api.extract_ingredients, [([text for text, _ in b],) for b in blocks]),
+        "categorize_text": (api.categorize_text, [(b,) for b in blocks]),
+        "alert_engine_generate_alerts": (AlertEngine.generate_alerts,
+                                         [(profiles[i % len(profiles)], product) for i, product in enumerate(alert_products)]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--corpus', help="Local index (.sqlite3) or JSON/JSONL of products or strings; default: built-in")
+    parser.add_argument('--limit', type=int, help="Use at most this many ingredient strings")
+    parser.add_argument('--rounds', type=int, default=20, help="Passes over the corpus per function")
+    parser.add_argument('--only', action='append', help="Benchmark only this function (repeatable)")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    texts = load_corpus(args.corpus)[:args.limit]
+    if not texts:
+        parser.error("corpus has no ingredient strings")
+    cases = build_cases(texts)
+
+    results = {}
+    for name, (fn, calls) in cases.items():
+        if args.only and name not in args.only:
+            continue
+        # Scale rounds down for large corpora so every function sees about the same number of calls
+        rounds = max(1, args.rounds * 30 // max(30, len(calls)))
+        results[name] = bench(fn, calls, rounds)
+        r = results[name]
+        print(f"{name:30s} p50 {r['p50_us']:9.2f} us   p95 {r['p95_us']:9.2f} us   p99 {r['p99_us']:9.2f} us   "
+              f"{r['ops_per_sec']:>12,.0f} ops/s")
+    if args.output:
+        write_results(args.output, "analysis", results, corpus={"source": args.corpus or "built-in", "strings": len(texts)})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+# Fault-injection run: the API against an Open Food Facts stub that goes down,
+# then hangs, then recovers (off_stub.py /_faults), checking that the circuit
+# breaker and admission control keep the service answering fast.
+#
+#   python benchmarks/bench_faults.py
+#   python benchmarks/bench_faults.py --phase-seconds 20 --concurrency 64 --output results/faults.json
+#   python benchmarks/bench_faults.py --ocr        # also an OCR burst next to barcode lookups
+#
+# Half of the products are fetched before the first phase ("cached"); the rest
+# are only ever asked for while upstream is failing ("uncached", a fresh slice
+# per phase). Expectations, checked at the end (exit code 1 if any fails):
+#   - during the outage phases cached lookups all answer 200 within --max-ms (p99)
+#   - uncached lookups are answered 503 within --max-ms (p50) once the breaker is open
+#   - after recovery the breaker closes and uncached lookups succeed again
+#   - with --ocr, barcode lookups keep their p99 during the burst and excess OCR
+#     requests get 503s instead of queueing
+# The API runs with short upstream timeouts and a short breaker reset (see
+# API_ENV) so a run takes about a minute; --api-env overrides any of them.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_load import _free_port, _start, _wait_ready, drive, ocr_payloads  # noqa: E402
+from benchmarks.ingredient_corpus import load_corpus, synthetic_products  # noqa: E402
+from benchmarks.results import write_results  # noqa: E402
+
+API_ENV = {
+    "PRODUCT_CACHE_PATH": "", "OCR_CACHE_PATH": "", "ANALYSIS_STORE_PATH": "", "POPULARITY_PATH": "",
+    "OFF_LOCAL_INDEX_PATH": "",
+    "OFF_READ_TIMEOUT": "1", "OFF_CONNECT_TIMEOUT": "1", "OFF_MAX_RETRIES": "1", "OFF_BACKOFF_MAX": "0.2",
+    "OFF_BREAKER_FAILURES": "3", "OFF_BREAKER_RESET": "3", "OFF_BREAKER_SLOW_CALL": "0.8",
+}
+
+PHASES = (
+    ("upstream_down", {"down": True, "hang_rate": 0}),
+    ("upstream_hanging", {"down": False, "hang_rate": 1, "hang_seconds": 30}),
+    ("recovered", {"down": False, "hang_rate": 0}),
+)
+
+
+def cycle(barcodes: List[str]):
+    state = {"i": 0}
+
+    def make_request() -> dict:
+        state["i"] += 1
+        return {"method": "POST", "url": "/analyze-product", "params": {"barcode": barcodes[state["i"] % len(barcodes)]}}
+    return make_request
+
+
+def ocr_request(payloads: List[bytes]):
+    state = {"i": 0}
+
+    def make_request() -> dict:
+        state["i"] += 1
+        return {"method": "POST", "url": "/analyze-image-base64", "content": payloads[state["i"] % len(payloads)],
+                "headers": {"Content-Type": "application/json"}}
+    return make_request
+
+
+async def run_phases(url: str, stub_url: str, cached: List[str], uncached: List[List[str]], payloads: List[bytes],
+                     args) -> Dict:
+    limits = httpx.Limits(max_connections=4 * args.concurrency, max_keepalive_connections=4 * args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client, \
+            httpx.AsyncClient(base_url=stub_url, timeout=5) as stub:
+        half = max(1, args.concurrency // 2)
+        for (name, faults), fresh in zip(PHASES, uncached):
+            await stub.post("/_faults", json=faults)
+            if name == "recovered":
+                # Let the open breaker reach its probe time before measuring
+                await asyncio.sleep(float(API_ENV["OFF_BREAKER_RESET"]) + 0.5)
+            cached_result, uncached_result = await asyncio.gather(
+                drive(client, cycle(cached), half, args.phase_seconds),
+                drive(client, cycle(fresh), half, args.phase_seconds),
+            )
+            stats = (await client.get("/cache-stats")).json()
+            results[name] = {"cached": cached_result, "uncached": uncached_result, "breaker": stats["off_breaker"]}
+            report(name, results[name])
+
+        if payloads:
+            barcode_result, ocr_result = await asyncio.gather(
+                drive(client, cycle(cached), half, args.phase_seconds),
+                drive(client, ocr_request(payloads), args.ocr_concurrency, args.phase_seconds),
+            )
+            stats = (await client.get("/cache-stats")).json()
+            results["ocr_burst"] = {"cached": barcode_result, "ocr": ocr_result, "admission": stats["admission"]}
+            report("ocr_burst", results["ocr_burst"])
+    return results
+
+
+def report(name: str, result: Dict):
+    for kind in ("cached", "uncached", "ocr"):
+        if kind in result:
+            r = result[kind]
+            print(f"{name:18s} {kind:9s} {r['rps']:8.1f} rps   p50 {r.get('p50_ms', 0):8.2f} ms   "
+                  f"p99 {r.get('p99_ms', 0):8.2f} ms   {r['status_codes']}")
+    if "breaker" in result:
+        print(f"{'':18s} breaker   {result['breaker']}")
+
+
+def check(results: Dict, max_ms: float) -> List[str]:
+    failures = []
+    for name in ("upstream_down", "upstream_hanging"):
+        cached, uncached = results[name]["cached"], results[name]["uncached"]
+        if cached["errors"]:
+            failures.append(f"{name}: {cached['errors']} cached lookups failed ({cached['status_codes']})")
+        if cached.get("p99_ms", 0) > max_ms:
+            failures.append(f"{name}: cached p99 {cached['p99_ms']} ms > {max_ms} ms")
+        if not uncached["status_codes"].get("503"):
+            failures.append(f"{name}: uncached lookups were never answered 503 ({uncached['status_codes']})")
+        if uncached.get("p50_ms", 0) > max_ms:
+            failures.append(f"{name}: uncached p50 {uncached['p50_ms']} ms > {max_ms} ms (breaker not short-circuiting)")
+    recovered = results["recovered"]
+    if recovered["breaker"]["state"] != "closed":
+        failures.append(f"recovered: breaker is {recovered['breaker']['state']}")
+    if not recovered["uncached"]["status_codes"].get("200"):
+        failures.append(f"recovered: no uncached lookup succeeded ({recovered['uncached']['status_codes']})")
+    if "ocr_burst" in results:
+        burst = results["ocr_burst"]
+        if burst["cached"].get("p99_ms", 0) > max_ms:
+            failures.append(f"ocr_burst: barcode p99 {burst['cached']['p99_ms']} ms > {max_ms} ms")
+        if not burst["ocr"]["status_codes"].get("503"):
+            failures.append("ocr_burst: no OCR request was shed; raise --ocr-concurrency")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concurrency', type=int, default=32, help="Concurrent barcode clients")
+    parser.add_argument('--phase-seconds', type=float, default=10.0, help="Seconds per phase")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument('--products', type=int, default=1000, help="Products served by the OFF stub")
+    parser.add_argument('--max-ms', type=float, default=250.0, help="Latency bound the checks apply")
+    parser.add_argument('--ocr', action='store_true', help="Add an OCR burst phase (needs Pillow and Tesseract)")
+    parser.add_argument('--ocr-concurrency', type=int, default=64, help="Concurrent OCR clients in the burst")
+    parser.add_argument('--api-env', action='append', default=[], metavar="KEY=VALUE", help="Extra env for the API")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    API_ENV.update(item.split("=", 1) for item in args.api_env)
+    products = synthetic_products(args.products, load_corpus(None))
+    barcodes = list(products)
+    cached = barcodes[:len(barcodes) // 2]
+    rest = barcodes[len(barcodes) // 2:]
+    uncached = [rest[i::len(PHASES)] for i in range(len(PHASES))]
+    payloads = ocr_payloads(8) if args.ocr else []
+
+    servers = []
+    try:
+        fixtures = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8")
+        with fixtures:
+            json.dump(products, fixtures)
+        stub_port, api_port = _free_port(), _free_port()
+        servers.append(_start("off_stub:app", stub_port, {"OFF_STUB_FIXTURES": fixtures.name}))
+        stub_url = f"http://127.0.0.1:{stub_port}"
+        _wait_ready(stub_url, "/_faults", lambda r: r.status_code == 200)
+        os.unlink(fixtures.name)
+
+        servers.append(_start("benchmarks.load_app:app", api_port, {
+            **API_ENV, "OFF_BASE_URL": stub_url, "OCR_ENABLED": "true" if payloads else "false"}))
+        url = f"http://127.0.0.1:{api_port}"
+        _wait_ready(url, "/readyz", lambda r: r.status_code == 200)
+        with httpx.Client(base_url=url, timeout=args.timeout) as client:
+            for start in range(0, len(cached), 100):
+                client.post("/analyze-products", json={"barcodes": cached[start:start + 100]})
+
+        results = asyncio.run(run_phases(url, stub_url, cached, uncached, payloads, args))
+    finally:
+        for server in reversed(servers):
+            server.terminate()
+            server.wait()
+
+    failures = check(results, args.max_ms)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("All fault-tolerance checks passed")
+    if args.output:
+        write_results(args.output, "faults", results, api_env=API_ENV, failures=failures)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
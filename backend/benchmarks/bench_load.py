@@ -0,0 +1,263 @@
+# Load test of the API against the local Open Food Facts stub (off_stub.py)
+# and the fake Supabase (benchmarks/load_app.py). Starts both servers, drives
+# each scenario with a fixed number of concurrent clients for a fixed time and
+# reports throughput, latency percentiles and the server's memory.
+#
+#   python benchmarks/bench_load.py
+#   python benchmarks/bench_load.py --concurrency 64 --duration 30 --output results/load.json
+#   python benchmarks/bench_load.py --scenario analyze_product --off-latency 0.08
+#   python benchmarks/bench_load.py --ocr --ocr-images 64          # also /analyze-image-base64
+#   python benchmarks/bench_load.py --api-env BATCH_CONCURRENCY=32 # any env var for the API
+#
+# Scenarios:
+#   analyze_product               POST /analyze-product, cycling through --products barcodes
+#   analyze_product_personalized  the same with a user_id, so profiles come from the fake Supabase
+#   analyze_products_batch        POST /analyze-products with --batch-size barcodes
+#   search_product                GET /search-product, keystroke prefixes of product names
+#   analyze_image_base64          (--ocr) synthetic label photos; needs Pillow and Tesseract
+#
+# Before the first scenario every stub product is fetched once, which fills the
+# product cache and the search index; the barcode scenarios then measure the
+# cached path, as on a busy instance. Profiles start cold and warm up during
+# --warmup. OCR results are cached by content, so the OCR scenario only
+# measures uncached OCR for as many requests as there are --ocr-images.
+# The load generator runs in this process; if it saturates a core the
+# reported rps is a lower bound, so compare runs made on the same machine.
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ingredient_corpus import load_corpus, synthetic_products  # noqa: E402
+from benchmarks.results import BACKEND, latency_summary, write_results  # noqa: E402
+
+SCENARIOS = ("analyze_product", "analyze_product_personalized", "analyze_products_batch", "search_product")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start(app: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+                            cwd=BACKEND, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _wait_ready(url: str, path: str, ready: Callable[[httpx.Response], bool], timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    with httpx.Client(base_url=url, timeout=1.0) as client:
+        while time.monotonic() < deadline:
+            try:
+                if ready(client.get(path)):
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
+    raise RuntimeError(f"{url}{path} not ready after {timeout:.0f}s")
+
+
+# Resident memory of the server and its children (OCR workers), in MB. Uses
+# psutil when installed, otherwise /proc (Linux, server process only).
+def process_memory(pid: int) -> Dict[str, float]:
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            processes = [process] + process.children(recursive=True)
+            return {"rss_mb": round(sum(p.memory_info().rss for p in processes) / 2 ** 20, 1)}
+        except psutil.Error:
+            return {}
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return {}
+    return {"rss_mb": round(int(fields["VmRSS"].split()[0]) / 1024, 1),
+            "peak_rss_mb": round(int(fields["VmHWM"].split()[0]) / 1024, 1)}
+
+
+class RequestFactory:
+    def __init__(self, products: Dict[str, Dict], users: int, batch_size: int, ocr_payloads: List[bytes], seed: int = 1):
+        self.rng = random.Random(seed)
+        self.barcodes = list(products)
+        self.names = [p["product_name"] for p in products.values()]
+        self.users = users
+        self.batch_size = batch_size
+        self.ocr_payloads = ocr_payloads
+        self.counter = 0
+
+    def _next(self) -> int:
+        self.counter += 1
+        return self.counter
+
+    def analyze_product(self) -> dict:
+        return {"method": "POST", "url": "/analyze-product",
+                "params": {"barcode": self.barcodes[self._next() % len(self.barcodes)]}}
+
+    def analyze_product_personalized(self) -> dict:
+        request = self.analyze_product()
+        request["params"]["user_id"] = f"user-{self.rng.randrange(self.users)}"
+        return request
+
+    def analyze_products_batch(self) -> dict:
+        start = self._next() * self.batch_size
+        barcodes = [self.barcodes[(start + i) % len(self.barcodes)] for i in range(self.batch_size)]
+        return {"method": "POST", "url": "/analyze-products",
+                "json": {"barcodes": barcodes, "user_id": f"user-{self.rng.randrange(self.users)}"}}
+
+    def search_product(self) -> dict:
+        name = self.names[self._next() % len(self.names)]
+        return {"method": "GET", "url": f"/search-product/{name[:self.rng.randint(2, len(name))]}"}
+
+    def analyze_image_base64(self) -> dict:
+        payload = self.ocr_payloads[self._next() % len(self.ocr_payloads)]
+        return {"method": "POST", "url": "/analyze-image-base64", "content": payload,
+                "headers": {"Content-Type": "application/json"}}
+
+
+async def drive(client: httpx.AsyncClient, make_request: Callable[[], dict], concurrency: int, duration: float) -> dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            request = make_request()
+            started = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    requests = sum(statuses.values())
+    errors = requests - statuses.get("200", 0)
+    return {"requests": requests, "errors": errors, "rps": round(requests / elapsed, 1),
+            "status_codes": dict(statuses), **latency_summary(latencies, digits=2)}
+
+
+async def run_scenarios(url: str, factory: RequestFactory, scenarios: List[str], args, server_pid: Optional[int]) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+        for name in scenarios:
+            make_request = getattr(factory, name)
+            if args.warmup:
+                await drive(client, make_request, args.concurrency, args.warmup)
+            result = await drive(client, make_request, args.concurrency, args.duration)
+            if server_pid:
+                result.update(process_memory(server_pid))
+            results[name] = result
+            print(f"{name:30s} {result['rps']:9.1f} rps   p50 {result.get('p50_ms', 0):8.2f} ms   "
+                  f"p95 {result.get('p95_ms', 0):8.2f} ms   p99 {result.get('p99_ms', 0):8.2f} ms   "
+                  f"errors {result['errors']:5d}   rss {result.get('rss_mb', '-')} MB")
+    return results
+
+
+def ocr_payloads(count: int) -> List[bytes]:
+    from benchmarks.label_fixtures import render_label
+
+    payloads = []
+    for seed in range(count):
+        image, _ = render_label(seed, canvas=(1512, 2016))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        payloads.append(json.dumps({"image": base64.b64encode(buffer.getvalue()).decode("ascii")}).encode("ascii"))
+    return payloads
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS + ("analyze_image_base64",),
+                        help="Run only this scenario (repeatable)")
+    parser.add_argument('--concurrency', type=int, default=32, help="Concurrent clients")
+    parser.add_argument('--duration', type=float, default=15.0, help="Seconds measured per scenario")
+    parser.add_argument('--warmup', type=float, default=3.0, help="Unmeasured seconds before each scenario")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument('--products', type=int, default=2000, help="Products served by the OFF stub")
+    parser.add_argument('--corpus', help="Ingredient corpus for the products (see bench_analysis.py)")
+    parser.add_argument('--users', type=int, default=1000, help="Users in the fake Supabase")
+    parser.add_argument('--batch-size', type=int, default=20, help="Barcodes per /analyze-products call")
+    parser.add_argument('--off-latency', type=float, default=0.03, help="Simulated OFF round-trip in seconds")
+    parser.add_argument('--supabase-latency', type=float, default=0.005, help="Simulated Supabase round-trip in seconds")
+    parser.add_argument('--ocr', action='store_true', help="Also load /analyze-image-base64")
+    parser.add_argument('--ocr-images', type=int, default=16, help="Distinct label photos for the OCR scenario")
+    parser.add_argument('--api-env', action='append', default=[], metavar="KEY=VALUE", help="Extra env for the API")
+    parser.add_argument('--url', help="Load an already running API instead of starting one (no memory figures)")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    scenarios = list(args.scenario or SCENARIOS + (("analyze_image_base64",) if args.ocr else ()))
+    products = synthetic_products(args.products, load_corpus(args.corpus))
+    payloads = ocr_payloads(args.ocr_images) if "analyze_image_base64" in scenarios else []
+    factory = RequestFactory(products, args.users, args.batch_size, payloads)
+
+    servers = []
+    try:
+        if args.url:
+            url, server_pid = args.url, None
+        else:
+            fixtures = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8")
+            with fixtures:
+                json.dump(products, fixtures)
+            stub_port, api_port = _free_port(), _free_port()
+            servers.append(_start("off_stub:app", stub_port, {"OFF_STUB_FIXTURES": fixtures.name,
+                                                              "OFF_STUB_LATENCY": str(args.off_latency)}))
+            _wait_ready(f"http://127.0.0.1:{stub_port}", "/api/v0/product/0.json", lambda r: r.status_code == 200)
+            os.unlink(fixtures.name)
+
+            api_env = {
+                # Memory-only caches, so every run starts cold and never touches cache/
+                "PRODUCT_CACHE_PATH": "", "OCR_CACHE_PATH": "", "ANALYSIS_STORE_PATH": "", "POPULARITY_PATH": "",
+                "OFF_LOCAL_INDEX_PATH": "",
+                "OFF_BASE_URL": f"http://127.0.0.1:{stub_port}",
+                "LOAD_PROFILE_USERS": str(args.users), "LOAD_SUPABASE_LATENCY": str(args.supabase_latency),
+                "OCR_ENABLED": "true" if payloads else "false",
+            }
+            api_env.update(item.split("=", 1) for item in args.api_env)
+            servers.append(_start("benchmarks.load_app:app", api_port, api_env))
+            url, server_pid = f"http://127.0.0.1:{api_port}", servers[-1].pid
+            _wait_ready(url, "/readyz", lambda r: r.status_code == 200 and r.json()["checks"]["search_index"] == "ready")
+            # Search is served from the local index, which fills as products are fetched
+            with httpx.Client(base_url=url, timeout=args.timeout) as client:
+                for start in range(0, len(factory.barcodes), 100):
+                    client.post("/analyze-products", json={"barcodes": factory.barcodes[start:start + 100]})
+
+        idle_memory = process_memory(server_pid) if server_pid else {}
+        results = asyncio.run(run_scenarios(url, factory, scenarios, args, server_pid))
+    finally:
+        for server in reversed(servers):
+            server.terminate()
+            server.wait()
+
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key not in ("output", "scenario")}
+        write_results(args.output, "load", results, config=config, idle_memory=idle_memory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# Compare the OCR engines (ocr_engine.py): a tesseract subprocess per image
+# (pytesseract) against a warm in-process Tesseract handle (tesserocr).
+#
+#   python benchmarks/bench_ocr_engine.py                      # synthetic labels, both engines
+#   python benchmarks/bench_ocr_engine.py --fixtures photos/ --workers 4
+#   python benchmarks/bench_ocr_engine.py --engine pytesseract --output results/ocr_engine.json
+#
+# Per-image latency is measured in this process, one image at a time, after a
+# warm-up image (`cold_ms` is that first image, including the engine load).
+# Throughput runs every image through an OCRPool with --workers processes, as
+# the API does, after each worker has taken one warm-up job. Word recall shows
+# both engines read the same text. Requires the tesseract binary; tesserocr is
+# skipped when it isn't installed.
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_preprocess import word_recall  # noqa: E402
+from benchmarks.label_fixtures import generate  # noqa: E402
+from benchmarks.results import latency_summary, write_results  # noqa: E402
+from ocr_pool import OCRPool, ocr_image_bytes  # noqa: E402
+
+ENGINES = ("pytesseract", "tesserocr")
+
+
+def load_fixtures(fixtures: str):
+    with open(os.path.join(fixtures, 'expected.json'), encoding='utf-8') as f:
+        expected = json.load(f)
+    images = []
+    for filename, text in expected.items():
+        with open(os.path.join(fixtures, filename), 'rb') as f:
+            images.append((f.read(), text))
+    return images
+
+
+def per_image(engine: str, images, options, repeat: int) -> dict:
+    started = time.perf_counter()
+    ocr_image_bytes(images[0][0], options, engine)
+    cold_ms = (time.perf_counter() - started) * 1000
+
+    totals, ocr_stage, recalls = [], [], []
+    for image_bytes, text in images:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            blocks, timings = ocr_image_bytes(image_bytes, options, engine)
+            totals.append((time.perf_counter() - started) * 1000)
+            ocr_stage.append(timings['ocr'])
+        recalls.append(word_recall(text, " ".join(block[0] for block in blocks)))
+    return {
+        "cold_ms": round(cold_ms, 1),
+        "total": latency_summary(totals, digits=1),
+        "ocr_stage": latency_summary(ocr_stage, digits=1),
+        "word_recall": round(statistics.mean(recalls), 4),
+    }
+
+
+async def throughput(engine: str, images, options, repeat: int, workers: int) -> dict:
+    jobs = [image_bytes for image_bytes, _ in images] * repeat
+    pool = OCRPool(workers=workers, queue_size=len(jobs), engine=engine)
+    try:
+        await asyncio.gather(*(pool.run(images[i % len(images)][0], options) for i in range(workers)))
+        started = time.perf_counter()
+        await asyncio.gather(*(pool.run(image_bytes, options) for image_bytes in jobs))
+        elapsed = time.perf_counter() - started
+    finally:
+        pool.shutdown()
+    return {"workers": workers, "images": len(jobs), "seconds": round(elapsed, 2),
+            "images_per_sec": round(len(jobs) / elapsed, 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--engine', action='append', choices=ENGINES, help="Engine to run (repeatable; default: both)")
+    parser.add_argument('--fixtures', help="Directory of images plus expected.json (default: generate synthetic labels)")
+    parser.add_argument('--count', type=int, default=8, help="Synthetic labels to generate")
+    parser.add_argument('--repeat', type=int, default=3, help="OCR runs per image")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Pool size for the throughput run")
+    parser.add_argument('--raw', action='store_true', help="OCR the whole image without preprocessing")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    fixtures = args.fixtures
+    if not fixtures:
+        fixtures = tempfile.mkdtemp(prefix='label-fixtures-')
+        generate(fixtures, args.count)
+    images = load_fixtures(fixtures)
+    options = None if args.raw else {"enabled": True}
+
+    results = {}
+    for engine in args.engine or ENGINES:
+        if importlib.util.find_spec(engine) is None:
+            print(f"{engine:12s} not installed, skipped")
+            continue
+        result = per_image(engine, images, options, args.repeat)
+        result["throughput"] = asyncio.run(throughput(engine, images, options, args.repeat, args.workers))
+        results[engine] = result
+        print(f"{engine:12s} cold {result['cold_ms']:8.1f} ms   p50 {result['total']['p50_ms']:8.1f} ms   "
+              f"ocr p50 {result['ocr_stage']['p50_ms']:8.1f} ms   "
+              f"{result['throughput']['images_per_sec']:7.2f} images/s ({args.workers} workers)   "
+              f"word recall {result['word_recall']:.3f}")
+    if args.output:
+        write_results(args.output, "ocr_engine", results, fixtures=fixtures, preprocess=not args.raw)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Admission check for the OCR process pool: jobs that outlive OCR_JOB_TIMEOUT
+# must keep holding their slot until the worker is actually done with them,
+# otherwise hung jobs let the pool take on unbounded work.
+#
+#   python benchmarks/bench_ocr_pool.py
+#   python benchmarks/bench_ocr_pool.py --workers 2 --queue-size 2 --sleep 2
+#
+# Fills the pool with jobs that sleep past the timeout, waits for every caller
+# to time out, and checks that (exit code 1 if any fails):
+#   - each caller got a timeout
+#   - the jobs already on a worker still hold their slots (at least one per worker)
+#   - a burst of new jobs is admitted only into the free slots; the rest get OCRQueueFull
+#   - once the slow jobs finish, every slot is released and a new job succeeds
+# The jobs only sleep, so no OCR engine or tesseract binary is needed.
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_pool import OCRPool, OCRQueueFull  # noqa: E402
+
+
+# Workers without the OCR engine initializer
+class SleepPool(OCRPool):
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context(self.start_method))
+        return self._executor
+
+
+async def run_check(workers: int, queue_size: int, timeout: float, sleep: float) -> List[str]:
+    failures = []
+    pool = SleepPool(workers=workers, queue_size=queue_size, job_timeout=timeout)
+    try:
+        await pool.call(time.sleep, 0)  # start the workers before timing anything
+
+        results = await asyncio.gather(*(pool.call(time.sleep, sleep) for _ in range(pool.capacity)),
+                                       return_exceptions=True)
+        timeouts = sum(isinstance(result, asyncio.TimeoutError) for result in results)
+        print(f"slow jobs: {len(results)}, timed out: {timeouts}, pending after timeouts: {pool.info()['pending']}")
+        if timeouts != pool.capacity:
+            failures.append(f"expected {pool.capacity} timeouts, got {timeouts}")
+
+        held = pool.info()['pending']
+        if held < pool.workers:
+            failures.append(f"only {held} slots held while {pool.workers} workers still run timed-out jobs")
+
+        burst = await asyncio.gather(*(pool.call(time.sleep, 0) for _ in range(pool.capacity)), return_exceptions=True)
+        rejected = sum(isinstance(result, OCRQueueFull) for result in burst)
+        print(f"burst of {len(burst)} new jobs while the slow jobs run: {rejected} rejected")
+        if rejected != held:
+            failures.append(f"expected {held} of the burst to be rejected, got {rejected}")
+
+        # Jobs waiting in the queue were cancelled by the timeout; the running ones finish after `sleep`
+        deadline = time.monotonic() + sleep + 5
+        while pool.info()['pending'] and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        pending = pool.info()['pending']
+        print(f"pending once the slow jobs finished: {pending}")
+        if pending:
+            failures.append(f"{pending} slots still held after the slow jobs finished")
+
+        try:
+            await pool.call(time.sleep, 0)
+            print("new job after they finished: ok")
+        except Exception as e:
+            failures.append(f"a new job failed after the slow jobs finished: {type(e).__name__}: {e}")
+    finally:
+        pool.shutdown()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=0.3, help="job_timeout of the pool under test")
+    parser.add_argument("--sleep", type=float, default=1.5, help="seconds each slow job runs")
+    args = parser.parse_args(argv)
+
+    failures = asyncio.run(run_check(args.workers, args.queue_size, args.timeout, args.sleep))
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
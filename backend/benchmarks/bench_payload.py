@@ -0,0 +1,103 @@
+# Bytes on the wire and serialization time for /search-product responses:
+# the previous shape (10 full Open Food Facts products through FastAPI's default
+# jsonable_encoder + json.dumps) versus projected fields rendered with orjson,
+# each uncompressed, gzipped and brotli-compressed.
+#
+#   python benchmarks/bench_payload.py
+#   python benchmarks/bench_payload.py --products 24 --output results/payload.json
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+from compression import RESPONSE_BROTLI_QUALITY, RESPONSE_GZIP_LEVEL, brotli  # noqa: E402
+from search_index import project_fields  # noqa: E402
+
+LANGUAGES = ["en", "fr", "de", "es", "it", "nl", "pt", "pl", "sv", "da", "fi", "cs", "hu", "ro", "el", "bg", "hr",
+             "sk", "sl", "lt", "lv", "et", "ja", "zh", "ko", "ar", "he", "tr", "ru", "uk"]
+
+
+# Shaped like an OFF API v0 product: translations, image sets, every nutriment, tag lists
+def full_product(rng: random.Random, i: int) -> dict:
+    code = str(3000000000000 + i)
+    product = {"code": code, "product_name": f"Product {i}", "brands": "Brand", "quantity": "400 g",
+               "nutriscore_grade": rng.choice("abcde"), "nova_group": rng.randint(1, 4),
+               "image_url": f"https://images.openfoodfacts.org/images/products/{code}/front_en.3.400.jpg"}
+    for lang in LANGUAGES:
+        product[f"product_name_{lang}"] = f"Product {i} ({lang})"
+        product[f"ingredients_text_{lang}"] = ", ".join(rng.choice(["sugar", "palm oil", "hazelnuts", "cocoa", "milk",
+                                                                     "soy lecithin", "vanillin", "salt"]) for _ in range(30))
+        product[f"generic_name_{lang}"] = "Spread"
+    product["images"] = {
+        f"{kind}_{lang}": {"imgid": str(n), "rev": str(n), "sizes": {str(size): {"w": size * 3, "h": size * 4} for size in (100, 200, 400, 1000)},
+                           "geometry": "0x0-0-0", "normalize": None, "white_magic": None}
+        for n, (kind, lang) in enumerate((k, l) for k in ("front", "ingredients", "nutrition", "packaging") for l in LANGUAGES)
+    }
+    product["nutriments"] = {f"{name}{suffix}": round(rng.random() * 50, 3)
+                             for name in ("energy", "fat", "saturated-fat", "carbohydrates", "sugars", "fiber", "proteins",
+                                          "salt", "sodium", "calcium", "iron", "vitamin-a", "vitamin-c", "vitamin-d",
+                                          "potassium", "magnesium", "zinc", "cholesterol", "trans-fat", "polyols")
+                             for suffix in ("", "_100g", "_serving", "_value", "_unit", "_prepared_100g")}
+    for tag in ("categories", "labels", "countries", "ingredients", "additives", "allergens", "traces", "stores", "origins"):
+        product[f"{tag}_tags"] = [f"en:{tag}-{n}" for n in range(rng.randint(10, 60))]
+    return product
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, round(statistics.median(samples), 3)
+
+
+def measure(render, repeat: int) -> dict:
+    body, serialize_ms = timed(render, repeat)
+    result = {"bytes": len(body), "serialize_ms": serialize_ms}
+    gzipped, result["gzip_ms"] = timed(lambda: gzip.compress(body, RESPONSE_GZIP_LEVEL), repeat)
+    result["gzip_bytes"] = len(gzipped)
+    if brotli is not None:
+        compressed, result["brotli_ms"] = timed(lambda: brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY), repeat)
+        result["brotli_bytes"] = len(compressed)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=10, help="Products per response")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(1)
+    products = [full_product(rng, i) for i in range(args.products)]
+    results = {
+        "before": measure(lambda: JSONResponse(jsonable_encoder(products)).body, args.repeat),
+        "after": measure(lambda: ORJSONResponse([project_fields(p) for p in products]).body, args.repeat),
+        "after_orjson_full": measure(lambda: orjson.dumps(products), args.repeat),
+    }
+    for name, result in results.items():
+        line = (f"{name:18s} {result['bytes']:>10,d} B  serialize {result['serialize_ms']:8.3f} ms   "
+                f"gzip {result['gzip_bytes']:>9,d} B")
+        if "brotli_bytes" in result:
+            line += f"   br {result['brotli_bytes']:>9,d} B"
+        print(line)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"benchmark": "payload", "products": args.products, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# Compare OCR latency and accuracy with and without image preprocessing.
+#
+#   python benchmarks/bench_preprocess.py                    # synthetic fixtures
+#   python benchmarks/bench_preprocess.py --fixtures photos/ # real labels + expected.json
+#   python benchmarks/bench_preprocess.py --output results/preprocess.json
+#
+# Accuracy is reported as word recall (share of expected words found in the
+# OCR output) and character similarity (rapidfuzz ratio of normalized text).
+# Requires the tesseract binary.
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rapidfuzz import fuzz  # noqa: E402
+
+from benchmarks.label_fixtures import generate  # noqa: E402
+from ocr_pool import ocr_image_bytes  # noqa: E402
+
+CONFIGS = {
+    "raw": {"enabled": False},
+    "resize_only": {"crop_regions": False, "deskew": False, "threshold": "none"},
+    "full": {"enabled": True},
+}
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(WORD_RE.findall(text.lower()))
+
+
+def word_recall(expected: str, actual: str) -> float:
+    expected_words = WORD_RE.findall(expected.lower())
+    if not expected_words:
+        return 1.0
+    actual_words = set(WORD_RE.findall(actual.lower()))
+    return sum(1 for word in expected_words if word in actual_words) / len(expected_words)
+
+
+def run(fixtures: str, repeat: int) -> dict:
+    with open(os.path.join(fixtures, 'expected.json'), encoding='utf-8') as f:
+        expected = json.load(f)
+
+    results = {}
+    for name, options in CONFIGS.items():
+        latencies, recalls, similarities, stages = [], [], [], {}
+        for filename, text in expected.items():
+            with open(os.path.join(fixtures, filename), 'rb') as f:
+                image_bytes = f.read()
+            for _ in range(repeat):
+                started = time.perf_counter()
+                blocks, timings = ocr_image_bytes(image_bytes, options)
+                latencies.append((time.perf_counter() - started) * 1000)
+                for stage, ms in timings.items():
+                    stages.setdefault(stage, []).append(ms)
+            actual = " ".join(block[0] for block in blocks)
+            recalls.append(word_recall(text, actual))
+            similarities.append(fuzz.ratio(normalize(text), normalize(actual)) / 100)
+        results[name] = {
+            "options": options,
+            "images": len(expected),
+            "latency_ms_mean": round(statistics.mean(latencies), 1),
+            "latency_ms_p50": round(statistics.median(latencies), 1),
+            "latency_ms_max": round(max(latencies), 1),
+            "stage_ms_mean": {stage: round(statistics.mean(values), 1) for stage, values in stages.items()},
+            "word_recall": round(statistics.mean(recalls), 4),
+            "char_similarity": round(statistics.mean(similarities), 4),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--fixtures', help="Directory of images plus expected.json (default: generate synthetic labels)")
+    parser.add_argument('--count', type=int, default=8, help="Synthetic labels to generate")
+    parser.add_argument('--repeat', type=int, default=1, help="OCR runs per image")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    fixtures = args.fixtures
+    if not fixtures:
+        fixtures = tempfile.mkdtemp(prefix='label-fixtures-')
+        generate(fixtures, args.count)
+
+    results = run(fixtures, args.repeat)
+    for name, result in results.items():
+        print(f"{name:12s} p50 {result['latency_ms_p50']:8.1f} ms   mean {result['latency_ms_mean']:8.1f} ms   "
+              f"word recall {result['word_recall']:.3f}   char similarity {result['char_similarity']:.3f}")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"benchmark": "preprocess", "fixtures": fixtures, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
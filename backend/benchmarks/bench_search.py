@@ -0,0 +1,90 @@
+# Autocomplete latency of the local search index.
+#
+#   python benchmarks/bench_search.py                          # 100k synthetic products
+#   python benchmarks/bench_search.py --products 500000
+#   python benchmarks/bench_search.py --index cache/off_index.sqlite3
+#   python benchmarks/bench_search.py --output results/search.json
+#
+# Every query is replayed one keystroke at a time ("n", "nu", "nut", ...), the
+# way the scanner's search box calls /search-product.
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_index import LocalProductIndex  # noqa: E402
+from search_index import build_index  # noqa: E402
+
+WORDS = ["nutella", "chocolate", "hazelnut", "spread", "coca", "cola", "zero", "spaghetti", "penne", "milk",
+         "organic", "oat", "yogurt", "greek", "strawberry", "cookies", "crunchy", "peanut", "butter", "cereal",
+         "orange", "juice", "sparkling", "water", "whole", "wheat", "bread", "salted", "crisps", "tomato"]
+BRANDS = ["Ferrero", "Coca-Cola", "Barilla", "Danone", "Nestlé", "Kellogg's", "Alpro", "Lindt", "Heinz", "Lay's"]
+QUERIES = ["nutella", "nutela", "coca cola zero", "barila spaghetti", "greek yogurt strawberry", "peanut butter crunchy",
+           "choclate hazelnut spread", "organic oat milk", "whole wheat bread", "heinz tomato", "sparkling water"]
+
+
+def synthetic_products(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    # A long tail of rare words, like real product names
+    rare = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(30000)]
+    for i in range(count):
+        words = [rng.choice(WORDS if rng.random() < 0.3 else rare) for _ in range(rng.randint(2, 5))]
+        yield {"code": str(3000000000000 + i), "product_name": " ".join(words), "brands": rng.choice(BRANDS)}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--index', help="Build from this local index (see off_ingest.py) instead of synthetic data")
+    parser.add_argument('--products', type=int, default=100_000, help="Synthetic products to index")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.index:
+        local = LocalProductIndex(args.index)
+        index = build_index(local.iter_products())
+        local.close()
+    else:
+        index = build_index(synthetic_products(args.products))
+    build_seconds = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(args.repeat):
+        for query in QUERIES:
+            for end in range(1, len(query) + 1):
+                started = time.perf_counter()
+                index.search(query[:end])
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    results = {
+        **index.info(),
+        "build_seconds": round(build_seconds, 2),
+        "queries": len(latencies),
+        "latency_ms_p50": round(statistics.median(latencies), 3),
+        "latency_ms_p95": round(percentile(latencies, 0.95), 3),
+        "latency_ms_p99": round(percentile(latencies, 0.99), 3),
+        "latency_ms_max": round(max(latencies), 3),
+    }
+    print(f"{results['documents']} documents, {results['terms']} terms, built in {results['build_seconds']}s")
+    print(f"p50 {results['latency_ms_p50']:.2f} ms   p95 {results['latency_ms_p95']:.2f} ms   "
+          f"p99 {results['latency_ms_p99']:.2f} ms   max {results['latency_ms_max']:.2f} ms")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"benchmark": "search", "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
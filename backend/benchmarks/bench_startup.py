@@ -0,0 +1,123 @@
+# Cold-start cost of the API: import time of main.py (python -X importtime) and
+# time until a freshly started uvicorn answers /livez and /readyz.
+#
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --budget-ms 1500 --output results/startup.json
+#
+# Exits non-zero when time-to-first-response exceeds the budget, or when
+# importing main loads any part of the OCR stack or Supabase.
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only load on first use
+LAZY_MODULES = ("cv2", "PIL", "pytesseract", "tesserocr", "supabase", "numpy")
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def _env(extra=None):
+    env = dict(os.environ)
+    # Keep the benchmark from touching the real caches
+    env.update({"PRODUCT_CACHE_PATH": "", "OCR_CACHE_PATH": "", "ANALYSIS_STORE_PATH": "", "POPULARITY_PATH": "", "OFF_LOCAL_INDEX_PATH": ""})
+    env.update(extra or {})
+    return env
+
+
+def import_report(top: int) -> dict:
+    code = f"import main, sys; print([m for m in {LAZY_MODULES!r} if m in sys.modules])"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND, env=_env(),
+                            capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    main_us = next(cumulative for name, _, cumulative, _ in modules if name == "main")
+    direct = [m for m in modules if m[3] == 1]  # imported by main itself
+    return {
+        "main_import_ms": round(main_us / 1000, 1),
+        "slowest_direct_imports_ms": {name: round(cumulative / 1000, 1)
+                                      for name, _, cumulative, _ in sorted(direct, key=lambda m: -m[2])[:top]},
+        "eager_lazy_modules": eval(result.stdout.strip().splitlines()[-1]),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_response(extra_env=None, timeout: float = 30.0) -> dict:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                              cwd=BACKEND, env=_env(extra_env), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    timings = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while time.perf_counter() - started < timeout and len(timings) < 2:
+                for path in ("/livez", "/readyz"):
+                    if path in timings:
+                        continue
+                    try:
+                        if client.get(path).status_code == 200:
+                            timings[path] = round((time.perf_counter() - started) * 1000, 1)
+                    except httpx.TransportError:
+                        pass
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+    return {"livez_ms": timings.get("/livez"), "readyz_ms": timings.get("/readyz")}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help="Slowest direct imports to list")
+    parser.add_argument('--budget-ms', type=float, default=2000, help="Max time until /livez answers")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    imports = import_report(args.top)
+    runs = [time_to_first_response() for _ in range(args.runs)]
+    barcode_only = time_to_first_response({"OCR_ENABLED": "false"})
+    livez = [run["livez_ms"] for run in runs if run["livez_ms"] is not None]
+    results = {
+        **imports,
+        "livez_ms_median": statistics.median(livez) if livez else None,
+        "readyz_ms_median": statistics.median([r["readyz_ms"] for r in runs if r["readyz_ms"] is not None] or [0]),
+        "barcode_only": barcode_only,
+        "budget_ms": args.budget_ms,
+    }
+
+    print(f"import main: {results['main_import_ms']} ms")
+    for name, ms in results["slowest_direct_imports_ms"].items():
+        print(f"  {name:24s} {ms:8.1f} ms")
+    print(f"loaded at import: {', '.join(results['eager_lazy_modules']) or 'none of ' + ', '.join(LAZY_MODULES)}")
+    print(f"first /livez: {results['livez_ms_median']} ms   first ready /readyz: {results['readyz_ms_median']} ms   "
+          f"(budget {args.budget_ms:.0f} ms)")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"benchmark": "startup", "results": results}, f, indent=2)
+
+    within = results["livez_ms_median"] is not None and results["livez_ms_median"] <= args.budget_ms
+    return 0 if within and not results["eager_lazy_modules"] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# Peak memory of decoding a base64 image upload: the previous whole-body path
+# (json.loads -> split -> b64decode -> PIL open) versus the streaming decoder.
+#
+#   python benchmarks/bench_upload.py                  # synthetic 3024x4032 label
+#   python benchmarks/bench_upload.py --image photo.jpg --chunk 65536
+#   python benchmarks/bench_upload.py --output results/upload.json
+#
+# Peaks are measured with tracemalloc and exclude the request body itself,
+# which the server receives either way (in full for the old path, one chunk
+# at a time for the streaming path).
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from benchmarks.label_fixtures import render_label  # noqa: E402
+from upload_stream import OCR_UPLOAD_MEMORY_BUDGET, decode_base64_upload  # noqa: E402
+
+
+def whole_body(body: bytes) -> bytes:
+    image_data = json.loads(body)
+    image_base64 = image_data.get('image')
+    if ',' in image_base64:
+        image_base64 = image_base64.split(',')[1]
+    image_bytes = base64.b64decode(image_base64)
+    Image.open(io.BytesIO(image_bytes))
+    return image_bytes
+
+
+def streaming(body: bytes, chunk: int, loop: asyncio.AbstractEventLoop) -> bytes:
+    async def chunks():
+        for i in range(0, len(body), chunk):
+            yield body[i:i + chunk]
+
+    image_bytes, _, _ = loop.run_until_complete(decode_base64_upload(chunks(), len(body)))
+    return image_bytes
+
+
+def measure(fn, *args) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"peak_bytes": peak, "ms": round(elapsed, 1), "image_bytes": len(result)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--image', help="Image file to upload (default: a synthetic label photo)")
+    parser.add_argument('--chunk', type=int, default=64 * 1024, help="Body chunk size for the streaming path")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            image_bytes = f.read()
+    else:
+        image, _ = render_label(0)
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=92)
+        image_bytes = buffer.getvalue()
+    body = json.dumps({"image": "data:image/jpeg;base64," + base64.b64encode(image_bytes).decode('ascii'),
+                       "preprocess": {"deskew": False}}).encode('utf-8')
+
+    # Created up front so event loop setup/teardown stays out of the measurement
+    loop = asyncio.new_event_loop()
+    results = {
+        "image_bytes": len(image_bytes),
+        "body_bytes": len(body),
+        "budget_bytes": OCR_UPLOAD_MEMORY_BUDGET,
+        "whole_body": measure(whole_body, body),
+        "streaming": measure(streaming, body, args.chunk, loop),
+    }
+    loop.close()
+    for name in ("whole_body", "streaming"):
+        result = results[name]
+        print(f"{name:12s} peak {result['peak_bytes'] / 1e6:7.2f} MB "
+              f"({result['peak_bytes'] / len(image_bytes):4.2f}x image)   {result['ms']:7.1f} ms")
+    within = results["streaming"]["peak_bytes"] <= OCR_UPLOAD_MEMORY_BUDGET
+    print(f"budget {OCR_UPLOAD_MEMORY_BUDGET / 1e6:.2f} MB: {'ok' if within else 'EXCEEDED'}")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"benchmark": "upload", "results": results}, f, indent=2)
+    return 0 if within else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
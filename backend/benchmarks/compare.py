@@ -0,0 +1,78 @@
+# Compare two result files written by the benchmarks' --output option.
+#
+#   python benchmarks/compare.py results/before.json results/after.json
+#   python benchmarks/compare.py before.json after.json --threshold 10   # exit 1 on a >10% regression
+#
+# Every numeric leaf present in both files is listed with its relative change.
+# Latencies, timings and memory are "lower is better"; rps and *_per_sec are
+# "higher is better". Other numbers (counts, sizes) are shown but never fail.
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, Optional, Tuple
+
+LOWER_IS_BETTER = ("_ms", "_us", "_ns", "_seconds", "_bytes", "rss_mb")
+HIGHER_IS_BETTER = ("rps", "_per_sec")
+
+
+def flatten(value, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+
+def direction(name: str) -> Optional[int]:
+    leaf = name.rsplit('.', 1)[-1]
+    if leaf.endswith(HIGHER_IS_BETTER):
+        return 1
+    if leaf.endswith(LOWER_IS_BETTER) or "_ms_" in leaf:
+        return -1
+    return None
+
+
+def compare(before: Dict, after: Dict) -> Iterator[Tuple[str, float, float, Optional[float], Optional[int]]]:
+    old = dict(flatten(before.get("results", before)))
+    for name, new_value in flatten(after.get("results", after)):
+        if name not in old:
+            continue
+        old_value = old[name]
+        change = (new_value - old_value) / old_value * 100 if old_value else None
+        yield name, old_value, new_value, change, direction(name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, help="Fail when a metric gets worse by more than this many percent")
+    args = parser.parse_args(argv)
+
+    with open(args.before, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(args.after, encoding='utf-8') as f:
+        after = json.load(f)
+    for label, data in (("before", before), ("after", after)):
+        meta = data.get("meta", {})
+        print(f"{label:6s} {data.get('benchmark', '?')}  commit {meta.get('commit', '?')}  {meta.get('timestamp', '')}")
+
+    regressions = []
+    for name, old_value, new_value, change, better in compare(before, after):
+        marker = ""
+        if change is not None and better is not None:
+            worse_by = -change * better
+            if args.threshold is not None and worse_by > args.threshold:
+                regressions.append(name)
+                marker = "  REGRESSION"
+        shown = f"{change:+8.1f}%" if change is not None else "       -"
+        print(f"{name:60s} {old_value:14.3f} {new_value:14.3f} {shown}{marker}")
+
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold}%")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# Benchmark corpus: ingredient lists as printed on real products (taken from
+# Open Food Facts, English labels), plus helpers that turn them into
+# OFF-shaped products, fake Supabase profiles and OCR text blocks.
+#
+# A local index built with off_ingest.py can be used instead of the built-in
+# lists with load_corpus("cache/off_index.sqlite3"), or a JSON/JSONL file of
+# products or plain strings.
+import json
+import random
+from typing import Dict, List, Optional, Tuple
+
+INGREDIENT_TEXTS = [
+    "Sugar, palm oil, hazelnuts 13%, skimmed milk powder 8.7%, fat-reduced cocoa 7.4%, emulsifier: lecithins (soya), vanillin",
+    "Carbonated water, sugar, colour (caramel E150d), acid (phosphoric acid), natural flavourings including caffeine",
+    "Durum wheat semolina, water",
+    "Wheat flour, sugar, vegetable oils (palm, rapeseed), wholemeal wheat flour 8%, raising agents (sodium hydrogen carbonate, "
+    "ammonium hydrogen carbonate), salt, emulsifier (soya lecithin), flavouring",
+    "Whole grain oats 100%",
+    "Potatoes, sunflower oil (31%), salt",
+    "Tomatoes 148g per 100g ketchup, spirit vinegar, sugar, salt, spice and herb extracts (contain celery), spice",
+    "Milk chocolate 70% (sugar, cocoa butter, whole milk powder, cocoa mass, skimmed milk powder, whey powder, "
+    "emulsifier: soya lecithin, barley malt extract, flavouring), wheat flour, sugar, palm fat, glucose syrup",
+    "Water, hulled soya beans (8%), calcium (tri-calcium phosphate), acidity regulator (potassium phosphates), "
+    "sea salt, stabiliser (gellan gum), vitamins (riboflavin, B12, D2)",
+    "Maize, sugar, barley malt flavouring, salt, iron, vitamin D, vitamin B6, riboflavin, thiamin, folic acid, vitamin B12",
+    "Yogurt (milk), strawberries (10%), sugar, modified maize starch, concentrated lemon juice, natural flavouring, "
+    "concentrated black carrot juice",
+    "Peanuts (95%), palm oil, salt",
+    "Rolled oats (58%), dried fruit (raisins, apricots 4%, dates), sugar, honey, sunflower oil, dried coconut, "
+    "hazelnuts, almonds, salt, natural flavouring",
+    "Mechanically separated chicken (52%), water, pork fat, potato starch, salt, soy protein, dextrose, spices, "
+    "stabilisers (E450, E451), antioxidant (sodium ascorbate), preservative (sodium nitrite), smoke flavouring",
+    "Wheat flour (calcium, iron, niacin, thiamin), water, yeast, salt, soya flour, preservative (calcium propionate), "
+    "emulsifiers (mono- and di-acetyltartaric esters of mono- and di-glycerides of fatty acids), rapeseed oil, "
+    "flour treatment agent (ascorbic acid)",
+    "Orange juice from concentrate",
+    "Water, sugar, citric acid, acidity regulator (sodium citrates), sweeteners (aspartame, acesulfame K), "
+    "flavourings, preservatives (potassium sorbate, sodium benzoate), colour (beta-carotene)",
+    "Cocoa mass, sugar, cocoa butter, emulsifier: soya lecithin, vanilla. Cocoa solids: 70% minimum",
+    "Basmati rice",
+    "Rapeseed oil (78%), water, pasteurised egg yolk (6%), spirit vinegar, salt, sugar, lemon juice concentrate, "
+    "antioxidant (calcium disodium EDTA), paprika extract",
+    "Glucose syrup, sugar, gelatine, dextrose, citric acid, fruit juice from concentrate (apple, strawberry, raspberry, "
+    "orange, lemon, pineapple) 3%, flavouring, colours (paprika extract, spirulina concentrate), glazing agent (carnauba wax)",
+    "Chickpeas (70%), water, sesame seed paste (tahini) 8%, rapeseed oil, garlic puree, lemon juice, salt, "
+    "preservative: potassium sorbate",
+    "Skimmed milk, whole milk, sugar, cream, high fructose corn syrup, whey, modified corn starch, carrageenan, "
+    "artificial flavor, annatto color",
+    "Pork (87%), water, salt, dextrose, stabiliser (triphosphates), antioxidant (sodium ascorbate), "
+    "preservative (sodium nitrite)",
+    "Enriched flour (wheat flour, niacin, reduced iron, thiamine mononitrate, riboflavin, folic acid), sugar, "
+    "soybean oil, corn syrup, hydrogenated cottonseed oil, dextrose, salt, leavening (baking soda, sodium aluminum phosphate), "
+    "maltodextrin, monosodium glutamate, artificial colors (red 40, yellow 5)",
+    "Cooked chickpeas, tomato (25%), onion, spinach, coconut milk, ginger, garlic, spices, sunflower oil, sea salt",
+    "Almonds (14%), water, sea salt, thickener (locust bean gum, gellan gum), emulsifier (sunflower lecithin)",
+    "Pasteurised cream (milk), salt",
+    "Mozzarella cheese (milk), wheat flour, tomato puree, water, edam cheese (milk), pepperoni (pork, salt, dextrose, "
+    "spices, garlic, antioxidants: sodium ascorbate, extracts of rosemary, preservative: sodium nitrite), rapeseed oil, yeast, "
+    "sugar, oregano",
+    "Sugar, cornflour, modified maize starch, dextrose, colours (E102, E110, E129), flavourings, anti-caking agent (E341)",
+]
+
+# Profiles the personalization path sees in practice: none, one condition, allergies, strict diets
+PROFILES = [
+    {"medical_conditions": [], "allergies": []},
+    {"medical_conditions": ["diabetes"], "allergies": []},
+    {"medical_conditions": ["hypertension", "heart disease"], "allergies": ["peanuts"]},
+    {"medical_conditions": [], "allergies": ["gluten", "dairy"]},
+    {"medical_conditions": ["diabetes", "high bp"], "allergies": ["soy", "nuts"]},
+]
+
+HEALTH_PROFILES = [
+    {"age": 34, "conditions": [], "allergies": [], "dietary_preferences": [], "restrictions": []},
+    {"age": 58, "conditions": ["diabetes"], "allergies": [], "dietary_preferences": [], "restrictions": ["low_sugar"]},
+    {"age": 66, "conditions": ["hypertension", "heart_disease"], "allergies": ["nuts"], "dietary_preferences": [],
+     "restrictions": ["low_salt", "low_fat"]},
+    {"age": 27, "conditions": [], "allergies": ["dairy", "gluten"], "dietary_preferences": ["vegan"], "restrictions": []},
+    {"age": 45, "conditions": ["diabetes"], "allergies": ["soy"], "dietary_preferences": ["vegetarian", "gluten_free"],
+     "restrictions": []},
+]
+
+
+# Ingredient strings from a local index, a JSON/JSONL file, or the built-in list
+def load_corpus(path: Optional[str] = None) -> List[str]:
+    if not path:
+        return list(INGREDIENT_TEXTS)
+    if path.endswith(('.sqlite3', '.db')):
+        from local_index import LocalProductIndex
+
+        index = LocalProductIndex(path)
+        try:
+            return [p['ingredients_text'] for p in index.iter_products() if p.get('ingredients_text')]
+        finally:
+            index.close()
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            items = [json.loads(line) for line in f if line.strip()]
+        else:
+            items = json.load(f)
+    if isinstance(items, dict):  # barcode -> product, as in OFF_STUB_FIXTURES
+        items = list(items.values())
+    texts = [item if isinstance(item, str) else item.get('ingredients_text', '') for item in items]
+    return [text for text in texts if text]
+
+
+# OFF-shaped products (barcode -> product) cycling through the corpus, with varied
+# nutriments. Names reuse corpus words so search queries have something to match.
+def synthetic_products(count: int, texts: Optional[List[str]] = None, seed: int = 1) -> Dict[str, Dict]:
+    rng = random.Random(seed)
+    texts = texts or INGREDIENT_TEXTS
+    products = {}
+    for i in range(count):
+        code = str(3000000000000 + i)
+        text = texts[i % len(texts)]
+        name_words = [w.strip("():,.%0123456789").lower() for w in text.split()[:3]]
+        products[code] = {
+            "code": code,
+            "product_name": " ".join(w for w in name_words if w) + f" {i}",
+            "brands": rng.choice(["Ferrero", "Barilla", "Danone", "Nestlé", "Kellogg's", "Alpro", "Heinz"]),
+            "ingredients_text": text,
+            "nutriments": {"sugars_100g": round(rng.uniform(0, 60), 1), "salt_100g": round(rng.uniform(0, 3), 2),
+                           "saturated-fat_100g": round(rng.uniform(0, 20), 1)},
+            "nova_group": rng.choice([1, 3, 4, 4, 4]),
+            "nutriscore_grade": rng.choice("abcde"),
+        }
+    return products
+
+
+# Rows for the fake Supabase `profiles` table, with user ids user-0 .. user-{count-1}
+def fake_profile_rows(count: int) -> List[Dict]:
+    return [{"user_id": f"user-{i}", **PROFILES[i % len(PROFILES)]} for i in range(count)]
+
+
+# An ingredient list laid out as (text, confidence) lines, the shape OCR workers return
+def ocr_text_blocks(text: str, seed: int = 0) -> List[Tuple[str, float]]:
+    rng = random.Random(seed)
+    blocks = [("BRAND", 0.97), ("New improved recipe!", 0.91)]
+    words = ("Ingredients: " + text + ".").split()
+    line: List[str] = []
+    for word in words:
+        line.append(word)
+        if len(" ".join(line)) > 38:
+            blocks.append((" ".join(line), rng.uniform(0.8, 0.99)))
+            line = []
+    if line:
+        blocks.append((" ".join(line), rng.uniform(0.8, 0.99)))
+    blocks += [("Nutrition Facts per 100g", 0.95), (f"Energy: {rng.randint(50, 600)}kcal", 0.93),
+               (f"Sugars: {rng.randint(0, 60)}g", 0.92), (f"Salt: {rng.uniform(0, 3):.1f}g", 0.9),
+               ("Best before: see lid", 0.88)]
+    return blocks
+
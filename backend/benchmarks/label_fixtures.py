@@ -0,0 +1,105 @@
+# Synthetic food-label photos with known text, so OCR benchmarks are
+# reproducible without shipping binary fixtures. Each label is a small
+# ingredients paragraph plus a nutrition table on a large, noisy, slightly
+# rotated and unevenly lit "phone photo" canvas.
+#
+#   python benchmarks/label_fixtures.py fixtures/  # writes *.png + expected.json
+import json
+import os
+import random
+import sys
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+INGREDIENT_POOL = [
+    "sugar", "wheat flour", "palm oil", "hazelnuts", "skimmed milk powder", "cocoa", "soy lecithin",
+    "salt", "dextrose", "maltodextrin", "whey powder", "corn syrup", "sunflower oil", "oat flakes",
+    "rice flour", "citric acid", "natural flavouring", "sodium bicarbonate", "glucose syrup", "almonds",
+]
+
+NUTRITION_ROWS = [("Energy", "kcal"), ("Fat", "g"), ("Saturated", "g"), ("Carbohydrate", "g"),
+                  ("Sugars", "g"), ("Protein", "g"), ("Salt", "g")]
+
+
+def _font(size: int) -> ImageFont.ImageFont:
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def render_label(seed: int, canvas: Tuple[int, int] = (3024, 4032)) -> Tuple[Image.Image, str]:
+    rng = random.Random(seed)
+    width, height = canvas
+    background = tuple(rng.randint(150, 220) for _ in range(3))
+    image = Image.new('RGB', canvas, background)
+    draw = ImageDraw.Draw(image)
+
+    # Background clutter: colored shapes like packaging artwork
+    for _ in range(12):
+        x, y = rng.randint(0, width), rng.randint(0, height)
+        r = rng.randint(80, 400)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randint(60, 255) for _ in range(3)))
+
+    font = _font(rng.randint(46, 60))
+    lines: List[str] = []
+
+    # Ingredients panel
+    ingredients = rng.sample(INGREDIENT_POOL, 8)
+    text = "Ingredients: " + ", ".join(ingredients) + "."
+    words = text.split()
+    paragraph, current = [], ""
+    for word in words:
+        if len(current) + len(word) > 38:
+            paragraph.append(current.strip())
+            current = ""
+        current += word + " "
+    paragraph.append(current.strip())
+
+    panel_x, panel_y = rng.randint(200, 500), rng.randint(300, 900)
+    line_height = int(font.size * 1.4)
+    draw.rectangle((panel_x - 40, panel_y - 40, panel_x + 1500, panel_y + line_height * len(paragraph) + 40), fill=(250, 250, 245))
+    for i, line in enumerate(paragraph):
+        draw.text((panel_x, panel_y + i * line_height), line, fill=(20, 20, 20), font=font)
+    lines.extend(paragraph)
+
+    # Nutrition table
+    table_x, table_y = rng.randint(300, 900), panel_y + line_height * len(paragraph) + rng.randint(500, 900)
+    draw.rectangle((table_x - 40, table_y - 40, table_x + 1100, table_y + line_height * (len(NUTRITION_ROWS) + 1) + 40),
+                   fill=(255, 255, 255), outline=(0, 0, 0), width=6)
+    draw.text((table_x, table_y), "Nutrition Facts per 100g", fill=(0, 0, 0), font=font)
+    lines.append("Nutrition Facts per 100g")
+    for i, (name, unit) in enumerate(NUTRITION_ROWS, 1):
+        row = f"{name}: {rng.randint(1, 60)}{unit}"
+        draw.text((table_x, table_y + i * line_height), row, fill=(0, 0, 0), font=font)
+        lines.append(row)
+
+    # Camera artefacts: slight rotation, blur, uneven lighting, sensor noise
+    image = image.rotate(rng.uniform(-4, 4), resample=Image.BICUBIC, expand=False, fillcolor=background)
+    image = image.filter(ImageFilter.GaussianBlur(radius=rng.uniform(0.6, 1.4)))
+    shade = Image.linear_gradient('L').resize(canvas).rotate(rng.randint(0, 359))
+    image = Image.composite(image, Image.new('RGB', canvas, (40, 40, 40)), shade.point(lambda v: 140 + v * 115 // 255))
+    noise = Image.effect_noise(canvas, rng.randint(12, 24)).convert('RGB')
+    image = Image.blend(image, noise, 0.08)
+    return image, "\n".join(lines)
+
+
+def generate(directory: str, count: int = 8) -> Dict[str, str]:
+    os.makedirs(directory, exist_ok=True)
+    expected = {}
+    for seed in range(count):
+        image, text = render_label(seed)
+        name = f"label_{seed:02d}.png"
+        image.save(os.path.join(directory, name))
+        expected[name] = text
+    with open(os.path.join(directory, 'expected.json'), 'w', encoding='utf-8') as f:
+        json.dump(expected, f, indent=2)
+    return expected
+
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else 'fixtures'
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    generate(target, count)
+    print(f"Wrote {count} labels to {target}")
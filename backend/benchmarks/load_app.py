@@ -0,0 +1,19 @@
+# The API as bench_load.py runs it: main.app with profiles served from the
+# in-memory fake Supabase instead of a real project.
+#
+#   LOAD_PROFILE_USERS=1000 OFF_BASE_URL=http://127.0.0.1:8081 uvicorn benchmarks.load_app:app
+#
+# LOAD_PROFILE_USERS sets how many fake users (user-0 ...) exist, and
+# LOAD_SUPABASE_LATENCY (seconds) delays every profile query.
+import os
+
+import main
+from benchmarks.ingredient_corpus import fake_profile_rows
+from profile_cache import ProfileLoader
+from supabase_fake import FakeAsyncSupabase
+
+supabase = FakeAsyncSupabase({"profiles": fake_profile_rows(int(os.getenv("LOAD_PROFILE_USERS", "1000")))},
+                             latency=float(os.getenv("LOAD_SUPABASE_LATENCY", "0.005")))
+main.profile_loader = ProfileLoader(supabase.as_factory, shared=main.shared_cache)
+
+app = main.app
@@ -0,0 +1,56 @@
+# Shared result handling for bench_analysis.py and bench_load.py: latency
+# summaries and a JSON file that records where the numbers came from (commit,
+# interpreter, machine), so runs can be compared with benchmarks/compare.py.
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def latency_summary(samples: List[float], unit: str = "ms", digits: int = 3) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        f"mean_{unit}": round(statistics.fmean(samples), digits),
+        f"p50_{unit}": round(statistics.median(samples), digits),
+        f"p95_{unit}": round(percentile(samples, 0.95), digits),
+        f"p99_{unit}": round(percentile(samples, 0.99), digits),
+        f"max_{unit}": round(max(samples), digits),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_metadata() -> Dict:
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "argv": sys.argv[1:],
+    }
+
+
+def write_results(path: str, benchmark: str, results: Dict, **extra):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"benchmark": benchmark, "meta": run_metadata(), **extra, "results": results}, f, indent=2)
@@ -0,0 +1,228 @@
+# Columnar batch scoring for re-scoring a whole catalogue.
+#
+#   python bulk_scoring.py products.csv scores.csv
+#   python bulk_scoring.py en.openfoodfacts.org.products.csv.gz scores.parquet --delimiter '\t'
+#   python bulk_scoring.py products.parquet scores.parquet   # needs pyarrow
+#
+# score_arrays / alert_flag_arrays reproduce calculate_health_score and
+# generate_alerts from main.py exactly, but over NumPy arrays instead of one
+# product dict at a time. Missing nutriments are NaN: they score as 0 (like
+# nutriments.get(key, 0)) and never raise an alert (like the "key in" checks).
+import argparse
+import csv
+import gzip
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ingredient_matcher import HARMFUL_LABELS, MATCHER, iter_ingredient_tokens
+
+CHUNK_ROWS = 100_000
+
+NUTRIENT_COLUMNS = {
+    'sugars': 'sugars_100g',
+    'salt': 'salt_100g',
+    'saturated_fat': 'saturated-fat_100g',
+}
+
+ALERT_FLAGS = ('high_sugar', 'high_salt', 'harmful_ingredients', 'ultra_processed')
+# Informational matcher hits (ingredient_mapping.json additives, risk_categories.json
+# allergens and harmful entries); they don't change scores or alerts
+INGREDIENT_FLAGS = ('additives', 'common_allergens', 'risk_harmful')
+
+
+# Same count as sum(ing.is_harmful for ing in parse_ingredients(text)), without the Pydantic objects
+def count_harmful(ingredients_text: Optional[str]) -> int:
+    return sum(1 for name, _ in iter_ingredient_tokens(ingredients_text or '') if MATCHER.is_harmful(name))
+
+
+def harmful_counts(texts: Iterable[Optional[str]]) -> np.ndarray:
+    return np.fromiter((count_harmful(text) for text in texts), dtype=np.int64)
+
+
+# (harmful count, has additives, has common allergens, has risk_categories.json
+# harmful entries) for one ingredients text, from one scan per token
+def scan_ingredients(ingredients_text: Optional[str]) -> Tuple[int, bool, bool, bool]:
+    harmful, additives, allergens, risk_harmful = 0, False, False, False
+    for name, _ in iter_ingredient_tokens(ingredients_text or ''):
+        scan = MATCHER.scan(name)
+        harmful += not scan.labels.isdisjoint(HARMFUL_LABELS)
+        additives = additives or bool(scan.additives)
+        allergens = allergens or bool(scan.allergens)
+        risk_harmful = risk_harmful or bool(scan.risk_harmful)
+    return harmful, additives, allergens, risk_harmful
+
+
+# Vectorized calculate_health_score; nova_group NaN means "missing" and scores as group 1
+def score_arrays(sugars: np.ndarray, salt: np.ndarray, saturated_fat: np.ndarray,
+                 nova_group: np.ndarray, harmful_count: np.ndarray) -> np.ndarray:
+    sugars = np.nan_to_num(np.asarray(sugars, dtype=np.float64), nan=0.0)
+    salt = np.nan_to_num(np.asarray(salt, dtype=np.float64), nan=0.0)
+    saturated_fat = np.nan_to_num(np.asarray(saturated_fat, dtype=np.float64), nan=0.0)
+    nova_group = np.nan_to_num(np.asarray(nova_group, dtype=np.float64), nan=1.0)
+    harmful_count = np.asarray(harmful_count, dtype=np.float64)
+
+    # Deductions are applied in the same order as the scalar version so floating-point results match
+    score = np.full(sugars.shape, 100.0)
+    score -= np.minimum(25, (sugars / 20) * 25)
+    score -= np.minimum(20, (salt / 3) * 20)
+    score -= np.minimum(20, (saturated_fat / 10) * 20)
+    score -= np.minimum(15, harmful_count * 3)
+    score -= np.minimum(20, (nova_group - 1) * 7)
+
+    # np.round rounds half to even, like Python's round()
+    return np.clip(np.round(score), 0, 100).astype(np.int64)
+
+
+# Vectorized generate_alerts, as one boolean array per alert type
+def alert_flag_arrays(sugars: np.ndarray, salt: np.ndarray, nova_group: np.ndarray,
+                      harmful_count: np.ndarray) -> Dict[str, np.ndarray]:
+    sugars = np.asarray(sugars, dtype=np.float64)
+    salt = np.asarray(salt, dtype=np.float64)
+    nova_group = np.asarray(nova_group, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return {
+            'high_sugar': sugars > 10,
+            'high_salt': salt > 1.5,
+            'harmful_ingredients': np.asarray(harmful_count) > 0,
+            'ultra_processed': nova_group == 4,
+        }
+
+
+def _to_float(value) -> float:
+    if value is None or value == '':
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+# Score one chunk of rows (dicts of column -> raw value); returns output columns
+def score_rows(rows: List[Dict]) -> Dict[str, np.ndarray]:
+    columns = {
+        name: np.array([_to_float(row.get(column)) for row in rows], dtype=np.float64)
+        for name, column in NUTRIENT_COLUMNS.items()
+    }
+    nova_group = np.array([_to_float(row.get('nova_group')) for row in rows], dtype=np.float64)
+    ingredient_flags = {name: np.zeros(len(rows), dtype=bool) for name in INGREDIENT_FLAGS}
+    if rows and 'harmful_count' in rows[0]:
+        harmful = np.nan_to_num(np.array([_to_float(row.get('harmful_count')) for row in rows])).astype(np.int64)
+    else:
+        scans = [scan_ingredients(row.get('ingredients_text')) for row in rows]
+        harmful = np.array([scan[0] for scan in scans], dtype=np.int64)
+        for i, name in enumerate(INGREDIENT_FLAGS, start=1):
+            ingredient_flags[name] = np.array([scan[i] for scan in scans], dtype=bool)
+
+    scores = score_arrays(columns['sugars'], columns['salt'], columns['saturated_fat'], nova_group, harmful)
+    flags = alert_flag_arrays(columns['sugars'], columns['salt'], nova_group, harmful)
+    return {
+        'code': np.array([row.get('code', '') for row in rows], dtype=object),
+        'health_score': scores,
+        'harmful_count': harmful,
+        **flags,
+        **ingredient_flags,
+    }
+
+
+def _open_text(path: str, mode: str = 'rt'):
+    if path == '-':
+        return sys.stdin if 'r' in mode else sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8', newline='')
+    return open(path, mode.replace('t', ''), encoding='utf-8', newline='')
+
+
+def _is_parquet(path: str) -> bool:
+    return path.endswith('.parquet')
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise SystemExit("Parquet input/output requires pyarrow: pip install pyarrow")
+
+
+def iter_chunks(path: str, delimiter: str) -> Iterator[List[Dict]]:
+    if _is_parquet(path):
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=CHUNK_ROWS):
+            yield batch.to_pylist()
+        return
+
+    csv.field_size_limit(sys.maxsize)
+    with _open_text(path) as stream:
+        reader = csv.DictReader(stream, delimiter=delimiter)
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) >= CHUNK_ROWS:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class ScoreWriter:
+    COLUMNS = ('code', 'health_score', 'harmful_count') + ALERT_FLAGS + INGREDIENT_FLAGS
+
+    def __init__(self, path: str):
+        self.path = path
+        self._parquet = None
+        self._stream = None
+        self._csv = None
+        if _is_parquet(path):
+            _require_pyarrow()
+        else:
+            self._stream = _open_text(path, 'wt')
+            self._csv = csv.writer(self._stream)
+            self._csv.writerow(self.COLUMNS)
+
+    def write(self, columns: Dict[str, np.ndarray]):
+        if self._csv is not None:
+            self._csv.writerows(zip(*(
+                columns[name].astype(int) if name in ALERT_FLAGS + INGREDIENT_FLAGS else columns[name] for name in self.COLUMNS
+            )))
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.table({name: columns[name].astype(str) if name == 'code' else columns[name] for name in self.COLUMNS})
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(self.path, table.schema)
+        self._parquet.write_table(table)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+        if self._stream is not None and self._stream is not sys.stdout:
+            self._stream.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score a product catalogue in bulk")
+    parser.add_argument('source', help="CSV/TSV (optionally .gz) or .parquet with OFF column names")
+    parser.add_argument('output', help="Output .csv or .parquet ('-' for CSV on stdout)")
+    parser.add_argument('--delimiter', default=',', help="CSV delimiter (use '\\t' for OFF exports)")
+    args = parser.parse_args(argv)
+    delimiter = '\t' if args.delimiter in ('\\t', 'tab') else args.delimiter
+
+    started = time.perf_counter()
+    rows = 0
+    writer = ScoreWriter(args.output)
+    try:
+        for chunk in iter_chunks(args.source, delimiter):
+            writer.write(score_rows(chunk))
+            rows += len(chunk)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - started
+    print(f"Scored {rows} products in {elapsed:.2f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+
+@dataclass
+class CacheEntry:
+    value: Any  # None marks a negative entry ("known not to exist")
+    stored_at: float
+    expires_at: float  # fresh until
+    stale_until: float  # may still be served while revalidating until
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) < self.expires_at
+
+    def is_servable(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) < self.stale_until
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    shared_hits: int = 0  # served by the cross-worker tier (see shared_cache.py)
+    disk_hits: int = 0
+    misses: int = 0
+    stale_hits: int = 0
+    negative_hits: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    revalidations: int = 0
+    upstream_errors: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.shared_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            **self.__dict__,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Bounded in-process LRU; entries carry their own freshness window
+class MemoryLRU:
+    def __init__(self, max_entries: int, stats: Optional[CacheStats] = None):
+        self.max_entries = max_entries
+        self.stats = stats or CacheStats()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if not entry.is_servable():
+            del self._entries[key]
+            self.stats.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    # Like get(), but neither counts an expiration nor refreshes the LRU position
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        return entry if entry is not None and entry.is_servable() else None
+
+    def set(self, key: str, entry: CacheEntry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def values(self) -> List[Any]:
+        return [entry.value for entry in list(self._entries.values()) if entry.value is not None and entry.is_servable()]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Persistent key/value tier backed by SQLite; survives restarts
+class SQLiteStore:
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, table: str = "cache"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT, stored_at REAL, expires_at REAL, stale_until REAL)"
+        )
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, stored_at, expires_at, stale_until FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, stored_at, expires_at, stale_until = row
+        entry = CacheEntry(json.loads(value) if value is not None else None, stored_at, expires_at, stale_until)
+        return entry if entry.is_servable() else None
+
+    def set(self, key: str, entry: CacheEntry):
+        value = json.dumps(entry.value, separators=(',', ':')) if entry.value is not None else None
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, expires_at, stale_until) VALUES (?, ?, ?, ?, ?)",
+                (key, value, entry.stored_at, entry.expires_at, entry.stale_until),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE stale_until < ?", (time.time(),))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    # Drop every entry whose key doesn't start with `prefix`; returns how many were removed
+    def delete_except_prefix(self, prefix: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                f"DELETE FROM {self.table} WHERE substr(key, 1, ?) != ?", (len(prefix), prefix)
+            ).rowcount
+
+    # Servable, non-negative values, read in batches so the lock is never held for long
+    def iter_values(self, batch_size: int = 1000) -> Iterator[Any]:
+        last_key = ''
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key > ? AND value IS NOT NULL AND stale_until >= ? "
+                    "ORDER BY key LIMIT ?", (last_key, time.time(), batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for _, value in rows:
+                yield json.loads(value)
+            last_key = rows[-1][0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Memory LRU in front of an optional on-disk store, plus an optional shared tier
+# (a cache process all workers talk to) between the two. The shared tier is
+# only consulted by aget(); writes and deletes reach it in the background.
+# SQLite can block for a while when several workers share the file, so the
+# async paths never touch it on the event loop: aget()/apeek() read in a
+# thread, and writes and deletes go through one writer thread, in order.
+class TieredCache:
+    def __init__(self, max_entries: int, disk_path: Optional[str] = None, table: str = "cache", shared=None):
+        self.stats = CacheStats()
+        self.memory = MemoryLRU(max_entries, self.stats)
+        self.disk = SQLiteStore(disk_path, table) if disk_path else None
+        self.shared = shared
+        self.namespace = table
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix=f"{table}-writer") if self.disk is not None else None
+
+    # Run fn(*args) on the writer thread, after the disk writes queued before it
+    def queue_disk(self, fn, *args) -> Future:
+        future = self._writer.submit(fn, *args)
+        future.add_done_callback(self._write_done)
+        return future
+
+    def _write_done(self, future: Future):
+        if future.exception() is not None:
+            print(f"Warning: {self.namespace} disk cache write failed: {future.exception()}")
+
+    # Disk read in a thread; an entry stored in memory meanwhile wins over it
+    async def _aget_disk(self, key: str) -> Optional[CacheEntry]:
+        entry = await asyncio.to_thread(self.disk.get, key)
+        if entry is None:
+            return None
+        current = self.memory.peek(key)
+        if current is not None:
+            return current
+        self.memory.set(key, entry)
+        return entry
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.stats.memory_hits += 1
+            return entry
+        if self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.stats.disk_hits += 1
+                self.memory.set(key, entry)
+                return entry
+        self.stats.misses += 1
+        return None
+
+    # count_miss=False leaves a miss for the caller to count (e.g. after a fallback lookup)
+    async def aget(self, key: str, count_miss: bool = True) -> Optional[CacheEntry]:
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.stats.memory_hits += 1
+            return entry
+        if self.shared is not None:
+            entry = await self.shared.get(self.namespace, key)
+            if entry is not None:
+                self.stats.shared_hits += 1
+                self.memory.set(key, entry)
+                return entry
+        if self.disk is not None:
+            entry = await self._aget_disk(key)
+            if entry is not None:
+                self.stats.disk_hits += 1
+                if self.shared is not None:
+                    self.shared.set(self.namespace, key, entry)
+                return entry
+        if count_miss:
+            self.stats.misses += 1
+        return None
+
+    # Memory, then disk, without counting a lookup (for background work such as
+    # prewarming); a disk hit is loaded into memory as aget() would
+    async def apeek(self, key: str) -> Optional[CacheEntry]:
+        entry = self.memory.peek(key)
+        if entry is None and self.disk is not None:
+            entry = await self._aget_disk(key)
+        return entry
+
+    def set(self, key: str, value: Any, ttl: float, stale_ttl: float = 0.0):
+        now = time.time()
+        entry = CacheEntry(value, now, now + ttl, now + ttl + stale_ttl)
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.queue_disk(self.disk.set, key, entry)
+        if self.shared is not None:
+            self.shared.set(self.namespace, key, entry)
+        return entry
+
+    def delete(self, key: str):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.queue_disk(self.disk.delete, key)
+        if self.shared is not None:
+            self.shared.delete(self.namespace, key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.queue_disk(self.disk.clear)
+
+    # Every cached value (the disk tier holds a superset of memory when enabled)
+    def iter_values(self) -> Iterator[Any]:
+        if self.disk is not None:
+            yield from self.disk.iter_values()
+        else:
+            yield from self.memory.values()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            **self.stats.as_dict(),
+            "memory_entries": len(self.memory),
+            "memory_capacity": self.memory.max_entries,
+            "disk_entries": len(self.disk) if self.disk is not None else None,
+        }
+
+    # Waits for queued disk writes before closing the store
+    def close(self):
+        if self.disk is not None:
+            self._writer.shutdown(wait=True)
+            self.disk.close()
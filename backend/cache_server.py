@@ -0,0 +1,191 @@
+# Redis-compatible stand-in for the shared cache tier (see shared_cache.py):
+# one asyncio process holding a bounded LRU with per-key expiry, speaking the
+# subset of RESP the API uses. serve.py starts it on a Unix socket next to the
+# workers; point SHARED_CACHE_URL at a real Redis instead to share across hosts.
+#
+#   python cache_server.py --socket cache/shared.sock
+#   python cache_server.py --port 6380 --max-entries 200000
+#
+# Supported: PING, GET, SET [EX s | PX ms], DEL, EXISTS, DBSIZE, FLUSHDB,
+# FLUSHALL, INFO, QUIT.
+import argparse
+import asyncio
+import os
+import signal
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from shared_cache import RespError, read_reply
+
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "100000"))
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(512 * 2 ** 20)))
+
+
+def _simple(text: str) -> bytes:
+    return b"+%s\r\n" % text.encode("utf-8")
+
+
+def _error(text: str) -> bytes:
+    return b"-ERR %s\r\n" % text.encode("utf-8")
+
+
+def _integer(value: int) -> bytes:
+    return b":%d\r\n" % value
+
+
+def _bulk(data: Optional[bytes]) -> bytes:
+    if data is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+class CacheStore:
+    def __init__(self, max_entries: int = SHARED_CACHE_MAX_ENTRIES, max_bytes: int = SHARED_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[bytes, Tuple[bytes, Optional[float]]]" = OrderedDict()
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        item = self._entries.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            self.delete(key)
+            item = None
+        if item is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return item[0]
+
+    def set(self, key: bytes, value: bytes, ttl: Optional[float] = None):
+        self.delete(key)
+        self._entries[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+        self.size_bytes += len(key) + len(value)
+        while self._entries and (len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self.delete(oldest)
+            self.evictions += 1
+
+    def delete(self, key: bytes) -> bool:
+        item = self._entries.pop(key, None)
+        if item is None:
+            return False
+        self.size_bytes -= len(key) + len(item[0])
+        return True
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def info(self) -> Dict[str, int]:
+        return {"keys": len(self._entries), "used_memory": self.size_bytes, "keyspace_hits": self.hits,
+                "keyspace_misses": self.misses, "evicted_keys": self.evictions}
+
+
+def _parse_ttl(args: List[bytes]) -> Optional[float]:
+    ttl = None
+    options = iter(args)
+    for option in options:
+        name = option.upper()
+        try:
+            amount = int(next(options))
+        except (StopIteration, ValueError):
+            raise RespError("syntax error")
+        if name == b"EX":
+            ttl = amount
+        elif name == b"PX":
+            ttl = amount / 1000
+        else:
+            raise RespError("syntax error")
+    return ttl
+
+
+def execute(store: CacheStore, command: List[bytes]) -> bytes:
+    name, args = command[0].upper(), command[1:]
+    try:
+        if name == b"PING":
+            return _simple("PONG") if not args else _bulk(args[0])
+        if name == b"GET" and len(args) == 1:
+            return _bulk(store.get(args[0]))
+        if name == b"SET" and len(args) >= 2:
+            store.set(args[0], args[1], _parse_ttl(args[2:]))
+            return _simple("OK")
+        if name == b"DEL" and args:
+            return _integer(sum(store.delete(key) for key in args))
+        if name == b"EXISTS" and args:
+            return _integer(sum(store.get(key) is not None for key in args))
+        if name == b"DBSIZE":
+            return _integer(len(store))
+        if name in (b"FLUSHDB", b"FLUSHALL"):
+            store.clear()
+            return _simple("OK")
+        if name == b"INFO":
+            return _bulk("".join(f"{k}:{v}\r\n" for k, v in store.info().items()).encode("utf-8"))
+        if name == b"SELECT":  # single keyspace; accept clients that select a db from their URL
+            return _simple("OK")
+    except RespError as e:
+        return _error(str(e))
+    return _error(f"unknown command or wrong number of arguments for '{name.decode('utf-8', 'replace')}'")
+
+
+async def handle_client(store: CacheStore, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            command = await read_reply(reader)
+            if not isinstance(command, list) or not command:
+                writer.write(_error("expected a command array"))
+                break
+            if command[0].upper() == b"QUIT":
+                writer.write(_simple("OK"))
+                break
+            writer.write(execute(store, command))
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, RespError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(socket_path: Optional[str], host: str, port: int, store: CacheStore):
+    handler = lambda r, w: handle_client(store, r, w)  # noqa: E731
+    if socket_path:
+        directory = os.path.dirname(socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(handler, path=socket_path)
+    else:
+        server = await asyncio.start_server(handler, host, port)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    async with server:
+        await stop.wait()
+    if socket_path and os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--socket', help="Listen on this Unix socket")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=6380)
+    parser.add_argument('--max-entries', type=int, default=SHARED_CACHE_MAX_ENTRIES)
+    parser.add_argument('--max-bytes', type=int, default=SHARED_CACHE_MAX_BYTES)
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.socket, args.host, args.port, CacheStore(args.max_entries, args.max_bytes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import io
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from ocr_engine import OCR_ENGINE, get_engine
+
+CAMERA_MAX_SESSIONS = int(os.getenv("CAMERA_MAX_SESSIONS", "8"))  # per API worker
+CAMERA_MAX_FRAME_BYTES = int(os.getenv("CAMERA_MAX_FRAME_BYTES", str(1024 * 1024)))
+CAMERA_MIN_FRAME_INTERVAL = float(os.getenv("CAMERA_MIN_FRAME_INTERVAL", "0.25"))  # seconds between frames sent to OCR
+CAMERA_IDLE_TIMEOUT = float(os.getenv("CAMERA_IDLE_TIMEOUT", "30"))
+CAMERA_MAX_SESSION_SECONDS = float(os.getenv("CAMERA_MAX_SESSION_SECONDS", "300"))
+CAMERA_CPU_BUDGET_SECONDS = float(os.getenv("CAMERA_CPU_BUDGET_SECONDS", "60"))  # OCR worker time per session
+CAMERA_BLUR_THRESHOLD = float(os.getenv("CAMERA_BLUR_THRESHOLD", "60"))  # variance of the Laplacian
+CAMERA_DUPLICATE_DISTANCE = int(os.getenv("CAMERA_DUPLICATE_DISTANCE", "4"))  # differing bits (of 64) of a repeated frame
+CAMERA_REGION_DISTANCE = int(os.getenv("CAMERA_REGION_DISTANCE", "6"))  # differing bits of an unchanged text region
+CAMERA_REREAD_BELOW = float(os.getenv("CAMERA_REREAD_BELOW", "85"))  # regions read with less confidence are OCR'd again
+CAMERA_MAX_REGIONS = int(os.getenv("CAMERA_MAX_REGIONS", "12"))
+CAMERA_REGION_SIMILARITY = 80  # rapidfuzz ratio at which two reads are the same piece of the label
+
+MAX_HASHES_PER_READ = 8
+GATE_SIDE = 480  # frames are judged (sharpness, duplicates) at this size so thresholds don't depend on resolution
+
+TextBlocks = List[Tuple[str, float]]
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+# Runs inside an OCR worker process. Drops the frame when it repeats the last
+# OCR'd frame or is too blurry to read; otherwise preprocesses it and OCRs only
+# the text regions that don't match a region already read well (`known_regions`).
+# Returns {'status': 'duplicate' | 'blurry' | 'ocr', 'hash', 'sharpness',
+# 'regions': [{'hash', 'blocks' (None when skipped)}], 'timings'}.
+def analyze_frame(image_bytes: bytes, previous_hash: Optional[int], known_regions: List[int],
+                  options: Optional[Dict] = None, engine: str = OCR_ENGINE) -> Dict:
+    import cv2
+    import numpy as np
+    from PIL import Image
+    from image_preprocess import PreprocessOptions, preprocess
+    from ocr_cache import difference_hash
+
+    timings = {}
+    started = time.perf_counter()
+    image = Image.open(io.BytesIO(image_bytes))
+    image.load()
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    timings['decode'] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    preview = image.convert('L')
+    preview.thumbnail((GATE_SIDE, GATE_SIDE))
+    frame_hash = difference_hash(preview)
+    outcome = {'hash': frame_hash, 'sharpness': None, 'regions': [], 'timings': timings}
+    if previous_hash is not None and hamming(frame_hash, previous_hash) <= CAMERA_DUPLICATE_DISTANCE:
+        timings['gate'] = _elapsed_ms(started)
+        return {**outcome, 'status': 'duplicate'}
+    sharpness = float(cv2.Laplacian(np.asarray(preview), cv2.CV_64F).var())
+    outcome['sharpness'] = round(sharpness, 1)
+    timings['gate'] = _elapsed_ms(started)
+    if sharpness < CAMERA_BLUR_THRESHOLD:
+        return {**outcome, 'status': 'blurry'}
+
+    started = time.perf_counter()
+    result = preprocess(np.asarray(image), PreprocessOptions.from_dict(options))
+    timings['preprocess'] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    ocr_engine = None
+    for crop in result.crops:
+        region_hash = difference_hash(Image.fromarray(crop))
+        if any(hamming(region_hash, known) <= CAMERA_REGION_DISTANCE for known in known_regions):
+            outcome['regions'].append({'hash': region_hash, 'blocks': None})
+            continue
+        ocr_engine = ocr_engine or get_engine(engine)
+        outcome['regions'].append({'hash': region_hash, 'blocks': ocr_engine.recognize(crop)})
+    timings['ocr'] = _elapsed_ms(started)
+    return {**outcome, 'status': 'ocr'}
+
+
+class RegionRead:
+    def __init__(self, result, hashes: List[int]):
+        self.result = result
+        self.hashes = hashes
+
+
+# State of one live-camera session, kept in the API process. Each OCR'd region
+# becomes an OCRAnalysisResult (via `analyze`); a read that matches an earlier
+# one replaces it only when it is more confident, and the running result is
+# `merge` over the kept reads, as for several uploaded photos.
+class CameraSession:
+    def __init__(self, analyze: Callable[[TextBlocks], Any], merge: Callable[[List[Any]], Any],
+                 max_regions: int = CAMERA_MAX_REGIONS, cpu_budget: float = CAMERA_CPU_BUDGET_SECONDS):
+        self.analyze = analyze
+        self.merge = merge
+        self.max_regions = max_regions
+        self.cpu_budget = cpu_budget
+        self.generation = 0  # bumped by reset(), so outcomes of frames sent before it are ignored
+        self.last_hash: Optional[int] = None
+        self.reads: List[RegionRead] = []
+        self.result = None
+        self.frames = {"received": 0, "processed": 0, "duplicate": 0, "blurry": 0, "superseded": 0,
+                       "too_large": 0, "busy": 0, "failed": 0}
+        self.regions_ocrd = 0
+        self.regions_reused = 0
+        self.cpu_seconds = 0.0
+        self._skipped_hashes: Deque[int] = deque(maxlen=4 * max_regions)
+        self._pushed = None
+
+    @property
+    def budget_exhausted(self) -> bool:
+        return self.cpu_seconds >= self.cpu_budget
+
+    def drop(self, reason: str):
+        self.frames[reason] += 1
+
+    # Hashes of regions that need no new OCR: read confidently, or judged
+    # (by content) to be a worse view of something already read
+    def known_regions(self) -> List[int]:
+        confident = [h for read in self.reads if read.result.confidence >= CAMERA_REREAD_BELOW for h in read.hashes]
+        return confident + list(self._skipped_hashes)
+
+    def reset(self):
+        self.generation += 1
+        self.last_hash = None
+        self.reads = []
+        self.result = None
+        self._skipped_hashes.clear()
+        self._pushed = None
+
+    # Fold a worker outcome into the session. Returns True when the running
+    # result changed and should be pushed to the client.
+    def apply(self, outcome: Dict) -> bool:
+        self.cpu_seconds += sum(outcome['timings'].values()) / 1000
+        if outcome['status'] != 'ocr':
+            self.drop(outcome['status'])
+            return False
+        self.frames["processed"] += 1
+        self.last_hash = outcome['hash']
+        for region in outcome['regions']:
+            if region['blocks'] is None:
+                self.regions_reused += 1
+                continue
+            self.regions_ocrd += 1
+            if region['blocks']:
+                self._add_read(self.analyze(region['blocks']), region['hash'])
+        if not self.reads:
+            return False
+        self.result = self.merge([read.result for read in self.reads])
+        pushed = (self.result.ingredients, self.result.raw_text, self.result.confidence)
+        if pushed == self._pushed:
+            return False
+        self._pushed = pushed
+        return True
+
+    def _add_read(self, result, region_hash: int):
+        from rapidfuzz import fuzz  # keep numpy off the startup path, as in main._dedupe_texts
+
+        text = ' '.join(result.raw_text.lower().split())
+        for i, read in enumerate(self.reads):
+            if fuzz.ratio(text, ' '.join(read.result.raw_text.lower().split())) >= CAMERA_REGION_SIMILARITY:
+                if result.confidence > read.result.confidence:
+                    self.reads[i] = RegionRead(result, (read.hashes + [region_hash])[-MAX_HASHES_PER_READ:])
+                else:
+                    self._skipped_hashes.append(region_hash)
+                return
+        self.reads.append(RegionRead(result, [region_hash]))
+        if len(self.reads) > self.max_regions:
+            self.reads.remove(min(self.reads, key=lambda r: r.result.confidence))
+
+    def info(self) -> Dict:
+        return {
+            "frames": dict(self.frames),
+            "regions": len(self.reads),
+            "regions_ocrd": self.regions_ocrd,
+            "regions_reused": self.regions_reused,
+            "cpu_seconds": round(self.cpu_seconds, 3),
+        }
@@ -0,0 +1,77 @@
+import time
+from typing import Dict, Optional
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+# Consecutive-failure circuit breaker. After `failure_threshold` failures in a
+# row the circuit opens and callers are turned away without trying; after
+# `reset_timeout` seconds it lets `half_open_probes` calls through, and the
+# first of them to succeed closes it again (a failure reopens it). Calls that
+# succeed but take longer than `slow_call` seconds count as failures, so an
+# upstream that answers only after long stalls is treated as down too.
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_probes: int = 1, slow_call: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = max(1, half_open_probes)
+        self.slow_call = slow_call or None
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probes = 0
+        self._probe_at = 0.0
+
+    # Whether a call may go ahead now; counts the rejection when it may not
+    def allow(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probes = 0
+        if self.state == HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) frees its slot after reset_timeout
+            if self._probes >= self.half_open_probes and time.monotonic() - self._probe_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            if self._probes >= self.half_open_probes:
+                self._probes = 0
+            self._probes += 1
+            self._probe_at = time.monotonic()
+        return True
+
+    def record(self, ok: bool, elapsed: float = 0.0):
+        if ok and (self.slow_call is None or elapsed <= self.slow_call):
+            self.failures = 0
+            self.state = CLOSED
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    # Seconds until the next probe is let through (0 when closed)
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN and self.retry_after() > 0
+
+    def info(self) -> Dict:
+        return {
+            "state": OPEN if self.is_open else (HALF_OPEN if self.state != CLOSED else CLOSED),
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_after": round(self.retry_after(), 1),
+        }
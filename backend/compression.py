@@ -0,0 +1,122 @@
+import os
+import zlib
+from typing import List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))  # fast levels; 11 is far too slow per request
+
+# Already-compressed payloads (images, archives) aren't worth recompressing
+COMPRESSIBLE_TYPES = (b"application/json", b"application/x-ndjson", b"text/", b"application/javascript")
+
+
+def parse_accept_encoding(header: str) -> List[Tuple[str, float]]:
+    accepted = []
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted.append((name.strip().lower(), quality))
+    return accepted
+
+
+# Brotli when the client takes it (smaller JSON at similar CPU), otherwise gzip
+def negotiate_encoding(header: Optional[str]) -> Optional[str]:
+    if not header:
+        return None
+    accepted = {name: quality for name, quality in parse_accept_encoding(header) if quality > 0}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=RESPONSE_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(RESPONSE_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    # Compress and flush, so streamed chunks (NDJSON) reach the client right away
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b'') -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+# ASGI middleware compressing JSON/text responses with brotli or gzip per the
+# request's Accept-Encoding. Small bodies are sent as-is; streaming responses
+# are compressed chunk by chunk.
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = RESPONSE_COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = next((value.decode('latin-1') for name, value in scope["headers"] if name == b"accept-encoding"), None)
+        encoding = negotiate_encoding(header)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = dict(start_message["headers"])
+                content_type = headers.get(b"content-type", b"")
+                if (b"content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES)
+                        or (not more_body and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding)
+                body = encoder.finish(body) if not more_body else encoder.chunk(body)
+                response_headers = [(k, v) for k, v in start_message["headers"] if k != b"content-length"]
+                response_headers.append((b"content-encoding", encoding.encode()))
+                response_headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    response_headers.append((b"content-length", str(len(body)).encode()))
+                await send({**start_message, "headers": response_headers})
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            body = encoder.chunk(body) if more_body else encoder.finish(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
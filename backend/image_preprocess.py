@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from preprocess_options import PREPROCESS_MAX_SIDE, PREPROCESS_TARGET_DPI, THRESHOLD_MODES, PreprocessOptions  # noqa: F401
+
+# A region (x, y, width, height) in processed-image pixels
+Region = Tuple[int, int, int, int]
+
+
+# Scale so the text lands near the target DPI, never exceeding max_side
+def resize(image: np.ndarray, options: PreprocessOptions, source_dpi: Optional[float] = None) -> np.ndarray:
+    height, width = image.shape[:2]
+    scale = 1.0
+    if source_dpi and source_dpi > 0:
+        scale = options.target_dpi / source_dpi
+    longest = max(height, width)
+    if longest * scale > options.max_side:
+        scale = options.max_side / longest
+    if abs(scale - 1.0) < 0.05:
+        return image
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=interpolation)
+
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+
+def binarize(gray: np.ndarray, mode: str) -> np.ndarray:
+    if mode == 'adaptive':
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15)
+    if mode == 'otsu':
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return binary
+    return gray
+
+
+# Estimate the dominant text angle from line-shaped blobs and rotate it level.
+# Only elongated blobs (text lines) vote, so background artwork doesn't skew the estimate.
+def deskew(gray: np.ndarray) -> Tuple[np.ndarray, float]:
+    height, width = gray.shape[:2]
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    lines = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, width // 80), 1)))
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    angles, weights = [], []
+    for contour in contours:
+        (_, _), (w, h), angle = cv2.minAreaRect(contour)
+        if w < h:
+            w, h = h, w
+            angle -= 90
+        if w < 60 or h < 4 or w < 4 * h:
+            continue
+        # Normalize to [-45, 45)
+        angle = (angle + 45) % 90 - 45
+        angles.append(angle)
+        weights.append(w)
+    if len(angles) < 3:
+        return gray, 0.0
+
+    order = np.argsort(angles)
+    cumulative = np.cumsum(np.asarray(weights)[order])
+    angle = float(np.asarray(angles)[order][np.searchsorted(cumulative, cumulative[-1] / 2)])  # weighted median
+    if abs(angle) < 0.5 or abs(angle) > 30:
+        return gray, 0.0
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    rotated = cv2.warpAffine(gray, matrix, (width, height), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+    return rotated, round(angle, 2)
+
+
+# Find dense text blocks (ingredient paragraphs, nutrition tables). Text strokes
+# give strong horizontal gradients; closing with a wide kernel merges the lines
+# of a block into one blob whose bounding box becomes a crop candidate.
+def detect_text_regions(gray: np.ndarray, options: PreprocessOptions) -> List[Region]:
+    height, width = gray.shape[:2]
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    kernel_width = max(9, width // 40)
+    kernel_height = max(5, height // 60)
+    closed = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_width, kernel_height)))
+    contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = options.min_region_fraction * width * height
+    regions = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w * h < min_area or w < 40 or h < 20:
+            continue
+        # Text blocks are filled with edges; mostly empty boxes are background
+        if cv2.countNonZero(mask[y:y + h, x:x + w]) < 0.08 * w * h:
+            continue
+        regions.append((x, y, w, h))
+
+    regions.sort(key=lambda r: r[2] * r[3], reverse=True)
+    regions = regions[:options.max_regions]
+    # Skip cropping when the best region is nearly the whole image anyway
+    if not regions or regions[0][2] * regions[0][3] > 0.85 * width * height:
+        return []
+
+    pad = max(4, min(width, height) // 100)
+    padded = []
+    for x, y, w, h in regions:
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(width, x + w + pad), min(height, y + h + pad)
+        padded.append((x0, y0, x1 - x0, y1 - y0))
+    # Read top-to-bottom, left-to-right
+    return sorted(padded, key=lambda r: (r[1], r[0]))
+
+
+@dataclass
+class PreprocessResult:
+    image: np.ndarray  # processed full image
+    crops: List[np.ndarray]  # images to OCR, in reading order
+    regions: List[Region]
+    skew_angle: float
+    scale: float
+
+
+def preprocess(image: np.ndarray, options: PreprocessOptions, source_dpi: Optional[float] = None) -> PreprocessResult:
+    original_height = image.shape[0]
+    if not options.enabled:
+        return PreprocessResult(image, [image], [], 0.0, 1.0)
+
+    image = resize(image, options, source_dpi)
+    scale = image.shape[0] / original_height
+    gray = to_grayscale(image) if options.grayscale or options.threshold != 'none' or options.deskew else image
+
+    angle = 0.0
+    if options.deskew:
+        gray, angle = deskew(gray)
+
+    regions = detect_text_regions(gray, options) if options.crop_regions else []
+    processed = binarize(gray, options.threshold) if gray.ndim == 2 else gray
+
+    crops = [processed[y:y + h, x:x + w] for x, y, w, h in regions] or [processed]
+    return PreprocessResult(processed, crops, regions, angle, round(scale, 4))
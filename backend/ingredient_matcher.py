@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Hidden sugars and harmful ingredients
+HIDDEN_SUGARS = ['maltodextrin', 'dextrose', 'fructose', 'sucrose', 'corn syrup', 'high fructose corn syrup',
+                 'fruit juice concentrate', 'honey', 'agave nectar', 'maple syrup', 'molasses']
+
+HARMFUL_ADDITIVES = ['sodium nitrate', 'sodium nitrite', 'potassium bromate', 'propyl paraben', 'butylated hydroxyanisole',
+                     'butylated hydroxytoluene', 'potassium iodate', 'azodicarbonamide', 'brominated vegetable oil']
+
+HEALTHY_INGREDIENTS = ['whole grain', 'olive oil', 'vegetable', 'fruit', 'nut', 'seed']
+
+# Allergen groups used by AlertEngine.check_allergy_alerts
+ALLERGY_KEYWORDS = {
+    'nuts': ['nut', 'almond', 'walnut', 'peanut', 'cashew', 'pistachio', 'hazelnut'],
+    'dairy': ['milk', 'cheese', 'butter', 'yogurt', 'cream', 'whey', 'casein'],
+    'gluten': ['wheat', 'barley', 'rye', 'gluten', 'bread', 'pasta'],
+    'soy': ['soy', 'soya', 'tofu', 'soybean'],
+    'eggs': ['egg', 'albumin', 'mayonnaise']
+}
+
+# Dietary exclusions used by AlertEngine.check_dietary_preference_alerts
+NON_VEGETARIAN_INGREDIENTS = ['meat', 'chicken', 'fish', 'pork', 'beef', 'gelatin', 'rennet']
+NON_VEGAN_INGREDIENTS = ['milk', 'cheese', 'butter', 'honey', 'egg', 'yogurt', 'whey']
+GLUTEN_INGREDIENTS = ['wheat', 'barley', 'rye', 'gluten']
+
+# Labels that make an ingredient count as harmful (alerts and health score).
+# risk_categories.json entries ('risk:*') are reported by scans but don't count.
+HARMFUL_LABELS = frozenset({'hidden_sugar', 'harmful_additive'})
+
+E_NUMBER_RE = re.compile(r'\be[\s-]?(\d{3,4}[a-z]?)\b')
+INGREDIENT_SPLIT_RE = re.compile(r',|\s*\(')
+PERCENTAGE_RE = re.compile(r'(\d+(\.\d+)?)%')
+
+
+# Split an ingredients text into (name, percentage) tokens, lowercased and stripped
+def iter_ingredient_tokens(ingredients_text: str) -> Iterator[Tuple[str, Optional[float]]]:
+    if not ingredients_text:
+        return
+    for line in INGREDIENT_SPLIT_RE.split(ingredients_text):
+        line = line.strip().lower()
+        if not line:
+            continue
+        
+        # Extract percentage if available
+        percentage = None
+        if '%' in line:
+            percentage_match = PERCENTAGE_RE.search(line)
+            if percentage_match:
+                percentage = float(percentage_match.group(1))
+                line = PERCENTAGE_RE.sub('', line).strip()
+        yield line, percentage
+
+
+def load_json(name: str) -> Dict:
+    try:
+        with open(os.path.join(BASE_DIR, name), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: could not load {name}: {e}")
+        return {}
+
+
+# Multi-pattern substring matcher (Aho-Corasick). Every keyword carries one or
+# more labels; a scan reports all keyword occurrences in a single pass over the
+# text, independent of how many keywords are registered.
+class AhoCorasick:
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, FrozenSet[str]]]] = [[]]
+        self._labels: Dict[str, Set[str]] = {}
+        self._built = False
+
+    def add(self, keyword: str, *labels: str):
+        keyword = keyword.lower()
+        if not keyword:
+            return
+        self._labels.setdefault(keyword, set()).update(labels)
+        self._built = False
+
+    def add_all(self, keywords: Iterable[str], *labels: str):
+        for keyword in keywords:
+            self.add(keyword, *labels)
+
+    def build(self) -> "AhoCorasick":
+        self._goto, self._fail, self._out = [{}], [0], [[]]
+        for keyword, labels in self._labels.items():
+            node = 0
+            for char in keyword:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = next_node
+            self._out[node].append((keyword, frozenset(labels)))
+
+        # Breadth-first failure links; each node inherits the outputs of its fail node
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        self._built = True
+        return self
+
+    # Yield (end_index, keyword, labels) for every occurrence in text (already lowercased)
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str, FrozenSet[str]]]:
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                for keyword, labels in out[node]:
+                    yield index + 1, keyword, labels
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def items(self) -> Iterator[Tuple[str, Set[str]]]:
+        return iter(self._labels.items())
+
+
+@dataclass
+class ScanResult:
+    labels: Set[str] = field(default_factory=set)
+    keywords: List[str] = field(default_factory=list)
+    additives: List[str] = field(default_factory=list)  # display names from ingredient_mapping.json
+    e_numbers: List[str] = field(default_factory=list)
+    allergens: List[str] = field(default_factory=list)  # risk_categories.json "allergens" keywords found
+    risk_harmful: List[str] = field(default_factory=list)  # risk_categories.json "harmful" keywords found
+
+    def has(self, label: str) -> bool:
+        return label in self.labels
+
+
+# Shared matcher compiled from every keyword list the backend knows about
+class IngredientMatcher:
+    def __init__(self):
+        self.automaton = AhoCorasick()
+        self.additive_names: Dict[str, str] = {}
+
+        self.automaton.add_all(HIDDEN_SUGARS, 'hidden_sugar')
+        self.automaton.add_all(HARMFUL_ADDITIVES, 'harmful_additive')
+        self.automaton.add_all(HEALTHY_INGREDIENTS, 'healthy')
+        for allergy, keywords in ALLERGY_KEYWORDS.items():
+            self.automaton.add_all(keywords, f'allergy:{allergy}')
+        self.automaton.add_all(NON_VEGETARIAN_INGREDIENTS, 'diet:non_vegetarian')
+        self.automaton.add_all(NON_VEGAN_INGREDIENTS, 'diet:non_vegan')
+        self.automaton.add_all(GLUTEN_INGREDIENTS, 'diet:gluten')
+
+        # risk_categories.json: {"harmful": [...], "moderate": [...], "allergens": [...]}. Harmful
+        # and allergen entries are reported by scan() (see bulk_scoring's ingredient flags);
+        # they don't change alerts or scores. "moderate" is not loaded: an ingredient that
+        # matches nothing is moderate already.
+        risk_categories = load_json('risk_categories.json')
+        self.automaton.add_all(risk_categories.get('harmful', []), 'risk:harmful')
+        self.automaton.add_all(risk_categories.get('allergens', []), 'risk:allergen')
+
+        # ingredient_mapping.json: keyword or E-number -> display name
+        for keyword, name in load_json('ingredient_mapping.json').items():
+            self.additive_names[keyword.lower()] = name
+            self.automaton.add(keyword, 'additive')
+
+        self.automaton.build()
+
+    # Single pass over text; text is lowercased here if it is not already
+    def scan(self, text: str) -> ScanResult:
+        result = ScanResult()
+        if not text:
+            return result
+        text = text.lower()
+        seen = set()
+        for _, keyword, labels in self.automaton.iter_matches(text):
+            result.labels |= labels
+            if keyword in seen:
+                continue
+            seen.add(keyword)
+            result.keywords.append(keyword)
+            if 'additive' in labels and self.additive_names[keyword] not in result.additives:
+                result.additives.append(self.additive_names[keyword])
+            if 'risk:allergen' in labels:
+                result.allergens.append(keyword)
+            if 'risk:harmful' in labels:
+                result.risk_harmful.append(keyword)
+        if 'e' in text:
+            for match in E_NUMBER_RE.finditer(text):
+                code = f"e{match.group(1)}"
+                if code not in result.e_numbers:
+                    result.e_numbers.append(code)
+                    name = self.additive_names.get(code)
+                    if name and name not in result.additives:
+                        result.additives.append(name)
+        return result
+
+    # Changes whenever a keyword list, label or additive name changes; results
+    # derived from scans (see analysis_store.py) are keyed on it
+    def fingerprint(self) -> str:
+        keywords = sorted((keyword, sorted(labels)) for keyword, labels in self.automaton.items())
+        payload = json.dumps([keywords, sorted(self.additive_names.items())], separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def is_harmful(self, ingredient: str) -> bool:
+        return not self.scan(ingredient).labels.isdisjoint(HARMFUL_LABELS)
+
+
+MATCHER = IngredientMatcher()
@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+OFF_LOCAL_INDEX_PATH = os.getenv("OFF_LOCAL_INDEX_PATH", "cache/off_index.sqlite3")
+
+# Fields of an Open Food Facts product that the analysis actually uses
+PROJECTED_FIELDS = ('product_name', 'brands', 'ingredients_text', 'nova_group', 'nutriscore_grade')
+PROJECTED_NUTRIMENTS = ('sugars_100g', 'salt_100g', 'saturated-fat_100g')
+
+
+def _to_float(value) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value) -> Optional[int]:
+    number = _to_float(value)
+    return int(number) if number is not None else None
+
+
+# Reduce a full OFF record (JSONL export or flattened CSV row) to the compact
+# shape stored in the index. Returns (barcode, product, last_modified) or None.
+def project_product(record: Dict) -> Optional[Tuple[str, Dict, int]]:
+    code = str(record.get('code') or record.get('_id') or '').strip()
+    if not code:
+        return None
+
+    product: Dict = {}
+    for field in PROJECTED_FIELDS:
+        value = record.get(field)
+        if value in (None, ''):
+            continue
+        product[field] = _to_int(value) if field == 'nova_group' else value
+    if product.get('nova_group') is None:
+        product.pop('nova_group', None)
+
+    # JSONL exports nest nutriments; CSV exports flatten them into columns
+    source = record.get('nutriments') if isinstance(record.get('nutriments'), dict) else record
+    nutriments = {}
+    for key in PROJECTED_NUTRIMENTS:
+        value = _to_float(source.get(key))
+        if value is not None:
+            nutriments[key] = value
+    if nutriments:
+        product['nutriments'] = nutriments
+
+    if not product:
+        return None
+    product['code'] = code
+    return code, product, _to_int(record.get('last_modified_t')) or 0
+
+
+# Read-only (from the API's point of view) barcode -> projected product index
+class LocalProductIndex:
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS products ("
+            "code TEXT PRIMARY KEY, data TEXT NOT NULL, last_modified INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    # Open the index only if it has been built; the API runs without one by default
+    @classmethod
+    def open_if_exists(cls, path: Optional[str] = OFF_LOCAL_INDEX_PATH) -> Optional["LocalProductIndex"]:
+        if path and os.path.exists(path):
+            return cls(path)
+        return None
+
+    def get(self, barcode: str) -> Optional[Dict]:
+        product = self.peek(barcode)
+        if product is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return product
+
+    # Lookup without counting a hit or miss (for background work such as prewarming)
+    def peek(self, barcode: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM products WHERE code = ?", (barcode,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def iter_products(self, batch_size: int = 5000) -> Iterator[Dict]:
+        last_code = ''
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT code, data FROM products WHERE code > ? ORDER BY code LIMIT ?", (last_code, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for _, data in rows:
+                yield json.loads(data)
+            last_code = rows[-1][0]
+
+    # Upsert a batch of projected products; older revisions never overwrite newer ones.
+    # Returns the number of rows written.
+    def upsert_many(self, rows: Iterable[Tuple[str, Dict, int]]) -> int:
+        payload = [(code, json.dumps(product, separators=(',', ':')), modified) for code, product, modified in rows]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT INTO products (code, data, last_modified) VALUES (?, ?, ?) "
+                "ON CONFLICT(code) DO UPDATE SET data = excluded.data, last_modified = excluded.last_modified "
+                "WHERE excluded.last_modified >= products.last_modified",
+                payload,
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def delete_many(self, barcodes: Iterable[str]) -> int:
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("DELETE FROM products WHERE code = ?", [(code,) for code in barcodes])
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def info(self) -> Dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        return {
+            "path": self.path,
+            "products": count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "last_ingest": self.get_meta('last_ingest'),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
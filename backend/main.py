@@ -1,47 +1,91 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import Depends, FastAPI, HTTPException, UploadFile, File, Header, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response, StreamingResponse
+import asyncio
+import math
 import re
+import time
 from typing import Dict, List, Optional
 from pydantic import BaseModel
-from PIL import Image
-import io
-import base64
 import os
-from supabase import create_client, Client
-import pytesseract
+import orjson
 from dotenv import load_dotenv
+from off_client import OpenFoodFactsClient, UpstreamError, UpstreamUnavailable
+from admission import AdmissionController, AdmissionMiddleware, PriorityClass
+from product_cache import ProductCache
+from analysis_store import AnalysisStore, rules_version
+from local_index import LocalProductIndex
+from popularity import PopularityTracker
+from prewarm import PrewarmScheduler
+from profile_cache import ProfileLoader
+from shared_cache import SharedCache
+from ocr_pool import OCRPool, OCRQueueFull, with_queue_time
+from camera_stream import (CAMERA_IDLE_TIMEOUT, CAMERA_MAX_FRAME_BYTES, CAMERA_MAX_SESSION_SECONDS, CAMERA_MAX_SESSIONS,
+                           CAMERA_MIN_FRAME_INTERVAL, CameraSession, analyze_frame)
+from ocr_cache import OCRResultCache
+from upload_stream import OCR_MAX_IMAGE_BYTES, OCR_UPLOAD_MEMORY_BUDGET, InvalidImageUpload, UploadTooLarge, decode_base64_upload
+from preprocess_options import PreprocessOptions
+from singleflight import SingleFlight
+from compression import CompressionMiddleware
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, Collected, MetricsMiddleware, observe_stage, stage_timer
+from search_index import (SEARCH_MAX_PAGE_SIZE, SEARCH_UPSTREAM_FALLBACK, STORED_FIELDS, SearchIndex,
+                          build_index, project_fields)
+from ingredient_matcher import HARMFUL_LABELS, INGREDIENT_SPLIT_RE, MATCHER, PERCENTAGE_RE, iter_ingredient_tokens
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Supabase client
+# Supabase client (async), created on first use by the profile loader
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_ANON_KEY")
+PROFILE_WEBHOOK_SECRET = os.getenv("PROFILE_WEBHOOK_SECRET")
+
+# Set to false on barcode-only instances: the OCR endpoints answer 404 and the
+# OCR stack (Pillow, OpenCV, Tesseract, worker processes) is never loaded
+OCR_ENABLED = os.getenv("OCR_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Cache tier shared by all worker processes (see serve.py); None when SHARED_CACHE_URL is unset
+shared_cache = SharedCache.from_env()
+
+# serve.py creates this file when shutdown begins, so /readyz fails while requests drain
+DRAIN_FILE = os.getenv("DRAIN_FILE")
+
+async def create_supabase_client():
+    # Imported here: supabase pulls in a large dependency tree that only profile lookups need
+    from supabase import acreate_client
+    return await acreate_client(supabase_url, supabase_key)
 
 if supabase_url and supabase_key:
-    supabase: Client = create_client(supabase_url, supabase_key)
+    profile_loader: Optional[ProfileLoader] = ProfileLoader(create_supabase_client, shared=shared_cache)
 else:
     print("Warning: Supabase credentials not found. Profile features will be disabled.")
-    supabase = None
+    profile_loader = None
 
-# Function to get user profile
-def get_user_profile(user_id: str) -> Optional[Dict]:
-    if not supabase:
-        return None
-    try:
-        response = supabase.table('profiles') \
-            .select('*') \
-            .eq('user_id', user_id) \
-            .execute()
-        if response.data and len(response.data) > 0:
-            return response.data[0]
-        return None
-    except Exception as e:
-        print(f"Error fetching profile: {e}")
+# Function to get user profile (cached; see profile_cache.py)
+async def get_user_profile(user_id: str) -> Optional[Dict]:
+    if not profile_loader:
         return None
+    with stage_timer("profile_fetch"):
+        return await profile_loader.get(user_id)
 
-app = FastAPI()
+# orjson serializes responses several times faster than the stdlib encoder
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# Concurrency limits per endpoint class, barcode lookups served ahead of OCR.
+# Requests that would queue too long get a fast 503 (see admission.py).
+admission = AdmissionController([
+    PriorityClass.from_env("barcode", 0, limit=48, max_wait=2.0, queue_size=256),
+    PriorityClass.from_env("batch", 1, limit=8, max_wait=2.0, queue_size=32),
+    PriorityClass.from_env("ocr", 2, limit=16, max_wait=1.0, queue_size=32),
+])
+app.add_middleware(AdmissionMiddleware, controller=admission, routes=[
+    ("/analyze-product", "barcode"),
+    ("/search-product/*", "barcode"),
+    ("/analyze-products", "batch"),
+    ("/analyze-image", "ocr"),
+    ("/analyze-images", "ocr"),
+    ("/analyze-image-base64", "ocr"),
+])
 
 # Enable CORS
 app.add_middleware(
@@ -50,8 +94,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Search-Source", "Server-Timing"],
 )
 
+# Brotli/gzip for larger JSON responses, negotiated from Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
+# Per-endpoint latency for /metrics, plus the optional Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
+# Readiness state (see /readyz). Hooks run in registration order: stopping is
+# flagged before any shutdown work, started only after every other startup hook.
+lifecycle = {"started": False, "stopping": False}
+
+@app.on_event("shutdown")
+async def mark_stopping():
+    lifecycle["stopping"] = True
+
 # Data models
 class Ingredient(BaseModel):
     name: str
@@ -87,62 +146,94 @@ class OCRAnalysisResult(BaseModel):
     categorized_text: CategorizedText
     raw_text: str
     confidence: float
+    timings: Optional[Dict[str, float]] = None  # per-stage milliseconds
+
+# Shared, connection-pooled Open Food Facts client
+off_client = OpenFoodFactsClient()
+
+# Upstream product fetch; only cache misses and revalidations get here
+async def fetch_off_product(barcode: str) -> Optional[Dict]:
+    with stage_timer("off_fetch"):
+        return await off_client.get_product(barcode)
+
+# Read-through product cache (memory LRU + on-disk store) in front of Open Food Facts
+product_cache = ProductCache(fetch_off_product, shared=shared_cache)
+
+# Local barcode index built from an OFF bulk export (see off_ingest.py); None if not built
+local_index = LocalProductIndex.open_if_exists()
+
+# Lookups per barcode, persisted across restarts; drives prewarming (see below)
+popularity = PopularityTracker()
+
+# Runs before the product cache and the client close, since the prewarmer fetches through them
+@app.on_event("shutdown")
+async def stop_prewarm():
+    await prewarm.aclose()
+
+@app.on_event("shutdown")
+async def close_off_client():
+    await product_cache.aclose()
+    await off_client.aclose()
+    if local_index:
+        local_index.close()
 
-# Hidden sugars and harmful ingredients
-HIDDEN_SUGARS = ['maltodextrin', 'dextrose', 'fructose', 'sucrose', 'corn syrup', 'high fructose corn syrup', 
-                 'fruit juice concentrate', 'honey', 'agave nectar', 'maple syrup', 'molasses']
+# Product name search over everything we hold locally (local index + product cache).
+# Built in the background at startup; products fetched later are added as they arrive.
+search_index = SearchIndex()
+search_index_build: Optional[asyncio.Task] = None
 
-HARMFUL_ADDITIVES = ['sodium nitrate', 'sodium nitrite', 'potassium bromate', 'propyl paraben', 'butylated hydroxyanisole',
-                     'butylated hydroxytoluene', 'potassium iodate', 'azodicarbonamide', 'brominated vegetable oil']
+async def rebuild_search_index():
+    global search_index
+    sources = [product_cache.iter_products()] + ([local_index.iter_products()] if local_index else [])
+    built = await asyncio.to_thread(build_index, *sources)
+    # Keep anything fetched while the build was running
+    built.add_many(doc for doc in search_index.documents() if doc['code'] not in built)
+    search_index, previous = built, search_index
+    previous.close()
 
-# Fetch product data from Open Food Facts
-def get_product_data(barcode: str) -> Optional[Dict]:
-    url = f"https://world.openfoodfacts.org/api/v0/product/{barcode}.json"
+@app.on_event("startup")
+async def start_search_index_build():
+    global search_index_build
+    search_index_build = asyncio.create_task(rebuild_search_index())
+
+# Fetch product data: local index first, then the product cache / Open Food Facts.
+# While the OFF circuit breaker is open, cached and local products are still
+# served and an uncached barcode raises UpstreamUnavailable without waiting.
+async def get_product_data(barcode: str) -> Optional[Dict]:
+    popularity.record(barcode)
+    if local_index:
+        # SQLite read in a thread, like the product cache's disk tier
+        product = await asyncio.to_thread(local_index.get, barcode)
+        if product:
+            return product
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('status') == 1:
-                return data['product']
-        return None
-    except Exception:
+        product = await product_cache.get(barcode)
+    except UpstreamUnavailable:
+        raise
+    except UpstreamError as e:
+        print(f"Error fetching product {barcode}: {e}")
         return None
+    if product and barcode not in search_index:
+        search_index.add({'code': barcode, **product})
+    return product
 
 # Parse ingredients text and extract percentages
 def parse_ingredients(ingredients_text: str) -> List[Ingredient]:
     ingredients = []
-    if not ingredients_text:
-        return ingredients
-    
-    # Split ingredients by commas or other separators
-    lines = re.split(r',|\s*\(', ingredients_text)
     
-    for line in lines:
-        line = line.strip().lower()
-        if not line:
-            continue
-            
-        # Extract percentage if available
-        percentage = None
-        percentage_match = re.search(r'(\d+(\.\d+)?)%', line)
-        if percentage_match:
-            percentage = float(percentage_match.group(1))
-            line = re.sub(r'(\d+(\.\d+)?)%', '', line).strip()
-        
-        # Check if ingredient is harmful
+    # Split ingredients by commas or other separators, extracting percentages
+    for line, percentage in iter_ingredient_tokens(ingredients_text):
+        # Check if ingredient is harmful (one pass over the line for every keyword list)
         is_harmful = False
         category = "moderate"
+        labels = MATCHER.scan(line).labels
         
-        # Check for hidden sugars
-        if any(sugar in line for sugar in HIDDEN_SUGARS):
-            is_harmful = True
-            category = "harmful"
-        # Check for harmful additives
-        elif any(additive in line for additive in HARMFUL_ADDITIVES):
+        # Check for hidden sugars or harmful additives
+        if not labels.isdisjoint(HARMFUL_LABELS):
             is_harmful = True
             category = "harmful"
         # Check for generally healthy ingredients
-        elif any(healthy in line for healthy in ['whole grain', 'olive oil', 'vegetable', 'fruit', 'nut', 'seed']):
+        elif 'healthy' in labels:
             category = "good"
         
         ingredients.append(Ingredient(
@@ -235,12 +326,16 @@ def calculate_health_score(product_data: Dict, ingredients: List[Ingredient], al
 
 # personalized health recommendation 
 def get_personalized_recommendations(product_data: Dict, ingredients: List[Ingredient], conditions: List[str], allergies: List[str]) -> List[str]:
+    return recommendations_for_names(product_data, [ing.name for ing in ingredients], conditions, allergies)
+
+# Same, from ingredient names alone (as found in a stored analysis)
+def recommendations_for_names(product_data: Dict, ingredient_names: List[str], conditions: List[str], allergies: List[str]) -> List[str]:
     recommendations = []
     nutriments = product_data.get('nutriments', {})
     
     # Check for medical conditions
     conditions_lower = [cond.lower() for cond in conditions]
-    ingredients_lower = [ing.name.lower() for ing in ingredients]
+    ingredients_lower = [name.lower() for name in ingredient_names]
     
     # Diabetes/Sugar conditions
     if any(cond in conditions_lower for cond in ['diabetes', 'sugar', 'diabetic']):
@@ -286,45 +381,41 @@ def get_personalized_recommendations(product_data: Dict, ingredients: List[Ingre
     
     return recommendations
 
-# Main endpoint to analyze product
-# Update the analyze-product endpoint to accept user_id
-@app.post("/analyze-product", response_model=ProductAnalysis)
-async def analyze_product(barcode: str, user_id: Optional[str] = None):
-    # Fetch product data from Open Food Facts
-    product_data = get_product_data(barcode)
-    if not product_data:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
+PROCESSING_LEVELS = {
+    1: "Unprocessed or minimally processed",
+    2: "Processed culinary ingredients",
+    3: "Processed foods",
+    4: "Ultra-processed foods"
+}
+
+# Build the full analysis for a product, optionally personalized with a user profile
+def build_product_analysis(product_data: Dict, user_profile: Optional[Dict] = None) -> ProductAnalysis:
     # Parse ingredients
     ingredients_text = product_data.get('ingredients_text', '')
-    ingredients = parse_ingredients(ingredients_text)
+    with stage_timer("parse_ingredients"):
+        ingredients = parse_ingredients(ingredients_text)
     
     # Generate alerts
-    alerts = generate_alerts(product_data, ingredients)
+    with stage_timer("generate_alerts"):
+        alerts = generate_alerts(product_data, ingredients)
     
     # Calculate health score
-    health_score = calculate_health_score(product_data, ingredients, alerts)
+    with stage_timer("calculate_health_score"):
+        health_score = calculate_health_score(product_data, ingredients, alerts)
     
-    # Get user profile and generate personalized recommendations
+    # Generate personalized recommendations
     personalized_recommendations = []
-    if user_id:
-        user_profile = get_user_profile(user_id)
-        if user_profile:
-            conditions = user_profile.get('medical_conditions', [])
-            allergies = user_profile.get('allergies', [])
+    if user_profile:
+        conditions = user_profile.get('medical_conditions', [])
+        allergies = user_profile.get('allergies', [])
+        with stage_timer("personalized_recommendations"):
             personalized_recommendations = get_personalized_recommendations(
                 product_data, ingredients, conditions, allergies
             )
     
     # Determine processing level
     nova_group = product_data.get('nova_group', 1)
-    processing_levels = {
-        1: "Unprocessed or minimally processed",
-        2: "Processed culinary ingredients",
-        3: "Processed foods",
-        4: "Ultra-processed foods"
-    }
-    processing_level = processing_levels.get(nova_group, "Unknown")
+    processing_level = PROCESSING_LEVELS.get(nova_group, "Unknown")
     
     return ProductAnalysis(
         product_name=product_data.get('product_name', 'Unknown Product'),
@@ -337,18 +428,231 @@ async def analyze_product(barcode: str, user_id: Optional[str] = None):
         personalized_recommendations=personalized_recommendations
     )
 
-# Endpoint for product search by name
+# --- Materialized product-only analyses ---
+# Everything except the personalized recommendations depends only on the product,
+# so it is computed once per barcode and stored as JSON (analysis_store.py).
+# Requests add the profile-dependent overlay on top.
+
+# The product fields the base analysis reads; a change to any of them re-materializes
+def analysis_inputs(product_data: Dict) -> Dict:
+    nutriments = product_data.get('nutriments') or {}
+    return {
+        'product_name': product_data.get('product_name'),
+        'brands': product_data.get('brands'),
+        'ingredients_text': product_data.get('ingredients_text'),
+        'nova_group': product_data.get('nova_group'),
+        'nutriscore_grade': product_data.get('nutriscore_grade'),
+        'nutriments': {k: nutriments.get(k) for k in ('sugars_100g', 'salt_100g', 'saturated-fat_100g')},
+    }
+
+def build_base_analysis_json(product_data: Dict) -> str:
+    return build_product_analysis(product_data).model_dump_json()
+
+# Bump whenever the product-only analysis changes: the response models,
+# ingredient parsing, alerts, scoring or the fields read from a product
+ANALYSIS_RULES_REVISION = 3
+
+# Stored analyses are keyed on this: a new revision, or a change to the keyword
+# lists, their JSON files or the ingredient tokenizer, makes old entries unreachable
+ANALYSIS_RULES_VERSION = rules_version(
+    ANALYSIS_RULES_REVISION,
+    sorted(PROCESSING_LEVELS.items()),
+    INGREDIENT_SPLIT_RE.pattern,
+    PERCENTAGE_RE.pattern,
+    MATCHER.fingerprint(),
+)
+analysis_store = AnalysisStore(build_base_analysis_json, ANALYSIS_RULES_VERSION, analysis_inputs, shared=shared_cache)
+
+@app.on_event("shutdown")
+async def close_analysis_store():
+    analysis_store.close()
+
+# Everything a request would fill in for a product, done ahead of demand by the prewarmer
+async def warm_product(barcode: str, product_data: Dict) -> bool:
+    if barcode not in search_index:
+        search_index.add({'code': barcode, **product_data})
+    return await analysis_store.warm(barcode, product_data)
+
+# Keeps the most requested products and their analyses warm: loaded at startup,
+# refreshed before they go stale, at a bounded rate toward Open Food Facts
+prewarm = PrewarmScheduler(popularity, product_cache, off_client.breaker, warm_product,
+                           local=local_index.peek if local_index else None)
+
+@app.on_event("startup")
+async def start_prewarm():
+    prewarm.start()
+
+# (conditions, allergies) the overlay checks, or None when the profile has none,
+# in which case the stored analysis is already the complete answer
+def profile_checks(user_profile: Optional[Dict]) -> Optional[tuple]:
+    if not user_profile:
+        return None
+    conditions = user_profile.get('medical_conditions') or []
+    allergies = user_profile.get('allergies') or []
+    return (conditions, allergies) if conditions or allergies else None
+
+async def get_base_analysis(barcode: str, product_data: Dict) -> str:
+    with stage_timer("analysis_store"):
+        return await analysis_store.get(barcode, product_data)
+
+# Parse a `fields=` projection parameter, rejecting names the response doesn't have
+def parse_fields(fields: Optional[str], allowed) -> Optional[List[str]]:
+    if not fields:
+        return None
+    field_list = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = set(field_list) - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return field_list
+
+def upstream_unavailable_response(e: UpstreamUnavailable) -> HTTPException:
+    return HTTPException(status_code=503, detail="Product data is temporarily unavailable, please retry shortly",
+                         headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
+# Main endpoint to analyze product
+# Update the analyze-product endpoint to accept user_id
+@app.post("/analyze-product", response_model=ProductAnalysis)
+async def analyze_product(
+    barcode: str,
+    user_id: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+):
+    field_list = parse_fields(fields, ProductAnalysis.model_fields)
+    # Fetch product data from Open Food Facts
+    try:
+        product_data = await get_product_data(barcode)
+    except UpstreamUnavailable as e:
+        raise upstream_unavailable_response(e)
+    if not product_data:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    # Get user profile for personalized recommendations
+    user_profile = await get_user_profile(user_id) if user_id else None
+    
+    base = await get_base_analysis(barcode, product_data)
+    checks = profile_checks(user_profile)
+    if checks is None and not field_list:
+        # Stored JSON goes out as is: no model validation, no serialization
+        return Response(base, media_type="application/json")
+    
+    # Profile-dependent overlay on top of the stored analysis
+    analysis = orjson.loads(base)
+    if checks is not None:
+        with stage_timer("personalized_recommendations"):
+            analysis['personalized_recommendations'] = recommendations_for_names(
+                product_data, [ing['name'] for ing in analysis['ingredients']], *checks)
+    if field_list:
+        analysis = {name: analysis[name] for name in field_list}
+    return ORJSONResponse(analysis)
+
+# Batch analysis of many barcodes in one call
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+
+class BatchAnalysisRequest(BaseModel):
+    barcodes: List[str]
+    user_id: Optional[str] = None
+    stream: bool = False  # respond with NDJSON, one line per item as it completes
+
+class BatchItemResult(BaseModel):
+    index: int
+    barcode: str
+    success: bool
+    analysis: Optional[ProductAnalysis] = None
+    error: Optional[str] = None
+    status_code: int
+
+class BatchAnalysisResponse(BaseModel):
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
+
+async def analyze_batch_item(index: int, barcode: str, user_profile: Optional[Dict], semaphore: asyncio.Semaphore) -> BatchItemResult:
+    try:
+        async with semaphore:
+            product_data = await get_product_data(barcode)
+    except UpstreamUnavailable as e:
+        return BatchItemResult(index=index, barcode=barcode, success=False, error=str(e), status_code=503)
+    if not product_data:
+        return BatchItemResult(index=index, barcode=barcode, success=False, error="Product not found", status_code=404)
+    try:
+        analysis = ProductAnalysis.model_validate_json(await get_base_analysis(barcode, product_data))
+        checks = profile_checks(user_profile)
+        if checks is not None:
+            analysis.personalized_recommendations = recommendations_for_names(
+                product_data, [ing.name for ing in analysis.ingredients], *checks)
+    except Exception as e:
+        return BatchItemResult(index=index, barcode=barcode, success=False, error=f"Analysis failed: {str(e)}", status_code=500)
+    return BatchItemResult(index=index, barcode=barcode, success=True, analysis=analysis, status_code=200)
+
+@app.post("/analyze-products", response_model=BatchAnalysisResponse)
+async def analyze_products(request: BatchAnalysisRequest):
+    if not request.barcodes:
+        raise HTTPException(status_code=400, detail="No barcodes provided")
+    if len(request.barcodes) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Too many barcodes (max {BATCH_MAX_ITEMS})")
+    
+    # Load the profile once for the whole batch
+    user_profile = await get_user_profile(request.user_id) if request.user_id else None
+    
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(analyze_batch_item(i, barcode.strip(), user_profile, semaphore))
+        for i, barcode in enumerate(request.barcodes)
+    ]
+    
+    if request.stream:
+        async def stream_results():
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    item = await next_done
+                    yield item.model_dump_json() + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+        return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+    
+    results = await asyncio.gather(*tasks)
+    succeeded = sum(1 for item in results if item.success)
+    return BatchAnalysisResponse(results=results, succeeded=succeeded, failed=len(results) - succeeded)
+
+# Coalesces identical in-flight upstream search queries
+search_flights = SingleFlight()
+search_stats = {"upstream_errors": 0}
+
+# Endpoint for product search by name (autocomplete). Served from the local search
+# index; Open Food Facts is only asked when nothing local matches.
 @app.get("/search-product/{product_name}")
-async def search_product(product_name: str):
-    url = f"https://world.openfoodfacts.org/cgi/search.pl?search_terms={product_name}&search_simple=1&json=1"
+async def search_product(
+    product_name: str,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=SEARCH_MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+):
+    field_list = parse_fields(fields, STORED_FIELDS)
+
+    # Results are plain dicts, so they go straight to orjson without FastAPI's encoder pass
+    with stage_timer("search_index"):
+        result = search_index.search(product_name, offset=(page - 1) * page_size, limit=page_size)
+    if result.total or not SEARCH_UPSTREAM_FALLBACK:
+        return ORJSONResponse([project_fields(doc, field_list) for _, doc in result.hits],
+                              headers={"X-Total-Count": str(result.total), "X-Search-Source": "local"})
+
+    # Identical concurrent queries share one upstream search
+    query = ' '.join(product_name.lower().split())
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('products', [])[:10]  # Return top 10 results
-        return []
-    except Exception:
+        with stage_timer("off_search"):
+            products = await search_flights.do((query, page, page_size), lambda: off_client.search(query, page_size=page_size, page=page))
+    except UpstreamError as e:
+        search_stats["upstream_errors"] += 1
+        print(f"Error searching products: {e}")
         return []
+    for product in products:
+        if product.get('code') and product['code'] not in search_index:
+            search_index.add(product)
+    # Full OFF products run to hundreds of KB; only the projected fields are sent on
+    return ORJSONResponse([project_fields(product, field_list) for product in products],
+                          headers={"X-Search-Source": "upstream"})
 
 # --- OCR helper functions using pytesseract ---
 def categorize_text(text_blocks: List[tuple]) -> CategorizedText:
@@ -404,53 +708,557 @@ def extract_ingredients(text_blocks: List[str]) -> List[str]:
                 ingredients.append(ing.capitalize())
     return ingredients
 
-# --- OCR endpoints using pytesseract ---
-@app.post("/analyze-image", response_model=OCRAnalysisResult)
-async def analyze_image(file: UploadFile = File(...)):
+# --- OCR endpoints (Tesseract via ocr_engine.py) ---
+# Tesseract runs in a bounded worker process pool so it never blocks the event loop
+ocr_pool = OCRPool()
+
+# Content-addressed OCR results, so resubmitted photos skip Tesseract entirely
+ocr_cache = OCRResultCache(shared=shared_cache, engine=ocr_pool.engine)
+ocr_flights = SingleFlight()
+
+@app.on_event("shutdown")
+async def close_ocr_pool():
+    ocr_pool.shutdown()
+    ocr_cache.close()
+
+def require_ocr():
+    if not OCR_ENABLED:
+        raise HTTPException(status_code=404, detail="OCR is not enabled on this instance")
+
+def ocr_queue_full_response(e: OCRQueueFull) -> HTTPException:
+    return HTTPException(status_code=503, detail="OCR service is busy, please retry shortly",
+                         headers={"Retry-After": str(e.retry_after)})
+
+# Worker timing keys -> stage names in nutrilabel_stage_seconds
+OCR_STAGE_NAMES = {'decode': 'image_decode', 'ocr': 'ocr'}
+
+# Run OCR on raw image bytes and build the analysis result, reusing the cached
+# result for an image we've already seen (identical concurrent uploads share one job)
+async def run_ocr_analysis(contents: bytes, preprocess_options: Optional[Dict] = None) -> OCRAnalysisResult:
+    started = time.perf_counter()
+    cached, key, phash = await ocr_cache.get(contents, preprocess_options)
+    elapsed = time.perf_counter() - started
+    observe_stage("ocr_cache", elapsed)
+    if cached is not None:
+        result = OCRAnalysisResult(**cached)
+        result.timings = {'cache': round(elapsed * 1000, 2)}
+        return result
+
+    async def analyze() -> OCRAnalysisResult:
+        result = await analyze_ocr_uncached(contents, preprocess_options)
+        ocr_cache.put(key, result.model_dump(exclude={'timings'}), phash)
+        return result
+
+    result = await ocr_flights.do(key, analyze)
+    return result.model_copy(deep=True)
+
+async def analyze_ocr_uncached(contents: bytes, preprocess_options: Optional[Dict] = None) -> OCRAnalysisResult:
+    text_blocks, timings = await ocr_pool.run(contents, preprocess_options)
+    observe_ocr_timings(timings)
+
+    started = time.perf_counter()
+    result = analyze_text_blocks(text_blocks)
+    timings['analyze'] = round((time.perf_counter() - started) * 1000, 2)
+    observe_stage("ocr_analyze", timings['analyze'] / 1000)
+    result.timings = timings
+    return result
+
+# Stages timed inside the worker process (decode, preprocess, ocr, postprocess, ...)
+def observe_ocr_timings(timings: Dict[str, float]):
+    for name, ms in timings.items():
+        observe_stage(OCR_STAGE_NAMES.get(name, f"ocr_{name}"), ms / 1000)
+
+def analyze_text_blocks(text_blocks: List[tuple]) -> OCRAnalysisResult:
+    all_text = [t[0] for t in text_blocks]
+    avg_confidence = (sum([t[1] for t in text_blocks]) / len(text_blocks)) * 100 if text_blocks else 0
+
+    ingredients = extract_ingredients(all_text)
+    categorized = categorize_text(text_blocks)
+    raw_text = '\n'.join(all_text)
+
+    return OCRAnalysisResult(
+        success=True,
+        ingredients=ingredients,
+        categorized_text=categorized,
+        raw_text=raw_text,
+        confidence=round(avg_confidence, 2),
+    )
+
+# Per-request image preprocessing options (see image_preprocess.PreprocessOptions)
+def parse_preprocess_options(values) -> Optional[Dict]:
+    if isinstance(values, bool):
+        values = {"enabled": values}
+    if not values:
+        return None
+    try:
+        options = PreprocessOptions.from_dict(values)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid preprocessing options: {str(e)}")
+    # Switched off, the other options don't matter: one cache entry for the plain pipeline
+    return options.as_dict() if options.enabled else None
+
+@app.post("/analyze-image", response_model=OCRAnalysisResult, dependencies=[Depends(require_ocr)])
+async def analyze_image(
+    file: UploadFile = File(...),
+    preprocess: Optional[bool] = None,
+    crop_regions: Optional[bool] = None,
+    deskew: Optional[bool] = None,
+    threshold: Optional[str] = None,
+    max_side: Optional[int] = None,
+):
+    options = parse_preprocess_options({
+        "enabled": preprocess, "crop_regions": crop_regions, "deskew": deskew,
+        "threshold": threshold, "max_side": max_side,
+    })
+    if file.size is not None and file.size > OCR_MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {OCR_MAX_IMAGE_BYTES} bytes")
     try:
         contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-
-        # OCR using pytesseract
-        ocr_result = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-        text_blocks = [(ocr_result['text'][i], float(ocr_result['conf'][i])/100 if ocr_result['conf'][i] != '-1' else 0.5) 
-                       for i in range(len(ocr_result['text'])) if ocr_result['text'][i].strip() != '']
-        all_text = [t[0] for t in text_blocks]
-        avg_confidence = (sum([t[1] for t in text_blocks]) / len(text_blocks)) * 100 if text_blocks else 0
-
-        ingredients = extract_ingredients(all_text)
-        categorized = categorize_text(text_blocks)
-        raw_text = '\n'.join(all_text)
-
-        return OCRAnalysisResult(
-            success=True,
-            ingredients=ingredients,
-            categorized_text=categorized,
-            raw_text=raw_text,
-            confidence=round(avg_confidence, 2)
-        )
+        return await run_ocr_analysis(contents, options)
+    except OCRQueueFull as e:
+        raise ocr_queue_full_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OCR processing failed: {str(e)}")
 
-# Base64 endpoint
-@app.post("/analyze-image-base64", response_model=OCRAnalysisResult)
-async def analyze_image_base64(image_data: dict):
+# --- Multi-image OCR: several photos of one label (front, ingredients, nutrition panel) ---
+OCR_MAX_IMAGES_PER_REQUEST = int(os.getenv("OCR_MAX_IMAGES_PER_REQUEST", "6"))
+INGREDIENT_DEDUP_SIMILARITY = 90  # rapidfuzz ratio at which two OCR'd ingredients count as the same
+
+class ImageOCRSummary(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    success: bool
+    confidence: float = 0.0
+    error: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
+
+class MultiImageOCRResult(OCRAnalysisResult):
+    images: List[ImageOCRSummary]
+
+def _dedupe_texts(texts: List[str], threshold: Optional[int] = None) -> List[str]:
+    from rapidfuzz import fuzz  # rapidfuzz imports numpy; keep it off the startup path
+
+    kept, seen = [], []
+    for text in texts:
+        key = ' '.join(text.lower().split())
+        if not key:
+            continue
+        if any(key == other or (threshold and fuzz.ratio(key, other) >= threshold) for other in seen):
+            continue
+        seen.append(key)
+        kept.append(text)
+    return kept
+
+# Combine per-image results into one. Ingredients and text are deduplicated across
+# photos (overlapping shots repeat text); for a nutrition fact or brand seen on
+# several images, the most confident image wins.
+def merge_ocr_results(results: List[OCRAnalysisResult]) -> OCRAnalysisResult:
+    by_confidence = sorted(results, key=lambda r: r.confidence, reverse=True)
+    nutrition_facts: Dict[str, str] = {}
+    seen_facts = set()
+    for result in by_confidence:
+        for name, value in result.categorized_text.nutrition_facts.items():
+            if name.lower() not in seen_facts:
+                seen_facts.add(name.lower())
+                nutrition_facts[name] = value
+
+    categorized = CategorizedText(
+        brand_name=next((r.categorized_text.brand_name for r in by_confidence if r.categorized_text.brand_name), None),
+        slogans=_dedupe_texts([t for r in results for t in r.categorized_text.slogans]),
+        marketing_text=_dedupe_texts([t for r in results for t in r.categorized_text.marketing_text]),
+        nutrition_facts=nutrition_facts,
+        miscellaneous=_dedupe_texts([t for r in results for t in r.categorized_text.miscellaneous]),
+    )
+    return OCRAnalysisResult(
+        success=True,
+        ingredients=_dedupe_texts([i for r in results for i in r.ingredients], INGREDIENT_DEDUP_SIMILARITY),
+        categorized_text=categorized,
+        raw_text='\n\n'.join(r.raw_text for r in results if r.raw_text),
+        confidence=round(sum(r.confidence for r in results) / len(results), 2),
+    )
+
+# All photos are OCR'd concurrently on the worker pool, so latency tracks the
+# slowest image rather than the sum
+@app.post("/analyze-images", response_model=MultiImageOCRResult, dependencies=[Depends(require_ocr)])
+async def analyze_images(
+    files: List[UploadFile] = File(...),
+    preprocess: Optional[bool] = None,
+    crop_regions: Optional[bool] = None,
+    deskew: Optional[bool] = None,
+    threshold: Optional[str] = None,
+    max_side: Optional[int] = None,
+):
+    if len(files) > OCR_MAX_IMAGES_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"At most {OCR_MAX_IMAGES_PER_REQUEST} images per request")
+    options = parse_preprocess_options({
+        "enabled": preprocess, "crop_regions": crop_regions, "deskew": deskew,
+        "threshold": threshold, "max_side": max_side,
+    })
+    for file in files:
+        if file.size is not None and file.size > OCR_MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail=f"{file.filename}: image exceeds {OCR_MAX_IMAGE_BYTES} bytes")
+
+    started = time.perf_counter()
+    contents = [await file.read() for file in files]
+    outcomes = await asyncio.gather(*(run_ocr_analysis(c, options) for c in contents), return_exceptions=True)
+    if any(isinstance(o, OCRQueueFull) for o in outcomes):
+        raise ocr_queue_full_response(next(o for o in outcomes if isinstance(o, OCRQueueFull)))
+
+    summaries, succeeded = [], []
+    for i, (file, outcome) in enumerate(zip(files, outcomes)):
+        if isinstance(outcome, BaseException):
+            summaries.append(ImageOCRSummary(index=i, filename=file.filename, success=False, error=str(outcome)))
+        else:
+            succeeded.append(outcome)
+            summaries.append(ImageOCRSummary(index=i, filename=file.filename, success=True,
+                                             confidence=outcome.confidence, timings=outcome.timings))
+    if not succeeded:
+        raise HTTPException(status_code=500, detail=f"OCR processing failed: {summaries[0].error}")
+
+    merged = merge_ocr_results(succeeded)
+    merged.timings = {
+        'total': round((time.perf_counter() - started) * 1000, 2),
+        'slowest_image': round(max((sum(r.timings.values()) for r in succeeded if r.timings), default=0.0), 2),
+    }
+    return MultiImageOCRResult(**merged.model_dump(), images=summaries)
+
+# Base64 endpoint. The JSON body ({"image": "<base64 or data URL>", "preprocess": {...}})
+# is decoded as it streams in, straight into a single image buffer; oversized and
+# non-image payloads are rejected before the rest of the body is read.
+BASE64_UPLOAD_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": {
+            "type": "object",
+            "required": ["image"],
+            "properties": {
+                "image": {"type": "string", "description": "Base64 image or data URL"},
+                "preprocess": {"anyOf": [{"type": "boolean"}, {"type": "object"}]},
+            },
+        }}},
+    },
+}
+upload_stats = {"max_peak_bytes": 0, "budget_bytes": OCR_UPLOAD_MEMORY_BUDGET, "rejected": 0}
+
+@app.post("/analyze-image-base64", response_model=OCRAnalysisResult, openapi_extra=BASE64_UPLOAD_SCHEMA,
+          dependencies=[Depends(require_ocr)])
+async def analyze_image_base64(request: Request):
+    content_length = request.headers.get('content-length')
     try:
-        image_base64 = image_data.get('image')
-        if not image_base64:
-            raise HTTPException(status_code=400, detail="No image data provided")
-        if ',' in image_base64:
-            image_base64 = image_base64.split(',')[1]
-        image_bytes = base64.b64decode(image_base64)
-        image = Image.open(io.BytesIO(image_bytes))
-        return await analyze_image(UploadFile(file=io.BytesIO(image_bytes), filename="image.png"))
+        with stage_timer("upload_decode"):
+            image_bytes, image_data, peak_bytes = await decode_base64_upload(
+                request.stream(), int(content_length) if content_length and content_length.isdigit() else None)
+    except UploadTooLarge as e:
+        upload_stats["rejected"] += 1
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidImageUpload as e:
+        upload_stats["rejected"] += 1
+        raise HTTPException(status_code=400, detail=str(e))
+    upload_stats["max_peak_bytes"] = max(upload_stats["max_peak_bytes"], peak_bytes)
+    try:
+        options = parse_preprocess_options(image_data.get('preprocess'))
+        return await run_ocr_analysis(image_bytes, options)
+    except HTTPException:
+        raise
+    except OCRQueueFull as e:
+        raise ocr_queue_full_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OCR processing failed: {str(e)}")
 
+# --- Live camera OCR over a WebSocket ---
+# The client streams low-res frames as binary messages and may send JSON text
+# messages: {"preprocess": {...} | false} to change preprocessing, {"reset": true}
+# to start over. Frames that repeat the last OCR'd one or are too blurry are
+# dropped in the worker before OCR, only changed text regions are OCR'd, and the
+# merged result is pushed back whenever it changes (camera_stream.py). CPU per
+# session is bounded: one frame in flight (a newer frame replaces a waiting one),
+# at least CAMERA_MIN_FRAME_INTERVAL between frames, and a cap on the session's
+# total OCR worker time.
+camera_stats = {"active": 0, "sessions": 0, "rejected": 0}
+
+async def send_camera_message(websocket: WebSocket, payload: Dict):
+    await websocket.send_text(orjson.dumps(payload).decode('utf-8'))
+
+@app.websocket("/ws/analyze-camera")
+async def analyze_camera(websocket: WebSocket):
+    if not OCR_ENABLED:
+        await websocket.close(code=1008, reason="OCR is not enabled on this instance")
+        return
+    if camera_stats["active"] >= CAMERA_MAX_SESSIONS:
+        camera_stats["rejected"] += 1
+        await websocket.close(code=1013, reason="Too many camera sessions, please retry shortly")
+        return
+    await websocket.accept()
+    camera_stats["active"] += 1
+    camera_stats["sessions"] += 1
+    session = CameraSession(analyze_text_blocks, merge_ocr_results)
+    state = {"options": None, "frame": None}  # "frame": latest (number, bytes) waiting for OCR
+    frame_ready = asyncio.Event()
+
+    async def receive_frames():
+        while True:
+            message = await asyncio.wait_for(websocket.receive(), CAMERA_IDLE_TIMEOUT)
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is not None:
+                session.frames["received"] += 1
+                number = session.frames["received"]
+                if len(message["bytes"]) > CAMERA_MAX_FRAME_BYTES:
+                    session.drop("too_large")
+                    await send_camera_message(websocket, {"type": "frame", "frame": number, "status": "too_large"})
+                    continue
+                if state["frame"] is not None:
+                    session.drop("superseded")
+                state["frame"] = (number, message["bytes"])
+                frame_ready.set()
+            elif message.get("text"):
+                try:
+                    control = orjson.loads(message["text"])
+                    if "preprocess" in control:
+                        state["options"] = parse_preprocess_options(control["preprocess"])
+                    if control.get("reset"):
+                        session.reset()
+                except HTTPException as e:
+                    await send_camera_message(websocket, {"type": "error", "detail": e.detail})
+                except (orjson.JSONDecodeError, TypeError, AttributeError):
+                    await send_camera_message(websocket, {"type": "error", "detail": "Control messages must be JSON objects"})
+
+    async def process_frames():
+        next_frame_at = 0.0
+        while not session.budget_exhausted:
+            await frame_ready.wait()
+            delay = next_frame_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)  # frames arriving meanwhile replace the waiting one
+            frame_ready.clear()
+            number, frame = state["frame"]
+            state["frame"] = None
+            next_frame_at = time.monotonic() + CAMERA_MIN_FRAME_INTERVAL
+            generation = session.generation
+            submitted = time.perf_counter()
+            try:
+                outcome = await ocr_pool.call(analyze_frame, frame, session.last_hash, session.known_regions(),
+                                              state["options"], ocr_pool.engine)
+            except OCRQueueFull:
+                session.drop("busy")
+                await send_camera_message(websocket, {"type": "frame", "frame": number, "status": "busy"})
+                continue
+            except Exception as e:
+                session.drop("failed")
+                await send_camera_message(websocket, {"type": "error", "frame": number,
+                                                      "detail": f"OCR processing failed: {str(e)}"})
+                continue
+            observe_ocr_timings(outcome['timings'])
+            if generation != session.generation:
+                continue  # reset while this frame was in flight
+            if session.apply(outcome):
+                result = session.result.model_copy(update={"timings": with_queue_time(outcome['timings'], submitted)})
+                await send_camera_message(websocket, {"type": "result", "frame": number, "result": result.model_dump(),
+                                                      "session": session.info()})
+            else:
+                status = "unchanged" if outcome['status'] == 'ocr' else outcome['status']
+                await send_camera_message(websocket, {"type": "frame", "frame": number, "status": status,
+                                                      "sharpness": outcome['sharpness']})
+
+    receiver = asyncio.create_task(receive_frames())
+    processor = asyncio.create_task(process_frames())
+    try:
+        done, _ = await asyncio.wait({receiver, processor}, timeout=CAMERA_MAX_SESSION_SECONDS,
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            reason = "max_duration"
+        elif receiver in done:
+            reason = "idle" if isinstance(receiver.exception(), asyncio.TimeoutError) else None
+        else:
+            reason = "cpu_budget" if processor.exception() is None else None
+        if reason:
+            # Final result, then a normal close; the client may already be gone
+            try:
+                await send_camera_message(websocket, {
+                    "type": "done", "reason": reason, "session": session.info(),
+                    "result": session.result.model_dump() if session.result else None,
+                })
+                await websocket.close()
+            except (WebSocketDisconnect, RuntimeError):
+                pass
+    finally:
+        receiver.cancel()
+        processor.cancel()
+        camera_stats["active"] -= 1
+
+# Drop a cached profile after the user edits it. The frontend's profileService
+# calls this with the user's Supabase access token; a server holding
+# PROFILE_WEBHOOK_SECRET may invalidate any user.
+@app.post("/profiles/{user_id}/invalidate")
+async def invalidate_profile(
+    user_id: str,
+    authorization: Optional[str] = Header(None),
+    x_webhook_secret: Optional[str] = Header(None),
+):
+    if not profile_loader:
+        return {"invalidated": user_id}
+    if not (PROFILE_WEBHOOK_SECRET and x_webhook_secret == PROFILE_WEBHOOK_SECRET):
+        scheme, _, token = (authorization or '').partition(' ')
+        if scheme.lower() != 'bearer' or not token:
+            raise HTTPException(status_code=401, detail="Missing bearer token")
+        if await profile_loader.verify_token(token) != user_id:
+            raise HTTPException(status_code=403, detail="Token does not belong to this user")
+    profile_loader.invalidate(user_id)
+    return {"invalidated": user_id}
+
+# Supabase database webhook for the profiles table (INSERT / UPDATE / DELETE)
+@app.post("/webhooks/profiles")
+async def profiles_webhook(payload: dict, x_webhook_secret: Optional[str] = Header(None)):
+    # Fails closed: without a configured secret nobody may rewrite cached profiles
+    if not (PROFILE_WEBHOOK_SECRET and x_webhook_secret == PROFILE_WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+    if not profile_loader:
+        return {"updated": None}
+    record = payload.get('record') or {}
+    old_record = payload.get('old_record') or {}
+    user_id = record.get('user_id') or old_record.get('user_id')
+    if not user_id:
+        raise HTTPException(status_code=400, detail="No user_id in webhook payload")
+    if payload.get('type') == 'DELETE':
+        profile_loader.invalidate(user_id)
+    else:
+        profile_loader.prime(user_id, record)
+    return {"updated": user_id}
+
+@app.get("/cache-stats")
+async def cache_stats():
+    return {
+        "products": product_cache.info(),
+        "local_index": local_index.info() if local_index else None,
+        "analyses": analysis_store.info(),
+        "profiles": profile_loader.info() if profile_loader else None,
+        "ocr_pool": ocr_pool.info(),
+        "shared": shared_cache.info() if shared_cache else None,
+        "uploads": upload_stats,
+        "camera": camera_stats,
+        "admission": admission.info(),
+        "off_breaker": off_client.breaker.info(),
+        "popularity": popularity.info(),
+        "prewarm": prewarm.info(),
+        "ocr_results": {**ocr_cache.info(), "in_flight": ocr_flights.in_flight(), "coalesced": ocr_flights.shared},
+        "search": {**search_index.info(), "in_flight": search_flights.in_flight(), "upstream_calls": search_flights.calls,
+                   "coalesced": search_flights.shared, **search_stats},
+    }
+
+# --- Prometheus metrics ---
+# Cache and upstream counters are read from the stats each component already
+# keeps, at scrape time, so they add nothing to the request path.
+def cache_stats_by_name() -> Dict[str, object]:
+    caches = {"products": product_cache.stats}
+    if analysis_store.loaded:
+        caches["analyses"] = analysis_store.stats
+    if profile_loader:
+        caches["profiles"] = profile_loader.stats
+    if ocr_cache.loaded:
+        caches["ocr_results"] = ocr_cache.stats
+    return caches
+
+def collect_cache_lookups():
+    for name, stats in cache_stats_by_name().items():
+        yield {"cache": name, "result": "memory_hit"}, stats.memory_hits
+        yield {"cache": name, "result": "shared_hit"}, stats.shared_hits
+        yield {"cache": name, "result": "disk_hit"}, stats.disk_hits
+        yield {"cache": name, "result": "miss"}, stats.misses
+        yield {"cache": name, "result": "stale_hit"}, stats.stale_hits
+    if local_index:
+        yield {"cache": "local_index", "result": "memory_hit"}, local_index.hits
+        yield {"cache": "local_index", "result": "miss"}, local_index.misses
+    if ocr_cache.loaded:
+        yield {"cache": "ocr_results", "result": "near_duplicate_hit"}, ocr_cache.near_hits
+
+def collect_cache_hit_ratio():
+    for name, stats in cache_stats_by_name().items():
+        yield {"cache": name}, stats.as_dict()["hit_ratio"]
+
+def collect_upstream_errors():
+    yield {"upstream": "openfoodfacts", "operation": "product"}, product_cache.stats.upstream_errors
+    yield {"upstream": "openfoodfacts", "operation": "search"}, search_stats["upstream_errors"]
+    if profile_loader:
+        yield {"upstream": "supabase", "operation": "profile"}, profile_loader.stats.upstream_errors
+
+REGISTRY.register(Collected("nutrilabel_cache_lookups_total",
+                            "Cache lookups by result; stale and near-duplicate hits are subsets of the hits.",
+                            "counter", collect_cache_lookups))
+REGISTRY.register(Collected("nutrilabel_cache_hit_ratio", "Share of cache lookups served without a fetch.",
+                            "gauge", collect_cache_hit_ratio))
+REGISTRY.register(Collected("nutrilabel_upstream_errors_total", "Upstream calls that failed after retries.",
+                            "counter", collect_upstream_errors))
+
+def collect_breaker_open():
+    yield {"upstream": "openfoodfacts"}, int(off_client.breaker.is_open)
+
+def collect_admission_shed():
+    for name, cls in admission.classes.items():
+        for reason, count in cls.shed.items():
+            yield {"class": name, "reason": reason}, count
+
+def collect_admission_active():
+    for name, cls in admission.classes.items():
+        yield {"class": name, "state": "active"}, cls.active
+        yield {"class": name, "state": "waiting"}, len(cls.waiters)
+
+def collect_prewarm():
+    for outcome, count in prewarm.totals.items():
+        yield {"outcome": outcome}, count
+
+REGISTRY.register(Collected("nutrilabel_circuit_open", "1 while the upstream's circuit breaker is open.",
+                            "gauge", collect_breaker_open))
+REGISTRY.register(Collected("nutrilabel_requests_shed_total", "Requests answered 503 by admission control.",
+                            "counter", collect_admission_shed))
+REGISTRY.register(Collected("nutrilabel_admission_requests", "Requests holding or waiting for an admission slot.",
+                            "gauge", collect_admission_active))
+REGISTRY.register(Collected("nutrilabel_prewarm_products_total", "Popular products visited by the prewarmer, by outcome.",
+                            "counter", collect_prewarm))
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.expose(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     return {"message": "NutriLabel Analyzer API is running"}
 
+# Liveness: the process is up and its event loop responds. Checks nothing else,
+# so a slow dependency never gets a healthy replica restarted.
+@app.get("/livez")
+async def livez():
+    return {"status": "ok"}
+
+# Readiness: startup has finished and the instance isn't shutting down. Lazily
+# initialized subsystems (Supabase, OCR) are reported but never block readiness.
+@app.get("/readyz")
+async def readyz():
+    draining = bool(DRAIN_FILE) and os.path.exists(DRAIN_FILE)
+    ready = lifecycle["started"] and not lifecycle["stopping"] and not draining
+    checks = {
+        "started": lifecycle["started"],
+        "stopping": lifecycle["stopping"],
+        "draining": draining,
+        "search_index": "ready" if search_index_build and search_index_build.done() else "building",
+        "local_index": local_index is not None,
+        "profiles": "disabled" if profile_loader is None else
+                    ("connected" if profile_loader.info()["client_initialized"] else "not_initialized"),
+        "ocr": "disabled" if not OCR_ENABLED else ("started" if ocr_pool.info()["started"] else "not_loaded"),
+        "shared_cache": "disabled" if shared_cache is None else ("available" if shared_cache.available else "unavailable"),
+    }
+    return ORJSONResponse({"ready": ready, "checks": checks}, status_code=200 if ready else 503)
+
+# Last shutdown hook: flush cache writes the other hooks may have queued
+@app.on_event("shutdown")
+async def close_shared_cache():
+    if shared_cache:
+        await shared_cache.aclose()
+
+@app.on_event("startup")
+async def mark_started():
+    lifecycle["started"] = True
+
+# Single process for development; use serve.py for multi-worker production serving
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from cache import TieredCache
+from ocr_engine import OCR_ENGINE, engine_fingerprint
+
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "2000"))
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", "cache/ocr.sqlite3")  # empty string disables the disk tier
+OCR_CACHE_TTL = float(os.getenv("OCR_CACHE_TTL", str(30 * 24 * 3600)))
+OCR_CACHE_PHASH = os.getenv("OCR_CACHE_PHASH", "false").lower() in ("1", "true", "yes")
+OCR_CACHE_PHASH_DISTANCE = int(os.getenv("OCR_CACHE_PHASH_DISTANCE", "4"))  # max differing bits out of 64
+
+
+def content_key(image_bytes: bytes, options: Optional[Dict] = None, engine: str = "") -> str:
+    # Different engines and preprocessing can produce different text, so both are part of the key
+    key = f"{hashlib.sha256(image_bytes).hexdigest()}:{engine}"
+    if not options:
+        return key
+    options_digest = hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return f"{key}:{options_digest}"
+
+
+# 64-bit difference hash: robust to re-encoding, resizing and small exposure changes
+def perceptual_hash(image_bytes: bytes) -> int:
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft('L', (64, 64))  # JPEG decoders can skip most of the work at reduced size
+    return difference_hash(image)
+
+
+def difference_hash(image) -> int:
+    from PIL import Image
+
+    pixels = list(image.convert('L').resize((9, 8), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+# OCR results cached by image content. Exact matches use a SHA-256 of the
+# decoded image bytes; with OCR_CACHE_PHASH enabled, near-duplicates (the same
+# photo re-encoded or resized) are found by perceptual-hash Hamming distance.
+# The perceptual index only lives in this process: it starts empty after a
+# restart and isn't shared with other workers, which only find exact matches
+# of each other's results.
+class OCRResultCache:
+    def __init__(self, max_entries: int = OCR_CACHE_SIZE, disk_path: Optional[str] = OCR_CACHE_PATH,
+                 ttl: float = OCR_CACHE_TTL, use_phash: bool = OCR_CACHE_PHASH,
+                 phash_distance: int = OCR_CACHE_PHASH_DISTANCE, shared=None, engine: str = OCR_ENGINE):
+        self.engine = engine
+        self._engine_id: Optional[str] = None
+        self.ttl = ttl
+        self.shared = shared
+        self.use_phash = use_phash
+        self.phash_distance = phash_distance
+        self.max_entries = max_entries
+        self.disk_path = disk_path or None
+        self._cache: Optional[TieredCache] = None
+        self.near_hits = 0
+        # (phash, engine and options key suffix, content key); bounded like the memory tier
+        self._phashes: List[Tuple[int, str, str]] = []
+        self._max_phashes = max_entries
+
+    # Opened on first use, so instances that never OCR don't create the cache file
+    @property
+    def cache(self) -> TieredCache:
+        if self._cache is None:
+            self._cache = TieredCache(self.max_entries, self.disk_path, table="ocr_results", shared=self.shared)
+        return self._cache
+
+    @property
+    def engine_id(self) -> str:
+        if self._engine_id is None:
+            self._engine_id = engine_fingerprint(self.engine)
+        return self._engine_id
+
+    @property
+    def loaded(self) -> bool:
+        return self._cache is not None
+
+    @property
+    def stats(self):
+        return self.cache.stats
+
+    def _options_suffix(self, key: str) -> str:
+        return key.partition(':')[2]
+
+    def _nearest(self, phash: int, suffix: str) -> Optional[str]:
+        best_key, best_distance = None, self.phash_distance + 1
+        for candidate, candidate_suffix, key in self._phashes:
+            if candidate_suffix != suffix:
+                continue
+            distance = (candidate ^ phash).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    # Returns (cached result or None, content key, perceptual hash or None).
+    # Counts one lookup: a hit for an exact or near-duplicate match, else a miss.
+    async def get(self, image_bytes: bytes, options: Optional[Dict] = None) -> Tuple[Optional[Dict], str, Optional[int]]:
+        key = content_key(image_bytes, options, self.engine_id)
+        entry = await self.cache.aget(key, count_miss=not self.use_phash)
+        if entry is not None:
+            return entry.value, key, None
+        if not self.use_phash:
+            return None, key, None
+
+        phash = None
+        try:
+            phash = await asyncio.to_thread(perceptual_hash, image_bytes)
+        except Exception:
+            pass
+        near_key = self._nearest(phash, self._options_suffix(key)) if phash is not None else None
+        if near_key is not None:
+            entry = await self.cache.aget(near_key, count_miss=False)
+            if entry is not None:
+                self.near_hits += 1
+                return entry.value, key, phash
+        self.cache.stats.misses += 1
+        return None, key, phash
+
+    def put(self, key: str, result: Dict, phash: Optional[int] = None):
+        self.cache.set(key, result, self.ttl)
+        if phash is not None:
+            self._phashes.append((phash, self._options_suffix(key), key))
+            if len(self._phashes) > self._max_phashes:
+                del self._phashes[:len(self._phashes) - self._max_phashes]
+
+    def info(self) -> Dict:
+        if not self.loaded:
+            return {"loaded": False}
+        return {**self._cache.info(), "engine": self.engine_id, "near_duplicate_hits": self.near_hits,
+                "phash_enabled": self.use_phash, "phash_entries": len(self._phashes)}
+
+    def close(self):
+        if self.loaded:
+            self._cache.close()
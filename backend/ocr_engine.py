@@ -0,0 +1,123 @@
+import importlib.metadata
+import importlib.util
+import os
+from typing import List, Optional, Tuple
+
+# "tesserocr" keeps a Tesseract API handle loaded in each worker process and
+# passes image buffers to it in memory; "pytesseract" runs the tesseract binary
+# once per image (temp file + fresh process, language data reloaded each time).
+# "auto" picks tesserocr when it is installed.
+OCR_ENGINE = os.getenv("OCR_ENGINE", "auto")
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+ENGINES = ("auto", "tesserocr", "pytesseract")
+
+TextBlocks = List[Tuple[str, float]]
+
+
+def _confidence(conf) -> float:
+    # Tesseract reports -1 for blocks without a word confidence
+    conf = float(conf)
+    return conf / 100 if conf >= 0 else 0.5
+
+
+class PytesseractEngine:
+    name = "pytesseract"
+
+    def __init__(self, lang: str = OCR_LANG):
+        import pytesseract
+        self._pytesseract = pytesseract
+        self.lang = lang
+
+    def recognize(self, image) -> TextBlocks:
+        data = self._pytesseract.image_to_data(image, lang=self.lang, output_type=self._pytesseract.Output.DICT)
+        return [(text, _confidence(conf)) for text, conf in zip(data['text'], data['conf']) if text.strip() != '']
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    name = "tesserocr"
+
+    def __init__(self, lang: str = OCR_LANG):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.lang = lang
+        # Loads the language data once; every later image reuses it
+        self._api = tesserocr.PyTessBaseAPI(lang=lang)
+
+    def recognize(self, image) -> TextBlocks:
+        import numpy as np
+
+        # Raw pixels straight into Tesseract: no encode, no temp file
+        pixels = np.ascontiguousarray(image)
+        if pixels.ndim == 3 and pixels.shape[2] == 4:
+            pixels = np.ascontiguousarray(pixels[:, :, :3])
+        height, width = pixels.shape[:2]
+        channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+        api = self._api
+        api.SetImageBytes(pixels.tobytes(), width, height, channels, width * channels)
+        try:
+            api.Recognize()
+            level = self._tesserocr.RIL.WORD
+            blocks = []
+            for word in self._tesserocr.iterate_level(api.GetIterator(), level):
+                text = word.GetUTF8Text(level)
+                if text and text.strip() != '':
+                    blocks.append((text, _confidence(word.Confidence(level))))
+            return blocks
+        finally:
+            api.Clear()
+
+    def close(self):
+        self._api.End()
+
+
+def resolve_engine(name: str = OCR_ENGINE) -> str:
+    if name not in ENGINES:
+        raise ValueError(f"OCR_ENGINE must be one of {', '.join(ENGINES)}, got {name!r}")
+    if name == "auto":
+        return "tesserocr" if importlib.util.find_spec("tesserocr") is not None else "pytesseract"
+    return name
+
+
+# Identifies what produces OCR text: resolved engine, its package version and
+# the language, so results from different engines never share a cache entry
+def engine_fingerprint(name: str = OCR_ENGINE, lang: str = OCR_LANG) -> str:
+    resolved = resolve_engine(name)
+    try:
+        version = importlib.metadata.version(resolved)
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown"
+    return f"{resolved}-{version}-{lang}"
+
+
+def create_engine(name: str = OCR_ENGINE, lang: str = OCR_LANG):
+    if resolve_engine(name) == "tesserocr":
+        try:
+            return TesserocrEngine(lang)
+        except Exception as e:  # e.g. missing or mismatched tessdata
+            if name == "tesserocr":
+                raise
+            print(f"Warning: tesserocr unavailable ({type(e).__name__}: {e}); using pytesseract")
+    return PytesseractEngine(lang)
+
+
+# One engine per process, created on first use (or by warm_engine when the OCR
+# pool starts a worker) and kept for the life of the process
+_engine = None
+_engine_name: Optional[str] = None
+
+
+def get_engine(name: str = OCR_ENGINE):
+    global _engine, _engine_name
+    if _engine is None or _engine_name != name:
+        if _engine is not None:
+            _engine.close()
+        _engine = create_engine(name)
+        _engine_name = name
+    return _engine
+
+
+def warm_engine(name: str = OCR_ENGINE):
+    get_engine(name)
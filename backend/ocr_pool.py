@@ -0,0 +1,177 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from ocr_engine import OCR_ENGINE, get_engine, resolve_engine, warm_engine
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_QUEUE_SIZE = int(os.getenv("OCR_QUEUE_SIZE", str(2 * OCR_WORKERS)))  # jobs allowed to wait for a free worker
+OCR_JOB_TIMEOUT = float(os.getenv("OCR_JOB_TIMEOUT", "30"))
+OCR_RETRY_AFTER = int(os.getenv("OCR_RETRY_AFTER", "2"))
+OCR_START_METHOD = os.getenv("OCR_START_METHOD", "spawn")
+
+
+class OCRQueueFull(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+    def __init__(self, retry_after: int = OCR_RETRY_AFTER):
+        super().__init__("OCR queue is full")
+        self.retry_after = retry_after
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+# Whatever the worker didn't account for was spent waiting for a free process
+def with_queue_time(timings: Dict[str, float], submitted: float) -> Dict[str, float]:
+    total = _elapsed_ms(submitted)
+    return {'queue': round(max(0.0, total - sum(timings.values())), 2), **timings}
+
+
+# Runs inside a worker process: decode -> preprocess -> OCR -> post-process.
+# Returns the (text, confidence) blocks plus per-stage timings in milliseconds.
+def ocr_image_bytes(image_bytes: bytes, options: Optional[Dict] = None,
+                    engine: str = OCR_ENGINE) -> Tuple[List[Tuple[str, float]], Dict[str, float]]:
+    import numpy as np
+    from PIL import Image
+    from image_preprocess import PreprocessOptions, preprocess
+
+    timings = {}
+    preprocess_options = PreprocessOptions.from_dict(options)
+
+    started = time.perf_counter()
+    image = Image.open(io.BytesIO(image_bytes))
+    image.load()
+    timings['decode'] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    if preprocess_options.enabled:
+        dpi = image.info.get('dpi')
+        result = preprocess(np.asarray(image), preprocess_options, source_dpi=dpi[0] if dpi else None)
+        ocr_inputs = result.crops
+    else:
+        ocr_inputs = [image]
+    timings['preprocess'] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    ocr_engine = get_engine(engine)
+    ocr_results = [ocr_engine.recognize(ocr_input) for ocr_input in ocr_inputs]
+    timings['ocr'] = _elapsed_ms(started)
+
+    started = time.perf_counter()
+    text_blocks = [block for ocr_result in ocr_results for block in ocr_result]
+    timings['postprocess'] = _elapsed_ms(started)
+
+    return text_blocks, timings
+
+
+# Bounded process pool for OCR jobs. At most `workers` jobs run at once and at
+# most `queue_size` more may wait; anything beyond that is rejected immediately
+# with OCRQueueFull so the API can answer 503 instead of piling up requests.
+class OCRPool:
+    def __init__(self, workers: int = OCR_WORKERS, queue_size: int = OCR_QUEUE_SIZE,
+                 job_timeout: float = OCR_JOB_TIMEOUT, start_method: str = OCR_START_METHOD, engine: str = OCR_ENGINE):
+        resolve_engine(engine)  # reject unknown names here rather than in every worker
+        self.engine = engine
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.job_timeout = job_timeout
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.timed_out = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    # Worker processes are only started when the first OCR job arrives; each
+    # one loads its OCR engine as it starts and keeps it for later jobs
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=warm_engine,
+                initargs=(self.engine,),
+            )
+        return self._executor
+
+    # Run fn(*args) in a worker process, subject to the same admission limit and
+    # timeout as every other OCR job. A job that times out keeps its worker busy
+    # until it finishes, so its slot is only released when the worker is done
+    # with it, not when the caller gives up.
+    async def call(self, fn, *args):
+        if self._pending >= self.capacity:
+            self.rejected += 1
+            raise OCRQueueFull()
+        loop = asyncio.get_running_loop()
+        try:
+            job = self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            self.failed += 1
+            self.shutdown()
+            raise
+        self._pending += 1
+        job.add_done_callback(lambda _: self._release_from_worker(loop))
+        try:
+            # wrap_future cancels the job on timeout if it hasn't started yet
+            result = await asyncio.wait_for(asyncio.wrap_future(job), timeout=self.job_timeout)
+        except asyncio.TimeoutError:
+            self.failed += 1
+            self.timed_out += 1
+            raise
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool for the next job
+            self.failed += 1
+            self.shutdown()
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        return result
+
+    # Done callbacks run on the executor's management thread
+    def _release_from_worker(self, loop: asyncio.AbstractEventLoop):
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:  # the loop has already been closed
+            pass
+
+    def _release(self):
+        self._pending -= 1
+
+    async def run(self, image_bytes: bytes, options: Optional[Dict] = None) -> Tuple[List[Tuple[str, float]], Dict[str, float]]:
+        submitted = time.perf_counter()
+        text_blocks, timings = await self.call(ocr_image_bytes, image_bytes, options, self.engine)
+        return text_blocks, with_queue_time(timings, submitted)
+
+    def info(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "engine": resolve_engine(self.engine),
+            "queue_size": self.queue_size,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "started": self._executor is not None,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from circuit_breaker import CircuitBreaker
+
+# Upstream configuration (override OFF_BASE_URL to point at a local stub, see off_stub.py)
+OFF_BASE_URL = os.getenv("OFF_BASE_URL", "https://world.openfoodfacts.org")
+OFF_CONNECT_TIMEOUT = float(os.getenv("OFF_CONNECT_TIMEOUT", "3.0"))
+OFF_READ_TIMEOUT = float(os.getenv("OFF_READ_TIMEOUT", "10.0"))
+OFF_MAX_RETRIES = int(os.getenv("OFF_MAX_RETRIES", "2"))
+OFF_BACKOFF_BASE = float(os.getenv("OFF_BACKOFF_BASE", "0.25"))
+OFF_BACKOFF_MAX = float(os.getenv("OFF_BACKOFF_MAX", "4.0"))
+OFF_MAX_CONNECTIONS = int(os.getenv("OFF_MAX_CONNECTIONS", "32"))
+OFF_MAX_KEEPALIVE = int(os.getenv("OFF_MAX_KEEPALIVE", "16"))
+OFF_PER_HOST_CONCURRENCY = int(os.getenv("OFF_PER_HOST_CONCURRENCY", "8"))
+OFF_BREAKER_FAILURES = int(os.getenv("OFF_BREAKER_FAILURES", "5"))  # consecutive failed requests that open the circuit
+OFF_BREAKER_RESET = float(os.getenv("OFF_BREAKER_RESET", "30"))  # seconds before a probe request is let through
+OFF_BREAKER_SLOW_CALL = float(os.getenv("OFF_BREAKER_SLOW_CALL", "5"))  # slower requests count as failures; 0 disables
+OFF_USER_AGENT = os.getenv("OFF_USER_AGENT", "NutriSense/1.0 (https://github.com/DevBolt07/nutri_sense)")
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """Raised when Open Food Facts could not be reached or kept failing after retries."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UpstreamUnavailable(UpstreamError):
+    """Raised without contacting Open Food Facts while its circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Open Food Facts is unavailable (circuit open, next try in {retry_after:.0f}s)", 503)
+        self.retry_after = retry_after
+
+
+class OpenFoodFactsClient:
+    def __init__(
+        self,
+        base_url: str = OFF_BASE_URL,
+        connect_timeout: float = OFF_CONNECT_TIMEOUT,
+        read_timeout: float = OFF_READ_TIMEOUT,
+        max_retries: int = OFF_MAX_RETRIES,
+        backoff_base: float = OFF_BACKOFF_BASE,
+        backoff_max: float = OFF_BACKOFF_MAX,
+        max_connections: int = OFF_MAX_CONNECTIONS,
+        max_keepalive: int = OFF_MAX_KEEPALIVE,
+        per_host_concurrency: int = OFF_PER_HOST_CONCURRENCY,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.per_host_concurrency = per_host_concurrency
+        self._transport = transport
+        self.breaker = breaker or CircuitBreaker("openfoodfacts", OFF_BREAKER_FAILURES, OFF_BREAKER_RESET,
+                                                 slow_call=OFF_BREAKER_SLOW_CALL)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    # The pooled client is created lazily so it binds to the running event loop
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self._transport,
+                headers={"User-Agent": OFF_USER_AGENT},
+            )
+        return self._client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_concurrency)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    def _backoff_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(self.backoff_max, float(retry_after))
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    # GET a JSON document; returns None on 404, raises UpstreamError once retries are
+    # exhausted, and UpstreamUnavailable right away while the circuit breaker is open
+    async def get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        if not self.breaker.allow():
+            raise UpstreamUnavailable(self.breaker.retry_after())
+        started = time.monotonic()
+        try:
+            data = await self._get_json_with_retries(path, params)
+        except UpstreamError as e:
+            # Client errors say nothing about upstream health; timeouts, 5xx and 429 do
+            upstream_fault = e.status_code is None or e.status_code >= 500 or e.status_code == 429
+            self.breaker.record(not upstream_fault, time.monotonic() - started)
+            raise
+        self.breaker.record(True, time.monotonic() - started)
+        return data
+
+    async def _get_json_with_retries(self, path: str, params: Optional[Dict[str, Any]]) -> Optional[Any]:
+        url = f"{self.base_url}{path}"
+        client = self._get_client()
+        last_error = "no attempt made"
+        last_status = None
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                async with self._host_semaphore(url):
+                    response = await client.get(url, params=params)
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code == 404:
+                    return None
+                last_status = response.status_code
+                last_error = f"HTTP {response.status_code}"
+                if response.status_code not in RETRY_STATUS_CODES:
+                    break
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                last_error = f"{type(e).__name__}: {e}"
+            except ValueError as e:
+                # Malformed JSON body; retrying will not help
+                last_error = f"Invalid JSON: {e}"
+                break
+
+            if attempt < self.max_retries:
+                if self.breaker.is_open:
+                    break  # other requests already found upstream down; don't keep this one waiting
+                await asyncio.sleep(self._backoff_delay(attempt, response))
+
+        raise UpstreamError(f"Open Food Facts request failed for {path}: {last_error}", last_status)
+
+    # Fetch a single product; returns None when OFF does not know the barcode
+    async def get_product(self, barcode: str) -> Optional[Dict]:
+        data = await self.get_json(f"/api/v0/product/{barcode}.json")
+        if data and data.get('status') == 1:
+            return data.get('product')
+        return None
+
+    # Full-text product search
+    async def search(self, search_terms: str, page_size: int = 10, page: int = 1) -> List[Dict]:
+        data = await self.get_json("/cgi/search.pl", params={
+            "search_terms": search_terms,
+            "search_simple": 1,
+            "json": 1,
+            "page_size": page_size,
+            "page": page,
+        })
+        if not data:
+            return []
+        return data.get('products', [])[:page_size]
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
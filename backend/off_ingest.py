@@ -0,0 +1,109 @@
+# Build or update the local product index from an Open Food Facts bulk export.
+#
+#   python off_ingest.py openfoodfacts-products.jsonl.gz
+#   python off_ingest.py en.openfoodfacts.org.products.csv.gz --format csv
+#   python off_ingest.py delta/openfoodfacts_products_1700000000_1700086400.json.gz
+#
+# Exports are streamed record by record, so memory use stays flat regardless of
+# dump size. Re-running with a delta export upserts changed products; a record
+# only replaces an existing row if its last_modified_t is at least as recent.
+import argparse
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from typing import Dict, Iterator, Optional
+
+from local_index import OFF_LOCAL_INDEX_PATH, LocalProductIndex, project_product
+
+BATCH_SIZE = 5000
+
+
+def open_text(path: str) -> io.TextIOBase:
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace', newline='')
+    return open(path, 'r', encoding='utf-8', errors='replace', newline='')
+
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.endswith(('.csv', '.tsv')) else 'jsonl'
+
+
+def iter_jsonl(stream) -> Iterator[Dict]:
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            print(f"Skipping malformed JSON on line {line_number}", file=sys.stderr)
+
+
+def iter_csv(stream) -> Iterator[Dict]:
+    # The OFF CSV export is tab-separated and has some very large fields
+    csv.field_size_limit(sys.maxsize)
+    yield from csv.DictReader(stream, delimiter='\t', quoting=csv.QUOTE_NONE)
+
+
+def ingest(path: str, index: LocalProductIndex, fmt: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+    fmt = fmt or detect_format(path)
+    started = time.perf_counter()
+    read = written = skipped = 0
+    batch = []
+
+    with open_text(path) as stream:
+        records = iter_csv(stream) if fmt == 'csv' else iter_jsonl(stream)
+        for record in records:
+            read += 1
+            projected = project_product(record)
+            if projected is None:
+                skipped += 1
+            else:
+                batch.append(projected)
+            if len(batch) >= BATCH_SIZE:
+                written += index.upsert_many(batch)
+                batch.clear()
+            if limit and read >= limit:
+                break
+            if read % 100000 == 0:
+                print(f"  {read} records read, {written} written", file=sys.stderr)
+        if batch:
+            written += index.upsert_many(batch)
+
+    summary = {
+        "source": path,
+        "format": fmt,
+        "read": read,
+        "written": written,
+        "skipped": skipped,
+        "seconds": round(time.perf_counter() - started, 2),
+        "finished_at": int(time.time()),
+    }
+    index.set_meta('last_ingest', json.dumps(summary))
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest an Open Food Facts export into the local barcode index")
+    parser.add_argument('source', help="JSONL or CSV export (optionally .gz); '-' reads JSONL from stdin")
+    parser.add_argument('--db', default=OFF_LOCAL_INDEX_PATH, help="Index path (default: %(default)s)")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help="Override format detection")
+    parser.add_argument('--limit', type=int, help="Stop after this many records")
+    args = parser.parse_args(argv)
+
+    index = LocalProductIndex(args.db)
+    try:
+        summary = ingest(args.source, index, args.format, args.limit)
+    finally:
+        index.close()
+    print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
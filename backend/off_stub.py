@@ -0,0 +1,130 @@
+# Minimal stand-in for the Open Food Facts API, for local testing and benchmarks.
+#
+#   uvicorn off_stub:app --port 8081
+#   OFF_BASE_URL=http://localhost:8081 uvicorn main:app
+#
+# Products are loaded from OFF_STUB_FIXTURES (a JSON object of barcode -> product)
+# or fall back to the small built-in set below. OFF_STUB_LATENCY (seconds) delays
+# every response to simulate the round-trip to the real API. Tests can also mount
+# the app in-process with httpx.ASGITransport(app=off_stub.app).
+#
+# Faults, to exercise retries, the circuit breaker and load shedding:
+#   OFF_STUB_ERROR_RATE   share of requests answered with a 503
+#   OFF_STUB_HANG_RATE    share of requests that stall for OFF_STUB_HANG_SECONDS (default 30)
+#   OFF_STUB_DOWN=true    every request fails with a 503
+# They can also be changed while running, e.g.
+#   curl -X POST localhost:8081/_faults -H 'Content-Type: application/json' -d '{"down": true}'
+# and GET /_faults returns the current settings and request counters.
+import asyncio
+import json
+import os
+import random
+from typing import Dict, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+DEFAULT_PRODUCTS: Dict[str, Dict] = {
+    "3017620422003": {
+        "code": "3017620422003",
+        "product_name": "Nutella",
+        "brands": "Ferrero",
+        "ingredients_text": "Sugar, palm oil, hazelnuts 13%, skimmed milk powder 8.7%, fat-reduced cocoa 7.4%, emulsifier: lecithins (soya), vanillin",
+        "nutriments": {"sugars_100g": 56.3, "salt_100g": 0.107, "saturated-fat_100g": 10.6},
+        "nova_group": 4,
+        "nutriscore_grade": "e",
+    },
+    "5449000000996": {
+        "code": "5449000000996",
+        "product_name": "Coca-Cola",
+        "brands": "Coca-Cola",
+        "ingredients_text": "Carbonated water, sugar, colour (caramel E150d), acid (phosphoric acid), natural flavourings including caffeine",
+        "nutriments": {"sugars_100g": 10.6, "salt_100g": 0, "saturated-fat_100g": 0},
+        "nova_group": 4,
+        "nutriscore_grade": "e",
+    },
+    "8076809513753": {
+        "code": "8076809513753",
+        "product_name": "Spaghetti n.5",
+        "brands": "Barilla",
+        "ingredients_text": "Durum wheat semolina, water",
+        "nutriments": {"sugars_100g": 3.5, "salt_100g": 0.013, "saturated-fat_100g": 0.3},
+        "nova_group": 1,
+        "nutriscore_grade": "a",
+    },
+}
+
+
+def load_products() -> Dict[str, Dict]:
+    fixtures_path = os.getenv("OFF_STUB_FIXTURES")
+    if fixtures_path:
+        with open(fixtures_path, encoding="utf-8") as f:
+            return json.load(f)
+    return dict(DEFAULT_PRODUCTS)
+
+
+app = FastAPI()
+app.state.products = load_products()
+app.state.latency = float(os.getenv("OFF_STUB_LATENCY", "0"))
+app.state.faults = {
+    "error_rate": float(os.getenv("OFF_STUB_ERROR_RATE", "0")),
+    "hang_rate": float(os.getenv("OFF_STUB_HANG_RATE", "0")),
+    "hang_seconds": float(os.getenv("OFF_STUB_HANG_SECONDS", "30")),
+    "down": os.getenv("OFF_STUB_DOWN", "false").lower() in ("1", "true", "yes"),
+}
+app.state.counters = {"requests": 0, "errors": 0, "hangs": 0}
+
+
+# Delay, stall or fail the request as configured; returns the error response, if any
+async def inject_faults() -> Optional[JSONResponse]:
+    faults, counters = app.state.faults, app.state.counters
+    counters["requests"] += 1
+    if app.state.latency:
+        await asyncio.sleep(app.state.latency)
+    if faults["hang_rate"] and random.random() < faults["hang_rate"]:
+        counters["hangs"] += 1
+        await asyncio.sleep(faults["hang_seconds"])
+    if faults["down"] or (faults["error_rate"] and random.random() < faults["error_rate"]):
+        counters["errors"] += 1
+        return JSONResponse({"status": 0, "status_verbose": "service unavailable"}, status_code=503)
+    return None
+
+
+@app.get("/_faults")
+async def get_faults():
+    return {"latency": app.state.latency, **app.state.faults, "counters": app.state.counters}
+
+
+@app.post("/_faults")
+async def set_faults(settings: Dict):
+    if "latency" in settings:
+        app.state.latency = float(settings.pop("latency"))
+    for name, value in settings.items():
+        if name in app.state.faults:
+            app.state.faults[name] = bool(value) if name == "down" else float(value)
+    return await get_faults()
+
+
+@app.get("/api/v0/product/{barcode}.json")
+async def get_product(barcode: str):
+    error = await inject_faults()
+    if error is not None:
+        return error
+    product = app.state.products.get(barcode)
+    if product is None:
+        return {"code": barcode, "status": 0, "status_verbose": "product not found"}
+    return {"code": barcode, "status": 1, "status_verbose": "product found", "product": product}
+
+
+@app.get("/cgi/search.pl")
+async def search(search_terms: str = "", page_size: int = 24, page: int = 1):
+    error = await inject_faults()
+    if error is not None:
+        return error
+    terms = search_terms.lower().split()
+    matches = [
+        product for product in app.state.products.values()
+        if all(term in f"{product.get('product_name', '')} {product.get('brands', '')}".lower() for term in terms)
+    ]
+    start = (page - 1) * page_size
+    return {"count": len(matches), "page": page, "page_size": page_size, "products": matches[start:start + page_size]}
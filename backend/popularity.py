@@ -0,0 +1,262 @@
+import asyncio
+import base64
+import hashlib
+import os
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, so each worker keeps its counts to itself
+    fcntl = None
+
+POPULARITY_PATH = os.getenv("POPULARITY_PATH", "cache/popularity.json")  # empty string keeps counts in memory only
+POPULARITY_WIDTH = int(os.getenv("POPULARITY_WIDTH", "4096"))  # counters per row of the sketch
+POPULARITY_DEPTH = int(os.getenv("POPULARITY_DEPTH", "4"))  # rows, one hash function each
+POPULARITY_HALF_LIFE = float(os.getenv("POPULARITY_HALF_LIFE", str(7 * 24 * 3600)))  # seconds for a count to halve
+POPULARITY_CANDIDATES = int(os.getenv("POPULARITY_CANDIDATES", "2000"))  # most requested barcodes kept for ranking
+
+FILE_VERSION = 1
+
+
+# Count-min sketch: approximate per-key counts in fixed memory (depth rows of
+# width float counters). Estimates never undercount; hash collisions can only
+# inflate them, and taking the minimum over the rows keeps that small.
+class CountMinSketch:
+    def __init__(self, width: int = POPULARITY_WIDTH, depth: int = POPULARITY_DEPTH, counts: Optional[array] = None):
+        self.width = max(1, width)
+        self.depth = max(1, depth)
+        self.counts = counts if counts is not None else array('d', bytes(8 * self.width * self.depth))
+
+    # One counter per row, from two halves of a single digest (double hashing)
+    def indexes(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    # Returns the key's new estimate
+    def add(self, indexes: List[int], amount: float = 1.0) -> float:
+        counts = self.counts
+        for i in indexes:
+            counts[i] += amount
+        return min(counts[i] for i in indexes)
+
+    def estimate(self, key: str) -> float:
+        return min(self.counts[i] for i in self.indexes(key))
+
+    def merge(self, other: "CountMinSketch"):
+        counts = self.counts
+        for i, value in enumerate(other.counts):
+            if value:
+                counts[i] += value
+
+    def scale(self, factor: float):
+        if factor != 1.0:
+            self.counts = array('d', (value * factor for value in self.counts))
+
+    def to_base64(self) -> str:
+        return base64.b64encode(self.counts.tobytes()).decode('ascii')
+
+    @classmethod
+    def from_base64(cls, width: int, depth: int, data: str) -> "CountMinSketch":
+        counts = array('d')
+        counts.frombytes(base64.b64decode(data))
+        if len(counts) != width * depth:
+            raise ValueError(f"expected {width * depth} counters, got {len(counts)}")
+        return cls(width, depth, counts)
+
+
+# Per-barcode access frequency. Counts live in a count-min sketch; since a
+# sketch can't list its keys, the most requested barcodes are also kept in a
+# bounded candidate set so they can be ranked (`top`). Counts halve every
+# `half_life` seconds, so products nobody asks for any more drop out.
+#
+# With a path, every worker periodically merges the counts it recorded since
+# its last flush into one file (under a lock), and reads back everyone's
+# totals; the file is loaded at startup, so counts survive restarts.
+class PopularityTracker:
+    def __init__(
+        self,
+        path: Optional[str] = POPULARITY_PATH,
+        width: int = POPULARITY_WIDTH,
+        depth: int = POPULARITY_DEPTH,
+        half_life: float = POPULARITY_HALF_LIFE,
+        candidates: int = POPULARITY_CANDIDATES,
+    ):
+        self.path = path or None
+        self.width = max(1, width)
+        self.depth = max(1, depth)
+        self.half_life = half_life
+        self.capacity = max(1, candidates)
+        self.sketch = CountMinSketch(self.width, self.depth)  # totals as of the last flush plus local counts since
+        self.candidates: Dict[str, float] = {}  # barcode -> estimate when last seen
+        self.recorded = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.last_flush: Optional[float] = None
+        self._pending = CountMinSketch(self.width, self.depth)  # local counts not yet in the file
+        self._floor = 0.0  # estimate a new key needs to become a candidate
+        self._decayed_at = time.time()
+        self._leader_file = None
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            stored = self._read()
+            if stored is not None:
+                self.sketch, candidates = stored
+                self._set_candidates(candidates)
+
+    # Called on every barcode lookup: a digest and a few array updates
+    def record(self, key: str):
+        indexes = self.sketch.indexes(key)
+        self._pending.add(indexes)
+        estimate = self.sketch.add(indexes)
+        self.recorded += 1
+        candidates = self.candidates
+        if key in candidates or estimate > self._floor:
+            candidates[key] = estimate
+            # Let the set grow to twice its size, then cut it back: amortized O(1) per lookup
+            if len(candidates) > 2 * self.capacity:
+                self._set_candidates(candidates)
+
+    def estimate(self, key: str) -> float:
+        return self.sketch.estimate(key)
+
+    # The n most requested barcodes, most popular first, as (barcode, estimate)
+    def top(self, n: int) -> List[Tuple[str, float]]:
+        ranked = sorted(((key, self.sketch.estimate(key)) for key in self.candidates), key=lambda kv: kv[1], reverse=True)
+        return [(key, round(count, 2)) for key, count in ranked[:n]]
+
+    # Keep the `capacity` best of these keys; later keys must beat the weakest to get in
+    def _set_candidates(self, keys):
+        ranked = sorted(((key, self.sketch.estimate(key)) for key in set(keys)), key=lambda kv: kv[1], reverse=True)
+        self.candidates = dict(ranked[:self.capacity])
+        self._floor = ranked[self.capacity - 1][1] if len(ranked) >= self.capacity else 0.0
+
+    def _decay_factor(self, seconds: float) -> float:
+        if self.half_life <= 0 or seconds <= 0:
+            return 1.0
+        return 0.5 ** (seconds / self.half_life)
+
+    # Merge local counts into the file and pick up the other workers' counts.
+    # The file work runs in a thread; lookups recorded meanwhile are kept.
+    async def flush(self):
+        pending, self._pending = self._pending, CountMinSketch(self.width, self.depth)
+        now = time.time()
+        if self.path is None:
+            self.sketch.scale(self._decay_factor(now - self._decayed_at))
+            self._decayed_at = now
+            self._set_candidates(self.candidates)
+            self.last_flush = now
+            self.flushes += 1
+            return
+        try:
+            merged, candidates = await asyncio.to_thread(self._merge_into_file, pending, list(self.candidates), now)
+        except (OSError, ValueError) as e:
+            self.flush_errors += 1
+            pending.merge(self._pending)
+            self._pending = pending  # try again next time
+            print(f"Warning: could not save popularity counts to {self.path}: {e}")
+            return
+        merged.merge(self._pending)
+        self.sketch = merged
+        self._decayed_at = now
+        self._set_candidates(candidates + list(self.candidates))
+        self.last_flush = now
+        self.flushes += 1
+
+    def _merge_into_file(self, pending: CountMinSketch, candidates: List[str], now: float):
+        with self._locked(".lock"):
+            stored = self._read()
+            if stored is None:
+                # First flush (or an unreadable file): start from what this worker has seen
+                merged = CountMinSketch(self.width, self.depth, array('d', self.sketch.counts))
+                merged.scale(self._decay_factor(now - self._decayed_at))
+                stored_candidates = []
+            else:
+                merged, stored_candidates = stored
+                merged.merge(pending)
+            ranked = sorted(((key, merged.estimate(key)) for key in set(stored_candidates + candidates)),
+                            key=lambda kv: kv[1], reverse=True)
+            keys = [key for key, _ in ranked[:self.capacity]]
+            self._write(merged, keys, now)
+        return merged, keys
+
+    # The stored counts, decayed to now, and candidate keys; None without a usable file
+    def _read(self) -> Optional[Tuple[CountMinSketch, List[str]]]:
+        try:
+            with open(self.path, 'rb') as f:
+                data = orjson.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable popularity file {self.path}: {e}")
+            return None
+        if data.get('version') != FILE_VERSION or data.get('width') != self.width or data.get('depth') != self.depth:
+            print(f"Warning: popularity file {self.path} has a different sketch size; starting over")
+            return None
+        try:
+            sketch = CountMinSketch.from_base64(self.width, self.depth, data['counts'])
+        except (KeyError, ValueError) as e:
+            print(f"Warning: ignoring unreadable popularity file {self.path}: {e}")
+            return None
+        sketch.scale(self._decay_factor(time.time() - data['saved_at']))
+        return sketch, data['candidates']
+
+    def _write(self, sketch: CountMinSketch, candidates: List[str], now: float):
+        payload = {"version": FILE_VERSION, "width": self.width, "depth": self.depth, "saved_at": now,
+                   "counts": sketch.to_base64(), "candidates": candidates}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(payload))
+        os.replace(tmp_path, self.path)
+
+    @contextmanager
+    def _locked(self, suffix: str):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + suffix, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # Whether this process should do the shared background work (prewarming).
+    # One worker per instance holds the leader lock until it exits; without a
+    # path, or without fcntl, every process leads itself.
+    def acquire_leadership(self) -> bool:
+        if self._leader_file is not None or self.path is None or fcntl is None:
+            return True
+        f = open(self.path + ".leader", 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._leader_file = f
+        return True
+
+    def info(self) -> Dict:
+        return {
+            "path": self.path,
+            "recorded": self.recorded,
+            "candidates": len(self.candidates),
+            "sketch_kib": round(len(self.sketch.counts) * 8 / 1024, 1),
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "last_flush": self.last_flush,
+            "top": self.top(10),
+        }
+
+    def close(self):
+        if self._leader_file is not None:
+            self._leader_file.close()
+            self._leader_file = None
@@ -0,0 +1,77 @@
+# Image preprocessing options (see image_preprocess.py). Kept free of OpenCV and
+# numpy so the API can validate options without loading the OCR stack.
+import os
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Optional
+
+PREPROCESS_MAX_SIDE = int(os.getenv("OCR_PREPROCESS_MAX_SIDE", "2000"))
+PREPROCESS_TARGET_DPI = int(os.getenv("OCR_PREPROCESS_TARGET_DPI", "300"))
+
+THRESHOLD_MODES = ('adaptive', 'otsu', 'none')
+
+
+# Preprocessing is opt-in: by default the image is OCR'd as uploaded. Passing
+# any option (or enabled=True) turns it on, with the full pipeline below unless
+# steps are switched off.
+@dataclass(frozen=True)
+class PreprocessOptions:
+    enabled: bool = False
+    max_side: int = PREPROCESS_MAX_SIDE  # longest side after resizing, in pixels
+    target_dpi: int = PREPROCESS_TARGET_DPI  # used when the image carries DPI metadata
+    grayscale: bool = True
+    threshold: str = 'adaptive'  # adaptive | otsu | none
+    deskew: bool = True
+    crop_regions: bool = True
+    max_regions: int = 4
+    min_region_fraction: float = 0.02  # of the image area
+
+    @classmethod
+    def from_dict(cls, values: Optional[Dict]) -> "PreprocessOptions":
+        if values is None:
+            return cls()
+        if not isinstance(values, dict):
+            raise TypeError("preprocessing options must be an object or a boolean")
+        unknown = sorted(set(values) - set(cls.__dataclass_fields__))
+        if unknown:
+            raise ValueError(f"unknown option(s): {', '.join(map(str, unknown))}")
+        known = {k: v for k, v in values.items() if v is not None}
+        if not known:
+            return cls()
+        for name, value in known.items():
+            _check(name, value)
+        return replace(cls(), **{"enabled": True, **known})
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+TYPE_NAMES = {bool: 'a boolean', int: 'an integer', float: 'a number', str: 'a string'}
+
+# (type, minimum, maximum) per option; bools are only accepted for bool options
+LIMITS = {
+    'enabled': (bool, None, None),
+    'max_side': (int, 64, 10000),
+    'target_dpi': (int, 50, 1200),
+    'grayscale': (bool, None, None),
+    'threshold': (str, None, None),
+    'deskew': (bool, None, None),
+    'crop_regions': (bool, None, None),
+    'max_regions': (int, 1, 32),
+    'min_region_fraction': (float, 0.0, 1.0),
+}
+
+
+def _check(name: str, value):
+    kind, minimum, maximum = LIMITS[name]
+    if kind is float:
+        valid_type = isinstance(value, (int, float)) and not isinstance(value, bool)
+    elif kind is int:
+        valid_type = isinstance(value, int) and not isinstance(value, bool)
+    else:
+        valid_type = isinstance(value, kind)
+    if not valid_type:
+        raise TypeError(f"{name} must be {TYPE_NAMES[kind]}, got {value!r}")
+    if name == 'threshold' and value not in THRESHOLD_MODES:
+        raise ValueError(f"threshold must be one of {', '.join(THRESHOLD_MODES)}")
+    if minimum is not None and not minimum <= value <= maximum:
+        raise ValueError(f"{name} must be between {minimum} and {maximum}, got {value!r}")
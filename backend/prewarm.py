@@ -0,0 +1,178 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from circuit_breaker import CircuitBreaker
+from off_client import UpstreamError, UpstreamUnavailable
+from popularity import PopularityTracker
+from product_cache import ProductCache
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "true").lower() in ("1", "true", "yes")
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", "500"))  # most requested barcodes kept warm
+PREWARM_RATE = float(os.getenv("PREWARM_RATE", "2"))  # Open Food Facts requests per second the scheduler may make
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL", "300"))  # seconds between refresh passes
+PREWARM_REFRESH_AHEAD = float(os.getenv("PREWARM_REFRESH_AHEAD", "3600"))  # refresh entries turning stale within this
+POPULARITY_FLUSH_INTERVAL = float(os.getenv("POPULARITY_FLUSH_INTERVAL", "60"))  # seconds between popularity saves
+
+MAX_WARMED_LISTED = 50  # barcodes listed per pass in info()
+
+OUTCOMES = ("fresh", "fetched", "refreshed", "local", "not_found", "failed", "deferred")
+
+
+# Spaces calls at least 1/rate seconds apart (the scheduler fetches one at a time)
+class RateLimiter:
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        delay = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# Keeps the most requested products warm. At startup it loads the top-N
+# barcodes (by PopularityTracker) into the product cache and materializes their
+# analyses; every PREWARM_INTERVAL seconds it refreshes the ones whose cache
+# entry turns stale within PREWARM_REFRESH_AHEAD, so popular products are
+# refetched before a request finds them stale. Open Food Facts is asked at
+# most PREWARM_RATE times a second, never while its circuit breaker is open,
+# and a pass stops at the first 429. Only one worker per instance (the
+# popularity leader) runs passes; every worker flushes its counts.
+class PrewarmScheduler:
+    def __init__(
+        self,
+        tracker: PopularityTracker,
+        products: ProductCache,
+        breaker: CircuitBreaker,
+        materialize: Callable[[str, Dict], Awaitable[bool]],
+        local: Optional[Callable[[str], Optional[Dict]]] = None,
+        enabled: bool = PREWARM_ENABLED,
+        top_n: int = PREWARM_TOP_N,
+        rate: float = PREWARM_RATE,
+        interval: float = PREWARM_INTERVAL,
+        refresh_ahead: float = PREWARM_REFRESH_AHEAD,
+        flush_interval: float = POPULARITY_FLUSH_INTERVAL,
+    ):
+        self.tracker = tracker
+        self.products = products
+        self.breaker = breaker
+        self.materialize = materialize  # (barcode, product) -> True when the analysis had to be built
+        self.local = local  # blocking lookup (the local index); called in a thread
+        self.enabled = enabled
+        self.top_n = top_n
+        self.rate = rate
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.flush_interval = flush_interval
+        self.leader = False
+        self.passes = 0
+        self.totals = dict.fromkeys(OUTCOMES, 0)
+        self.startup_pass: Optional[Dict] = None
+        self.last_pass: Optional[Dict] = None
+        self.current_pass: Optional[Dict] = None
+        self._limiter = RateLimiter(rate)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        last_pass = None
+        while True:
+            if self.enabled and not self.leader:
+                self.leader = self.tracker.acquire_leadership()
+            if self.leader and (last_pass is None or time.monotonic() - last_pass >= self.interval):
+                last_pass = time.monotonic()
+                try:
+                    await self.run_pass("startup" if self.startup_pass is None else "refresh")
+                except Exception as e:
+                    print(f"Warning: prewarm pass failed: {e}")
+            await asyncio.sleep(max(1.0, min(self.flush_interval, self.interval)))
+            if self.tracker.last_flush is None or time.time() - self.tracker.last_flush >= self.flush_interval:
+                await self.tracker.flush()
+
+    async def run_pass(self, kind: str) -> Dict:
+        top = self.tracker.top(self.top_n)
+        summary = {"kind": kind, "started_at": round(time.time(), 3), "seconds": None, "candidates": len(top),
+                   **dict.fromkeys(OUTCOMES, 0), "analyses_built": 0, "stopped": None, "warmed": []}
+        self.current_pass = summary
+        started = time.perf_counter()
+        try:
+            for barcode, _ in top:
+                if summary["stopped"]:
+                    summary["deferred"] += 1
+                    continue
+                outcome, product = await self._warm_product(barcode, summary)
+                summary[outcome] += 1
+                if outcome in ("fetched", "refreshed") and len(summary["warmed"]) < MAX_WARMED_LISTED:
+                    summary["warmed"].append(barcode)
+                try:
+                    if product and await self.materialize(barcode, product):
+                        summary["analyses_built"] += 1
+                except Exception as e:
+                    print(f"Warning: could not materialize the analysis of {barcode}: {e}")
+                await asyncio.sleep(0)  # building analyses is CPU work; let requests in between
+        finally:
+            summary["seconds"] = round(time.perf_counter() - started, 3)
+            self.current_pass = None
+            self.passes += 1
+            for outcome in OUTCOMES:
+                self.totals[outcome] += summary[outcome]
+            self.last_pass = summary
+            if kind == "startup":
+                self.startup_pass = summary
+        return summary
+
+    # Returns (outcome, product to materialize or None)
+    async def _warm_product(self, barcode: str, summary: Dict):
+        if self.local is not None:
+            product = await asyncio.to_thread(self.local, barcode)  # a SQLite read
+            if product is not None:
+                return "local", product
+        entry = await self.products.peek(barcode)
+        if entry is not None and (entry.value is None or entry.expires_at - time.time() > self.refresh_ahead):
+            # Fresh for a while yet; unknown barcodes are left to their negative TTL
+            return ("fresh" if entry.value is not None else "not_found"), entry.value
+        if self.breaker.is_open:
+            return "deferred", entry.value if entry else None  # a stale copy is still worth materializing
+        await self._limiter.wait()
+        try:
+            product = await self.products.refresh(barcode)
+        except UpstreamUnavailable:
+            return "deferred", entry.value if entry else None
+        except UpstreamError as e:
+            if e.status_code == 429:
+                summary["stopped"] = "rate_limited"
+            return "failed", entry.value if entry else None
+        if product is None:
+            return "not_found", None
+        return ("fetched" if entry is None else "refreshed"), product
+
+    def info(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "leader": self.leader,
+            "top_n": self.top_n,
+            "rate_per_sec": self.rate,
+            "interval": self.interval,
+            "refresh_ahead": self.refresh_ahead,
+            "passes": self.passes,
+            "current": self.current_pass,
+            "totals": dict(self.totals),
+            "startup": self.startup_pass,
+            "last_pass": self.last_pass,
+        }
+
+    # Stops the scheduler and saves the counts recorded since the last flush
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.tracker.flush()
+        self.tracker.close()
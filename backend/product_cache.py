@@ -0,0 +1,137 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Iterator, Optional, Set
+
+from cache import CacheEntry, TieredCache
+from local_index import PROJECTED_FIELDS, PROJECTED_NUTRIMENTS
+from off_client import UpstreamError, UpstreamUnavailable
+from search_index import STORED_FIELDS
+from singleflight import SingleFlight
+
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "10000"))
+PRODUCT_CACHE_PATH = os.getenv("PRODUCT_CACHE_PATH", "cache/products.sqlite3")  # empty string disables the disk tier
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", str(24 * 3600)))
+PRODUCT_CACHE_STALE_TTL = float(os.getenv("PRODUCT_CACHE_STALE_TTL", str(7 * 24 * 3600)))
+PRODUCT_CACHE_NEGATIVE_TTL = float(os.getenv("PRODUCT_CACHE_NEGATIVE_TTL", "3600"))
+
+# Fields kept of an upstream product: what the analysis reads (as in the local
+# index) plus what search results show. Full OFF products run to hundreds of KB.
+CACHED_FIELDS = tuple(dict.fromkeys(PROJECTED_FIELDS + STORED_FIELDS))
+
+
+def project_cached(product: Dict) -> Dict:
+    projected = {field: product[field] for field in CACHED_FIELDS if product.get(field) not in (None, '')}
+    nutriments = product.get('nutriments') or {}
+    kept = {key: nutriments[key] for key in PROJECTED_NUTRIMENTS if nutriments.get(key) is not None}
+    if kept:
+        projected['nutriments'] = kept
+    return projected
+
+
+# Read-through product cache keyed by barcode.
+# Fresh entries are served directly; stale ones are served immediately while a
+# background task revalidates them; unknown barcodes are cached negatively.
+class ProductCache:
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Optional[Dict]]],
+        max_entries: int = PRODUCT_CACHE_SIZE,
+        disk_path: Optional[str] = PRODUCT_CACHE_PATH,
+        ttl: float = PRODUCT_CACHE_TTL,
+        stale_ttl: float = PRODUCT_CACHE_STALE_TTL,
+        negative_ttl: float = PRODUCT_CACHE_NEGATIVE_TTL,
+        shared=None,
+    ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.cache = TieredCache(max_entries, disk_path or None, table="products", shared=shared)
+        self._flights = SingleFlight()
+        self._revalidating: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def stats(self):
+        return self.cache.stats
+
+    async def get(self, barcode: str) -> Optional[Dict]:
+        entry = await self.cache.aget(barcode)
+        if entry is not None:
+            if entry.value is None:
+                self.stats.negative_hits += 1
+            if not entry.is_fresh():
+                self.stats.stale_hits += 1
+                self._schedule_revalidation(barcode)
+            return entry.value
+        return await self.refresh(barcode)
+
+    # Fetch from upstream and store the result; raises UpstreamError if the fetch fails.
+    # Concurrent refreshes of the same barcode share a single upstream request.
+    async def refresh(self, barcode: str) -> Optional[Dict]:
+        return await self._flights.do(barcode, lambda: self._fetch_and_store(barcode))
+
+    async def _fetch_and_store(self, barcode: str) -> Optional[Dict]:
+        try:
+            product = await self.fetch(barcode)
+        except UpstreamUnavailable:
+            raise  # not attempted; the circuit breaker keeps its own count
+        except UpstreamError:
+            self.stats.upstream_errors += 1
+            raise
+        return self.put(barcode, product)
+
+    # The cached entry, if any, without counting a lookup or revalidating
+    async def peek(self, barcode: str) -> Optional[CacheEntry]:
+        return await self.cache.apeek(barcode)
+
+    # Stores the projected product (or a negative entry) and returns what was stored
+    def put(self, barcode: str, product: Optional[Dict]) -> Optional[Dict]:
+        if product is None:
+            self.cache.set(barcode, None, self.negative_ttl)
+            return None
+        product = project_cached(product)
+        self.cache.set(barcode, product, self.ttl, self.stale_ttl)
+        return product
+
+    def invalidate(self, barcode: str):
+        self.cache.delete(barcode)
+
+    def _schedule_revalidation(self, barcode: str):
+        if barcode in self._revalidating:
+            return
+        self._revalidating.add(barcode)
+        task = asyncio.create_task(self._revalidate(barcode))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _revalidate(self, barcode: str):
+        try:
+            self.stats.revalidations += 1
+            await self.refresh(barcode)
+        except UpstreamUnavailable:
+            pass  # upstream known to be down; retried on a later stale hit
+        except UpstreamError as e:
+            # Keep serving the stale copy until it ages out
+            print(f"Background revalidation failed for {barcode}: {e}")
+        finally:
+            self._revalidating.discard(barcode)
+
+    # Cached products (negative entries excluded), e.g. to seed the search index
+    def iter_products(self) -> Iterator[Dict]:
+        return self.cache.iter_values()
+
+    def info(self) -> Dict:
+        return {
+            **self.cache.info(),
+            "revalidating": len(self._revalidating),
+            "in_flight": self._flights.in_flight(),
+            "coalesced": self._flights.shared,
+        }
+
+    async def aclose(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.cache.close()
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from cache import CacheEntry, CacheStats, MemoryLRU
+from singleflight import SingleFlight
+
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "300"))
+PROFILE_CACHE_NEGATIVE_TTL = float(os.getenv("PROFILE_CACHE_NEGATIVE_TTL", "30"))
+PROFILE_BATCH_SIZE = int(os.getenv("PROFILE_BATCH_SIZE", "200"))
+# With a shared tier, each worker keeps its own copy only this long, so an
+# invalidation received by one worker reaches the others within that time
+PROFILE_CACHE_LOCAL_TTL = float(os.getenv("PROFILE_CACHE_LOCAL_TTL", "5"))
+
+
+# Async loader for rows of the Supabase `profiles` table with a bounded TTL cache.
+# `client_factory` returns an async Supabase client (or anything exposing the same
+# table().select().in_().execute() chain, such as supabase_fake.FakeAsyncSupabase).
+# With `shared` (a shared_cache.SharedCache), profiles are also shared across workers.
+class ProfileLoader:
+    def __init__(
+        self,
+        client_factory: Callable[[], Awaitable[Any]],
+        max_entries: int = PROFILE_CACHE_SIZE,
+        ttl: float = PROFILE_CACHE_TTL,
+        negative_ttl: float = PROFILE_CACHE_NEGATIVE_TTL,
+        batch_size: int = PROFILE_BATCH_SIZE,
+        shared=None,
+        local_ttl: float = PROFILE_CACHE_LOCAL_TTL,
+    ):
+        self.client_factory = client_factory
+        self.shared = shared
+        self.local_ttl = local_ttl
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.batch_size = batch_size
+        self.stats = CacheStats()
+        self.cache = MemoryLRU(max_entries, self.stats)
+        self._client = None
+        self._client_lock = asyncio.Lock()
+        self._flights = SingleFlight()
+        # user_id -> [fetches in flight, generation]. invalidate() and prime() bump the
+        # generation, so a fetch that started before them doesn't store the row it read.
+        self._fetching: Dict[str, List[int]] = {}
+
+    async def _get_client(self):
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    self._client = await self.client_factory()
+        return self._client
+
+    def _lookup(self, user_id: str) -> Optional[CacheEntry]:
+        entry = self.cache.get(user_id)
+        if entry is not None and entry.is_fresh():
+            self.stats.memory_hits += 1
+            if entry.value is None:
+                self.stats.negative_hits += 1
+            return entry
+        return None
+
+    # Memory first, then the shared tier; counts the miss when neither has it
+    async def _cached(self, user_id: str) -> Optional[CacheEntry]:
+        entry = self._lookup(user_id)
+        if entry is None and self.shared is not None:
+            entry = await self.shared.get("profiles", user_id)
+            if entry is not None and entry.is_fresh():
+                self.stats.shared_hits += 1
+                self._store_local(user_id, entry)
+            else:
+                entry = None
+        if entry is None:
+            self.stats.misses += 1
+        return entry
+
+    def _store_local(self, user_id: str, entry: CacheEntry):
+        if self.shared is not None and entry.expires_at > time.time() + self.local_ttl:
+            expires_at = time.time() + self.local_ttl
+            entry = CacheEntry(entry.value, entry.stored_at, expires_at, expires_at)
+        self.cache.set(user_id, entry)
+
+    def _store(self, user_id: str, profile: Optional[Dict]):
+        now = time.time()
+        ttl = self.ttl if profile is not None else self.negative_ttl
+        entry = CacheEntry(profile, now, now + ttl, now + ttl)
+        self._store_local(user_id, entry)
+        if self.shared is not None:
+            self.shared.set("profiles", user_id, entry)
+
+    async def get(self, user_id: str) -> Optional[Dict]:
+        entry = await self._cached(user_id)
+        if entry is not None:
+            return entry.value
+        # Concurrent lookups of the same user share one query
+        profiles = await self._flights.do(user_id, lambda: self._fetch([user_id]))
+        return profiles.get(user_id)
+
+    # Load several profiles, fetching all cache misses with batched in_() queries
+    async def get_many(self, user_ids: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        result: Dict[str, Optional[Dict]] = {}
+        missing: List[str] = []
+        unique_ids = list(dict.fromkeys(user_ids))
+        entries = await asyncio.gather(*(self._cached(user_id) for user_id in unique_ids))
+        for user_id, entry in zip(unique_ids, entries):
+            if entry is not None:
+                result[user_id] = entry.value
+            else:
+                missing.append(user_id)
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            fetched = await self._fetch(chunk)
+            for user_id in chunk:
+                result[user_id] = fetched.get(user_id)
+        return result
+
+    async def _fetch(self, user_ids: List[str]) -> Dict[str, Dict]:
+        started = {}
+        for user_id in user_ids:
+            state = self._fetching.setdefault(user_id, [0, 0])
+            state[0] += 1
+            started[user_id] = state[1]
+        try:
+            try:
+                client = await self._get_client()
+                query = client.table('profiles').select('*')
+                if len(user_ids) == 1:
+                    query = query.eq('user_id', user_ids[0])
+                else:
+                    query = query.in_('user_id', user_ids)
+                response = await query.execute()
+            except Exception as e:
+                # Don't cache failures; the next request retries
+                self.stats.upstream_errors += 1
+                print(f"Error fetching profile: {e}")
+                return {}
+
+            profiles = {row['user_id']: row for row in (response.data or []) if row.get('user_id')}
+            for user_id in user_ids:
+                if self._fetching[user_id][1] == started[user_id]:
+                    self._store(user_id, profiles.get(user_id))
+            return profiles
+        finally:
+            for user_id in user_ids:
+                state = self._fetching[user_id]
+                state[0] -= 1
+                if not state[0]:
+                    del self._fetching[user_id]
+
+    def _bump_generation(self, user_id: str):
+        state = self._fetching.get(user_id)
+        if state is not None:
+            state[1] += 1
+
+    # The id of the user a Supabase access token belongs to; None if the token isn't valid
+    async def verify_token(self, token: str) -> Optional[str]:
+        try:
+            client = await self._get_client()
+            response = await client.auth.get_user(token)
+        except Exception as e:
+            print(f"Error verifying access token: {e}")
+            return None
+        user = getattr(response, 'user', None)
+        return getattr(user, 'id', None)
+
+    # Drop a cached profile so the next lookup reads the latest row
+    def invalidate(self, user_id: str):
+        self._bump_generation(user_id)
+        self.cache.delete(user_id)
+        if self.shared is not None:
+            self.shared.delete("profiles", user_id)
+
+    # Replace a cached profile with a row received from a change notification
+    def prime(self, user_id: str, profile: Optional[Dict]):
+        self._bump_generation(user_id)
+        self._store(user_id, profile)
+
+    def clear(self):
+        self.cache.clear()
+
+    def info(self) -> Dict:
+        return {
+            **self.stats.as_dict(),
+            "entries": len(self.cache),
+            "capacity": self.cache.max_entries,
+            "ttl": self.ttl,
+            "client_initialized": self._client is not None,
+        }
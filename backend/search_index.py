@@ -0,0 +1,347 @@
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import orjson
+
+if TYPE_CHECKING:
+    import numpy as np
+
+SEARCH_PREFIX_EXPANSIONS = int(os.getenv("SEARCH_PREFIX_EXPANSIONS", "50"))  # vocabulary terms tried for a prefix
+SEARCH_REBUILD_TOMBSTONES = 0.25  # compact once this share of documents has been replaced
+# Score a term's expansions densely once their postings exceed 1/this of the documents
+SEARCH_DENSE_FRACTION = 8
+SEARCH_STORE_BATCH = 5000  # stored documents buffered in memory before they are written out
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "50"))
+# Ask Open Food Facts when the local index has no match for a query
+SEARCH_UPSTREAM_FALLBACK = os.getenv("SEARCH_UPSTREAM_FALLBACK", "true").lower() in ("1", "true", "yes")
+
+# Per-field BM25F weights; the product name matters most for autocomplete
+FIELD_WEIGHTS = {'product_name': 3.0, 'brands': 2.0}
+# Fields kept per document and available to `fields=` projection
+STORED_FIELDS = ('code', 'product_name', 'brands', 'image_url', 'nutriscore_grade', 'nova_group', 'quantity')
+DEFAULT_FIELDS = ('code', 'product_name', 'brands', 'image_url')
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Score multipliers by how a query term matched a vocabulary term
+EXACT_MATCH, PREFIX_MATCH, FUZZY_MATCH = 1.0, 0.8, 0.6
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(normalize(text))
+
+
+def max_edits(term: str) -> int:
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+class SearchPage:
+    def __init__(self, total: int, hits: List[Tuple[float, Dict]], elapsed_ms: float):
+        self.total = total
+        self.hits = hits
+        self.elapsed_ms = elapsed_ms
+
+
+# Stored fields of the indexed documents, by doc id. They live in a private
+# temporary SQLite database (on disk, removed when closed) rather than as
+# Python dicts, so the index's memory is mostly its postings; a search only
+# reads back the documents on the page it returns.
+class DocumentStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect('', check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=OFF")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute("CREATE TABLE docs (id INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+        self._buffer: Dict[int, bytes] = {}
+
+    def put(self, doc_id: int, doc: Dict):
+        self._buffer[doc_id] = orjson.dumps(doc)
+        if len(self._buffer) >= SEARCH_STORE_BATCH:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        rows, self._buffer = list(self._buffer.items()), {}
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO docs (id, data) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def get_many(self, doc_ids: Sequence[int]) -> List[Dict]:
+        found = {doc_id: self._buffer[doc_id] for doc_id in doc_ids if doc_id in self._buffer}
+        missing = [doc_id for doc_id in doc_ids if doc_id not in found]
+        if missing:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, data FROM docs WHERE id IN ({','.join('?' * len(missing))})", missing
+                ).fetchall()
+            found.update(rows)
+        return [orjson.loads(found[doc_id]) for doc_id in doc_ids]
+
+    # Documents of the given (ascending) ids, read in batches
+    def iter_docs(self, doc_ids: Sequence[int], batch_size: int = 900) -> Iterator[Dict]:
+        for start in range(0, len(doc_ids), batch_size):
+            yield from self.get_many(doc_ids[start:start + batch_size])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# In-memory inverted index over product names/brands with BM25F ranking.
+# The last query term is treated as a prefix (autocomplete), and terms that
+# match nothing fall back to typo-tolerant lookup in the vocabulary via
+# rapidfuzz. A query only touches the postings of its terms, never every
+# document. Documents are replaced by tombstoning the old id; the postings are
+# compacted once too many tombstones accumulate. Stored fields are kept in a
+# DocumentStore.
+class SearchIndex:
+    def __init__(self):
+        self._store = DocumentStore()  # doc id -> stored fields
+        self._lengths = array('f')  # weighted document length
+        self._alive = array('B')  # 0 for tombstoned doc ids
+        self._by_code: Dict[str, int] = {}
+        self._postings: Dict[str, Tuple[array, array]] = {}  # term -> (doc ids, weighted tf)
+        self._vocabulary: List[str] = []  # sorted, rebuilt lazily for prefix lookups
+        self._vocabulary_dirty = False
+        self._total_length = 0.0
+        self._tombstones = 0
+        self.queries = 0
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._by_code
+
+    def documents(self) -> Iterator[Dict]:
+        self._store.flush()
+        live = [doc_id for doc_id, alive in enumerate(self._alive) if alive]
+        return self._store.iter_docs(live)
+
+    def add(self, product: Dict):
+        code = str(product.get('code') or '').strip()
+        if not code or not product.get('product_name'):
+            return
+        self.remove(code)
+
+        doc_id = len(self._lengths)
+        term_weights: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            value = product.get(field)
+            if isinstance(value, str):
+                for token in tokenize(value):
+                    term_weights[token] = term_weights.get(token, 0.0) + weight
+        length = sum(term_weights.values())
+
+        self._store.put(doc_id, {field: product[field] for field in STORED_FIELDS if product.get(field) not in (None, '')})
+        self._lengths.append(length)
+        self._alive.append(1)
+        self._by_code[code] = doc_id
+        self._total_length += length
+        for term, tf in term_weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('I'), array('f'))
+                self._vocabulary_dirty = True
+            postings[0].append(doc_id)
+            postings[1].append(tf)
+
+        if self._tombstones > 1000 and self._tombstones > SEARCH_REBUILD_TOMBSTONES * len(self._lengths):
+            self.compact()
+
+    def add_many(self, products: Iterable[Dict]) -> int:
+        before = len(self)
+        for product in products:
+            self.add(product)
+        self._sorted_vocabulary()  # sort once now rather than on the next query
+        self._store.flush()
+        return len(self) - before
+
+    def remove(self, code: str):
+        doc_id = self._by_code.pop(code, None)
+        if doc_id is not None:
+            self._total_length -= self._lengths[doc_id]
+            self._alive[doc_id] = 0
+            self._tombstones += 1
+
+    # Rebuild postings without tombstoned documents
+    def compact(self):
+        fresh = SearchIndex()
+        fresh.add_many(self.documents())  # indexed fields are a subset of the stored ones
+        old_store = self._store
+        self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k != 'queries'})
+        old_store.close()
+
+    def _sorted_vocabulary(self) -> List[str]:
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        return self._vocabulary
+
+    # Vocabulary terms a query term may stand for, with a match-quality multiplier
+    def _expand(self, term: str, prefix: bool) -> List[Tuple[str, float]]:
+        expansions = []
+        if term in self._postings:
+            expansions.append((term, EXACT_MATCH))
+        if prefix:
+            vocabulary = self._sorted_vocabulary()
+            start = bisect_left(vocabulary, term)
+            candidates = []
+            for i in range(start, min(start + 20 * SEARCH_PREFIX_EXPANSIONS, len(vocabulary))):
+                candidate = vocabulary[i]
+                if not candidate.startswith(term):
+                    break
+                if candidate != term:
+                    candidates.append(candidate)
+            # Prefer the most common completions
+            candidates = heapq.nlargest(SEARCH_PREFIX_EXPANSIONS, candidates, key=lambda t: len(self._postings[t][0]))
+            expansions.extend((candidate, PREFIX_MATCH) for candidate in candidates)
+        if not expansions and max_edits(term):
+            # rapidfuzz pulls in numpy; only needed once a term matches nothing
+            from rapidfuzz import process
+            from rapidfuzz.distance import Levenshtein
+
+            edits = max_edits(term)
+            # Typos rarely hit the first letter, so try those terms before the whole vocabulary
+            vocabulary = self._sorted_vocabulary()
+            same_initial = vocabulary[bisect_left(vocabulary, term[0]):bisect_left(vocabulary, chr(ord(term[0]) + 1))]
+            matches = process.extract(term, same_initial, scorer=Levenshtein.distance, score_cutoff=edits, limit=10)
+            if not matches:
+                matches = process.extract(term, vocabulary, scorer=Levenshtein.distance, score_cutoff=edits, limit=10)
+            expansions.extend((candidate, FUZZY_MATCH * (1 - distance / (len(term) + 1))) for candidate, distance, _ in matches)
+        return expansions
+
+    # BM25F scores of the documents matching one query term, as (ascending doc
+    # ids, scores). Only the postings of the term's expansions are read, through
+    # zero-copy numpy views of the arrays.
+    def _score_term(self, expansions: Sequence[Tuple[str, float]], lengths: "np.ndarray",
+                    live_docs: int, average_length: float) -> Tuple["np.ndarray", "np.ndarray"]:
+        import numpy as np
+
+        id_parts, score_parts = [], []
+        for term, multiplier in expansions:
+            doc_ids, tfs = self._postings[term]
+            ids = np.frombuffer(doc_ids, dtype=np.uint32)
+            tf = np.frombuffer(tfs, dtype=np.float32)
+            df = len(ids)
+            idf = math.log(1 + (live_docs - df + 0.5) / (df + 0.5))
+            norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths[ids] / average_length))
+            id_parts.append(ids)
+            score_parts.append((multiplier * idf * norm).astype(np.float32))
+        if len(id_parts) == 1:
+            return id_parts[0].copy(), score_parts[0]  # postings are already in doc id order
+        # A query term counts once per document, via its best expansion
+        if sum(len(ids) for ids in id_parts) * SEARCH_DENSE_FRACTION > len(lengths):
+            # Broad prefixes ("c") match much of the index; a dense pass is cheaper than sorting
+            dense = np.zeros(len(lengths), dtype=np.float32)
+            for ids, scores in zip(id_parts, score_parts):
+                dense[ids] = np.maximum(dense[ids], scores)
+            ids = np.flatnonzero(dense > 0).astype(np.uint32)
+            return ids, dense[ids]
+        ids, scores = np.concatenate(id_parts), np.concatenate(score_parts)
+        order = np.lexsort((-scores, ids))
+        ids, scores = ids[order], scores[order]
+        first = np.empty(len(ids), dtype=bool)
+        first[:1] = True
+        np.not_equal(ids[1:], ids[:-1], out=first[1:])
+        return ids[first], scores[first]
+
+    def search(self, query: str, offset: int = 0, limit: int = 10) -> SearchPage:
+        # numpy is imported on first search rather than at startup
+        import numpy as np
+
+        started = time.perf_counter()
+        self.queries += 1
+        terms = tokenize(query)
+        live_docs = len(self._by_code)
+        if not terms or not live_docs:
+            return SearchPage(0, [], 0.0)
+        average_length = self._total_length / live_docs or 1.0
+        # Autocomplete: the last term may still be being typed
+        completing = not query[-1:].isspace()
+
+        lengths = np.frombuffer(self._lengths, dtype=np.float32)
+        per_term = []
+        for i, term in enumerate(terms):
+            expansions = self._expand(term, prefix=completing and i == len(terms) - 1)
+            if expansions:
+                per_term.append(self._score_term(expansions, lengths, live_docs, average_length))
+        del lengths  # release the buffer view so the index can grow again
+
+        if not per_term:
+            return SearchPage(0, [], round((time.perf_counter() - started) * 1000, 3))
+        alive = np.frombuffer(self._alive, dtype=np.uint8)
+        ids = np.empty(0, dtype=np.uint32)
+        if len(per_term) == len(terms):
+            # Every term must match: start from the rarest term and look its
+            # documents up in the other terms' (sorted) matches
+            by_size = sorted(per_term, key=lambda matches: len(matches[0]))
+            ids, totals = by_size[0]
+            for term_ids, term_scores in by_size[1:]:
+                positions = np.minimum(np.searchsorted(term_ids, ids), len(term_ids) - 1)
+                found = term_ids[positions] == ids
+                ids, totals = ids[found], totals[found] + term_scores[positions[found]]
+            live = alive[ids].astype(bool)
+            ids, totals = ids[live], totals[live]
+        if not len(ids):
+            # No document matches every term: rank documents matching any term
+            ids, inverse = np.unique(np.concatenate([term_ids for term_ids, _ in per_term]), return_inverse=True)
+            totals = np.bincount(inverse, weights=np.concatenate([scores for _, scores in per_term])).astype(np.float32)
+            live = alive[ids].astype(bool)
+            ids, totals = ids[live], totals[live]
+        del alive
+
+        wanted = offset + limit
+        candidates = np.arange(len(ids))
+        if len(candidates) > wanted:
+            candidates = np.argpartition(-totals, wanted - 1)[:wanted]
+        ranked = candidates[np.argsort(-totals[candidates], kind='stable')][offset:]
+        docs = self._store.get_many([int(ids[i]) for i in ranked])
+        hits = [(round(float(totals[i]), 4), doc) for i, doc in zip(ranked, docs)]
+        return SearchPage(len(ids), hits, round((time.perf_counter() - started) * 1000, 3))
+
+    def info(self) -> Dict:
+        return {
+            "documents": len(self._by_code),
+            "terms": len(self._postings),
+            "tombstones": self._tombstones,
+            "queries": self.queries,
+        }
+
+    def close(self):
+        self._store.close()
+
+
+def build_index(*sources: Iterable[Dict]) -> SearchIndex:
+    index = SearchIndex()
+    for source in sources:
+        index.add_many(source)
+    # Warm numpy/rapidfuzz off the request path; builds run in a worker thread
+    import numpy  # noqa: F401
+    import rapidfuzz.process  # noqa: F401
+    return index
+
+
+def project_fields(doc: Dict, fields: Optional[Sequence[str]] = None) -> Dict:
+    return {field: doc[field] for field in (fields or DEFAULT_FIELDS) if field in doc}
@@ -0,0 +1,113 @@
+# Production serving mode: several uvicorn workers sharing one cache process.
+#
+#   python serve.py                                  # one worker per core, port 8000
+#   python serve.py --workers 8 --port 8080
+#   SHARED_CACHE_URL=redis://cache:6379/0 python serve.py   # use an existing Redis
+#
+# Without SHARED_CACHE_URL, cache_server.py is started on a Unix socket and
+# the workers share cached products, profiles and OCR results through it,
+# so a new worker starts warm. OCR worker processes are split between the
+# API workers (OCR_WORKERS defaults to cores / workers).
+#
+# On SIGTERM or SIGINT the instance drains: /readyz starts failing, and after
+# SHUTDOWN_DRAIN_SECONDS the workers stop accepting connections. They then
+# finish in-flight requests (up to SHUTDOWN_TIMEOUT seconds) and flush queued
+# cache writes. The cache process stops last.
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "0"))
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "30"))
+
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+
+
+def wait_for_socket(path: str, process: subprocess.Popen, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if os.path.exists(path):
+            return
+        if process.poll() is not None:
+            raise RuntimeError(f"cache server exited with code {process.returncode}")
+        time.sleep(0.02)
+    raise RuntimeError(f"cache server did not create {path} within {timeout:.0f}s")
+
+
+def stop(process: subprocess.Popen, timeout: float):
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument('--port', type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument('--workers', type=int, default=default_workers(), help="API worker processes")
+    parser.add_argument('--cache-socket', help="Unix socket for the shared cache process (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    workers = max(1, args.workers)
+    run_dir = tempfile.mkdtemp(prefix="nutrilabel-")
+    env = dict(os.environ)
+    env.setdefault("OCR_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+    env["DRAIN_FILE"] = os.path.join(run_dir, "draining")
+
+    cache_server = None
+    if not env.get("SHARED_CACHE_URL"):
+        socket_path = args.cache_socket or os.path.join(run_dir, "cache.sock")
+        # Own session: a terminal Ctrl+C must not stop the cache before the workers flush to it
+        cache_server = subprocess.Popen([sys.executable, "cache_server.py", "--socket", socket_path], cwd=BACKEND, env=env,
+                                        start_new_session=True)
+        wait_for_socket(socket_path, cache_server)
+        env["SHARED_CACHE_URL"] = f"unix://{socket_path}"
+
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", args.host, "--port", str(args.port),
+         "--workers", str(workers), "--timeout-graceful-shutdown", str(int(SHUTDOWN_TIMEOUT))],
+        cwd=BACKEND, env=env, start_new_session=True,  # signals reach the workers only through the drain below
+    )
+    print(f"Serving on {args.host}:{args.port} with {workers} workers, shared cache at {env['SHARED_CACHE_URL']}")
+
+    stopping = []
+
+    def request_stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    try:
+        while not stopping and api.poll() is None:
+            time.sleep(0.2)
+        if stopping:
+            # Fail readiness first so load balancers stop routing here, then let the workers drain
+            open(env["DRAIN_FILE"], "w").close()
+            time.sleep(SHUTDOWN_DRAIN_SECONDS)
+            stop(api, SHUTDOWN_TIMEOUT + 10)
+    finally:
+        if api.poll() is None:
+            stop(api, SHUTDOWN_TIMEOUT + 10)
+        if cache_server is not None:
+            stop(cache_server, 5)
+        for name in os.listdir(run_dir):
+            os.unlink(os.path.join(run_dir, name))
+        os.rmdir(run_dir)
+    return api.returncode if not stopping else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
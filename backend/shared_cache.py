@@ -0,0 +1,259 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from cache import CacheEntry
+
+# Cross-worker cache tier. Any Redis-compatible server works: Redis itself, or
+# cache_server.py, which serve.py starts on a local socket.
+#   redis://[[user]:password@]host:6379[/db]   or   unix:///path/to/cache.sock
+# A password is sent with AUTH and a database index with SELECT on every new connection.
+SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "")
+SHARED_CACHE_TIMEOUT = float(os.getenv("SHARED_CACHE_TIMEOUT", "0.05"))  # seconds per command
+SHARED_CACHE_POOL_SIZE = int(os.getenv("SHARED_CACHE_POOL_SIZE", "8"))
+SHARED_CACHE_RETRY_AFTER = float(os.getenv("SHARED_CACHE_RETRY_AFTER", "5"))  # seconds to bypass after a failure
+SHARED_CACHE_WRITE_QUEUE = int(os.getenv("SHARED_CACHE_WRITE_QUEUE", "10000"))
+SHARED_CACHE_PREFIX = os.getenv("SHARED_CACHE_PREFIX", "nutrilabel:")
+
+
+class RespError(Exception):
+    """Error reply from the server (a RESP `-ERR ...` line)."""
+
+
+# --- RESP2 wire format (shared with cache_server.py) ---
+
+def encode_command(*args: Any) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readuntil(b"\r\n")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode("utf-8")
+    if kind == b"-":
+        raise RespError(body.decode("utf-8"))
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        size = int(body)
+        if size < 0:
+            return None
+        data = await reader.readexactly(size + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(body)
+        return None if count < 0 else [await read_reply(reader) for _ in range(count)]
+    raise RespError(f"Unexpected reply type {kind!r}")
+
+
+# (AUTH args, SELECT db) for a cache URL; raises ValueError for a malformed database index
+def connection_setup(url: str) -> Tuple[Optional[Tuple[str, ...]], Optional[int]]:
+    parts = urlsplit(url)
+    auth = None
+    if parts.password:
+        auth = (parts.username, parts.password) if parts.username else (parts.password,)
+    db = None
+    if parts.scheme != "unix" and parts.path.strip("/"):
+        try:
+            db = int(parts.path.strip("/"))
+        except ValueError:
+            raise ValueError(f"SHARED_CACHE_URL database must be a number, got {parts.path!r}") from None
+    return auth, db
+
+
+async def _open_connection(url: str, auth: Optional[Tuple[str, ...]] = None, db: Optional[int] = None):
+    parts = urlsplit(url)
+    if parts.scheme == "unix":
+        reader, writer = await asyncio.open_unix_connection(parts.path)
+    else:
+        reader, writer = await asyncio.open_connection(parts.hostname or "127.0.0.1", parts.port or 6379)
+    try:
+        if auth is not None:
+            writer.write(encode_command("AUTH", *auth))
+            await read_reply(reader)
+        if db:
+            writer.write(encode_command("SELECT", db))
+            await read_reply(reader)
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer
+
+
+def _encode_entry(entry: CacheEntry) -> bytes:
+    return json.dumps([entry.value, entry.stored_at, entry.expires_at, entry.stale_until],
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _decode_entry(data: bytes) -> Optional[CacheEntry]:
+    value, stored_at, expires_at, stale_until = json.loads(data)
+    entry = CacheEntry(value, stored_at, expires_at, stale_until)
+    return entry if entry.is_servable() else None
+
+
+# Client for the shared tier. Reads are awaited (with a short timeout); writes
+# and deletes are queued and sent by a background task, so request handlers
+# never wait on them. When the server can't be reached the tier is bypassed for
+# SHARED_CACHE_RETRY_AFTER seconds and every worker falls back to its own caches.
+class SharedCache:
+    def __init__(
+        self,
+        url: str,
+        timeout: float = SHARED_CACHE_TIMEOUT,
+        pool_size: int = SHARED_CACHE_POOL_SIZE,
+        retry_after: float = SHARED_CACHE_RETRY_AFTER,
+        write_queue: int = SHARED_CACHE_WRITE_QUEUE,
+        prefix: str = SHARED_CACHE_PREFIX,
+    ):
+        self.url = url
+        self._auth, self._db = connection_setup(url)  # fails at startup on a bad URL
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.retry_after = retry_after
+        self.write_queue_size = write_queue
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.writes = 0
+        self.dropped_writes = 0
+        self._down_until = 0.0
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._writes: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["SharedCache"]:
+        return cls(SHARED_CACHE_URL) if SHARED_CACHE_URL else None
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}{namespace}:{key}"
+
+    async def _command(self, *args: Any) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(_open_connection(self.url, self._auth, self._db), self.timeout)
+                reader, writer = connection
+                writer.write(encode_command(*args))
+                reply = await asyncio.wait_for(read_reply(reader), self.timeout)
+            except RespError:
+                if connection is not None:  # None: AUTH/SELECT refused while connecting
+                    self._idle.append(connection)
+                raise
+            except BaseException:
+                # Timed out or broken mid-reply: the connection's state is unknown
+                if connection is not None:
+                    connection[1].close()
+                raise
+            self._idle.append(connection)
+            return reply
+
+    def _failed(self, e: BaseException):
+        self.errors += 1
+        if self.available:
+            print(f"Shared cache unavailable ({type(e).__name__}: {e}); bypassing it for {self.retry_after:.0f}s")
+        self._down_until = time.monotonic() + self.retry_after
+
+    async def get(self, namespace: str, key: str) -> Optional[CacheEntry]:
+        if not self.available:
+            return None
+        try:
+            data = await self._command("GET", self._key(namespace, key))
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RespError) as e:
+            self._failed(e)
+            return None
+        entry = _decode_entry(data) if data is not None else None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    # Queue a write; returns immediately
+    def set(self, namespace: str, key: str, entry: CacheEntry):
+        ttl_ms = int((entry.stale_until - time.time()) * 1000)
+        if ttl_ms > 0:
+            self._enqueue(("SET", self._key(namespace, key), _encode_entry(entry), "PX", ttl_ms))
+
+    def delete(self, namespace: str, key: str):
+        self._enqueue(("DEL", self._key(namespace, key)))
+
+    def _enqueue(self, command: Tuple):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no event loop (CLI tools); only the local tiers are used
+        if self._writes is None:
+            self._writes = asyncio.Queue(self.write_queue_size)
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._drain_writes())
+        try:
+            self._writes.put_nowait(command)
+        except asyncio.QueueFull:
+            self.dropped_writes += 1
+
+    async def _drain_writes(self):
+        while True:
+            command = await self._writes.get()
+            try:
+                if self.available or command[0] == "DEL":
+                    await self._command(*command)
+                    self.writes += 1
+                else:
+                    self.dropped_writes += 1
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RespError) as e:
+                self._failed(e)
+                self.dropped_writes += 1
+            finally:
+                self._writes.task_done()
+
+    async def ping(self) -> bool:
+        try:
+            return await self._command("PING") == "PONG"
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RespError):
+            return False
+
+    def info(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "url": self.url,
+            "available": self.available,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "errors": self.errors,
+            "writes": self.writes,
+            "pending_writes": self._writes.qsize() if self._writes is not None else 0,
+            "dropped_writes": self.dropped_writes,
+        }
+
+    # Send queued writes (bounded by `timeout`), then close every connection
+    async def aclose(self, timeout: float = 5.0):
+        if self._writes is not None and self._writer_task is not None and not self._writer_task.done():
+            try:
+                await asyncio.wait_for(self._writes.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"Shared cache: {self._writes.qsize()} writes not flushed at shutdown")
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            await asyncio.gather(self._writer_task, return_exceptions=True)
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
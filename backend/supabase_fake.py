@@ -0,0 +1,97 @@
+# In-memory stand-in for the async Supabase client's table API, for local
+# testing and benchmarks without a Supabase project:
+#
+#   fake = FakeAsyncSupabase({"profiles": [{"user_id": "u1", "allergies": ["nuts"]}]})
+#   loader = ProfileLoader(lambda: fake.as_factory())
+#
+# Only the query builder methods the backend uses are implemented
+# (select / eq / in_ / limit / execute), plus auth.get_user for the access
+# tokens in `tokens` (token -> user id). `latency` simulates a network round-trip.
+import asyncio
+import copy
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class FakeResponse:
+    data: List[Dict]
+    count: Optional[int] = None
+
+
+class FakeQuery:
+    def __init__(self, client: "FakeAsyncSupabase", table: str):
+        self.client = client
+        self.table = table
+        self.filters = []
+        self._limit: Optional[int] = None
+
+    def select(self, *columns: str, **kwargs) -> "FakeQuery":
+        return self
+
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column: str, values: List[Any]) -> "FakeQuery":
+        allowed = set(values)
+        self.filters.append(lambda row: row.get(column) in allowed)
+        return self
+
+    def limit(self, size: int) -> "FakeQuery":
+        self._limit = size
+        return self
+
+    async def execute(self) -> FakeResponse:
+        self.client.queries += 1
+        if self.client.latency:
+            await asyncio.sleep(self.client.latency)
+        if self.client.fail:
+            raise RuntimeError("fake Supabase failure")
+        rows = [copy.deepcopy(row) for row in self.client.tables.get(self.table, [])
+                if all(matches(row) for matches in self.filters)]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return FakeResponse(data=rows)
+
+
+@dataclass
+class FakeUser:
+    id: str
+
+
+@dataclass
+class FakeUserResponse:
+    user: FakeUser
+
+
+class FakeAuth:
+    def __init__(self, client: "FakeAsyncSupabase"):
+        self.client = client
+
+    async def get_user(self, jwt: str) -> FakeUserResponse:
+        user_id = self.client.tokens.get(jwt)
+        if user_id is None:
+            raise RuntimeError("invalid JWT")
+        return FakeUserResponse(FakeUser(user_id))
+
+
+class FakeAsyncSupabase:
+    def __init__(
+        self,
+        tables: Optional[Dict[str, List[Dict]]] = None,
+        latency: float = 0.0,
+        tokens: Optional[Dict[str, str]] = None,
+    ):
+        self.tables = tables or {}
+        self.latency = latency
+        self.tokens = tokens or {}
+        self.auth = FakeAuth(self)
+        self.fail = False
+        self.queries = 0
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    async def as_factory(self) -> "FakeAsyncSupabase":
+        return self
@@ -0,0 +1,230 @@
+import binascii
+import io
+import json
+import os
+import re
+from typing import AsyncIterable, Dict, Optional, Tuple
+
+OCR_MAX_IMAGE_BYTES = int(os.getenv("OCR_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))  # decoded image
+OCR_MAX_IMAGE_PIXELS = int(os.getenv("OCR_MAX_IMAGE_PIXELS", str(40_000_000)))
+OCR_UPLOAD_MEMORY_BUDGET = int(os.getenv("OCR_UPLOAD_MEMORY_BUDGET", str(OCR_MAX_IMAGE_BYTES + 1024 * 1024)))
+OCR_UPLOAD_MAX_METADATA = 64 * 1024  # JSON outside the image string (e.g. preprocess options)
+
+# Leading bytes of the formats Pillow/Tesseract handle
+IMAGE_SIGNATURES = (
+    b'\x89PNG\r\n\x1a\n', b'\xff\xd8\xff', b'GIF87a', b'GIF89a', b'BM',
+    b'II*\x00', b'MM\x00*', b'RIFF',
+)
+
+IMAGE_KEY_RE = re.compile(rb'"image"\s*:\s*"')
+# JSON string escapes that can appear inside the base64 text, mapped to what they
+# contribute to it: encoders may escape '/' and wrap long strings with \n or \r\n
+BASE64_ESCAPES = {b'/': b'/', b'n': b'', b'r': b'', b't': b''}
+BASE64_CHARS = frozenset(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=')
+HEADER_PROBE_BYTES = 64 * 1024  # enough for PNG IHDR / JPEG SOF behind typical EXIF blocks
+
+
+class UploadTooLarge(Exception):
+    """The payload exceeds the configured size or memory budget (413)."""
+
+
+class InvalidImageUpload(ValueError):
+    """The payload is not a decodable image upload (400)."""
+
+
+# Streams a JSON body of the form {"image": "<base64 or data URL>", ...} and
+# decodes the image string chunk by chunk into one preallocated buffer, so the
+# base64 text is never held in full and the image bytes are never copied again.
+# Everything else in the body is kept (bounded) and parsed as metadata.
+# Payloads that are too large or don't start with an image signature are
+# rejected as soon as that is known, before the rest of the body is read.
+class Base64ImageDecoder:
+    def __init__(self, max_image_bytes: int = OCR_MAX_IMAGE_BYTES, max_pixels: int = OCR_MAX_IMAGE_PIXELS,
+                 memory_budget: int = OCR_UPLOAD_MEMORY_BUDGET, expected_length: Optional[int] = None):
+        self.max_image_bytes = max_image_bytes
+        self.max_pixels = max_pixels
+        self.memory_budget = memory_budget
+        # Base64 expands 3 bytes to 4 characters, so the body length bounds the decoded size
+        if expected_length is not None:
+            if expected_length * 3 // 4 > max_image_bytes + OCR_UPLOAD_MAX_METADATA:
+                raise UploadTooLarge(f"Image exceeds {max_image_bytes} bytes")
+            capacity = min(max_image_bytes, expected_length * 3 // 4)
+        else:
+            capacity = 0
+        self._out = bytearray(capacity)
+        self._length = 0
+        self._state = 'key'  # key -> prefix (optional data URL header) -> data -> suffix
+        self._head = bytearray()  # JSON before the image string
+        self._tail = bytearray()  # JSON after it
+        self._pending = bytearray()  # undecoded base64 (< 4 chars, or a data URL header)
+        self._escape = bytearray()  # a JSON escape split across chunks
+        self._checked_signature = False
+        self._checked_header = False
+        self.peak_bytes = 0
+
+    def _account(self):
+        held = len(self._out) + len(self._head) + len(self._tail) + len(self._pending)
+        self.peak_bytes = max(self.peak_bytes, held)
+        if held > self.memory_budget:
+            raise UploadTooLarge(f"Upload exceeds the {self.memory_budget} byte memory budget")
+
+    def _emit(self, decoded: bytes):
+        end = self._length + len(decoded)
+        if end > self.max_image_bytes:
+            raise UploadTooLarge(f"Image exceeds {self.max_image_bytes} bytes")
+        if end > len(self._out):
+            self._out.extend(bytes(end - len(self._out)))
+        self._out[self._length:end] = decoded
+        self._length = end
+        self._check_early()
+
+    def _check_early(self):
+        if not self._checked_signature and self._length >= 8:
+            self._checked_signature = True
+            if not self._out[:8].startswith(IMAGE_SIGNATURES):
+                raise InvalidImageUpload("Payload is not a supported image format")
+        if not self._checked_header and self._length >= HEADER_PROBE_BYTES:
+            self._check_dimensions()
+
+    # Read the width/height from the header without decoding pixel data
+    def _check_dimensions(self):
+        from PIL import Image
+
+        self._checked_header = True
+        try:
+            with Image.open(io.BytesIO(self._out[:min(self._length, HEADER_PROBE_BYTES)])) as image:
+                width, height = image.size
+        except Exception:
+            return  # header not complete yet or unusual layout; the worker will decide
+        if width * height > self.max_pixels:
+            raise UploadTooLarge(f"Image has {width * height} pixels, limit is {self.max_pixels}")
+
+    # Decode data[start:end], carrying a partial 4-character group over to the next chunk
+    def _decode(self, data: bytes, start: int, end: int):
+        try:
+            if self._pending:
+                take = min(4 - len(self._pending), end - start)
+                self._pending += data[start:start + take]
+                start += take
+                if len(self._pending) < 4:
+                    return
+                self._emit(binascii.a2b_base64(self._pending))
+                self._pending.clear()
+            usable = (end - start) - (end - start) % 4
+            if usable:
+                self._emit(binascii.a2b_base64(memoryview(data)[start:start + usable]))
+            self._pending += data[start + usable:end]
+        except binascii.Error as e:
+            raise InvalidImageUpload(f"Invalid base64 data: {e}")
+
+    # The base64 text a complete escape (backslash included) stands for
+    def _unescape(self, escape: bytes) -> bytes:
+        if escape[1:2] == b'u':
+            try:
+                char = int(escape[2:6], 16)
+            except ValueError:
+                raise InvalidImageUpload(f"Invalid JSON escape {escape.decode('latin-1')!r} in image data")
+            if char in BASE64_CHARS:
+                return bytes([char])
+            if char in b' \t\n\r':
+                return b''
+        elif escape[1:2] in BASE64_ESCAPES:
+            return BASE64_ESCAPES[escape[1:2]]
+        raise InvalidImageUpload(f"Invalid base64 data: unexpected escape {escape.decode('latin-1')!r}")
+
+    def feed(self, data: bytes):
+        pos = 0
+        while pos < len(data):
+            if self._state == 'key':
+                self._head += data[pos:]
+                pos = len(data)
+                match = IMAGE_KEY_RE.search(self._head)
+                if match:
+                    data, pos = bytes(self._head[match.end():]), 0
+                    del self._head[match.end():]
+                    self._state = 'prefix'
+                elif len(self._head) > OCR_UPLOAD_MAX_METADATA:
+                    raise InvalidImageUpload("No image data provided")
+            elif self._state == 'prefix':
+                # Strip a "data:image/...;base64," header if the string has one
+                self._pending += data[pos:]
+                pos = len(data)
+                head = bytes(self._pending[:5])
+                if not b'data:'.startswith(head):
+                    data, pos = bytes(self._pending), 0
+                    self._pending.clear()
+                    self._state = 'data'
+                elif len(head) == 5:
+                    comma = self._pending.find(b',')
+                    if comma >= 0:
+                        data, pos = bytes(self._pending[comma + 1:]), 0
+                        self._pending.clear()
+                        self._state = 'data'
+                    elif len(self._pending) > 256:
+                        raise InvalidImageUpload("Malformed data URL")
+            elif self._state == 'data' and self._escape:
+                # An escape is \x, or \uXXXX; it may be split across chunks
+                size = 6 if self._escape[1:2] == b'u' else 2
+                while pos < len(data) and len(self._escape) < size:
+                    self._escape.append(data[pos])
+                    pos += 1
+                    size = 6 if self._escape[1:2] == b'u' else 2
+                if len(self._escape) == size:
+                    text = self._unescape(bytes(self._escape))
+                    self._escape.clear()
+                    self._decode(text, 0, len(text))
+            elif self._state == 'data':
+                quote = data.find(b'"', pos)
+                end = len(data) if quote < 0 else quote
+                backslash = data.find(b'\\', pos, end)
+                if backslash >= 0:
+                    # Decode up to the escape; the escaped character may be a quote, so search again after it
+                    self._decode(data, pos, backslash)
+                    self._escape.append(data[backslash])
+                    pos = backslash + 1
+                else:
+                    self._decode(data, pos, end)
+                    pos = end
+                    if quote >= 0:
+                        self._state = 'suffix'  # the closing quote stays with the metadata JSON
+            else:
+                self._tail += data[pos:]
+                pos = len(data)
+                if len(self._tail) > OCR_UPLOAD_MAX_METADATA:
+                    raise InvalidImageUpload("Request body has too much non-image data")
+            self._account()
+
+    # Returns (image bytes, the remaining JSON fields)
+    def finish(self) -> Tuple[bytearray, Dict]:
+        if self._state in ('key', 'prefix'):
+            raise InvalidImageUpload("No image data provided")
+        if self._state == 'data':
+            raise InvalidImageUpload("Request body ended inside the image data")
+        if self._pending.strip(b'='):
+            raise InvalidImageUpload("Invalid base64 data: truncated")
+        if self._length == 0:
+            raise InvalidImageUpload("No image data provided")
+        if not self._checked_signature:
+            raise InvalidImageUpload("Payload is not a supported image format")
+        if not self._checked_header:
+            self._check_dimensions()
+        try:
+            metadata = json.loads(bytes(self._head) + bytes(self._tail))
+        except ValueError as e:
+            raise InvalidImageUpload(f"Invalid JSON body: {e}")
+        if not isinstance(metadata, dict):
+            raise InvalidImageUpload("Request body must be a JSON object")
+        metadata.pop('image', None)
+        # Trim the spare capacity in place rather than slicing out a copy
+        del self._out[self._length:]
+        return self._out, metadata
+
+
+async def decode_base64_upload(stream: AsyncIterable[bytes], content_length: Optional[int] = None,
+                               **limits) -> Tuple[bytearray, Dict, int]:
+    decoder = Base64ImageDecoder(expected_length=content_length, **limits)
+    async for chunk in stream:
+        if chunk:
+            decoder.feed(chunk)
+    image_bytes, metadata = decoder.finish()
+    return image_bytes, metadata, decoder.peak_bytes
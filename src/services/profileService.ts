@@ -1,10 +1,26 @@
 import { supabase } from '@/integrations/supabase/client';
 import type { Database } from '@/integrations/supabase/types';
+import { getBackendEndpoint } from '@/config/backend';
 
 type Profile = Database['public']['Tables']['profiles']['Row'];
 type ProfileInsert = Database['public']['Tables']['profiles']['Insert'];
 type ProfileUpdate = Database['public']['Tables']['profiles']['Update'];
 
+// Tell the backend to drop its cached copy of this profile so the next analysis uses the edits.
+// The backend only accepts this with the signed-in user's access token.
+const invalidateBackendProfile = async (userId: string) => {
+  try {
+    const { data: { session } } = await supabase.auth.getSession();
+    if (!session) return;
+    await fetch(getBackendEndpoint(`/profiles/${encodeURIComponent(userId)}/invalidate`), {
+      method: 'POST',
+      headers: { Authorization: `Bearer ${session.access_token}` },
+    });
+  } catch (error) {
+    console.warn('Failed to invalidate backend profile cache:', error);
+  }
+};
+
 export const profileService = {
   async getProfile(userId: string): Promise<Profile | null> {
     console.log('Fetching profile for user:', userId);
@@ -53,6 +69,7 @@ export const profileService = {
       }
 
       console.log('Profile updated:', data);
+      invalidateBackendProfile(profile.user_id);
       return data;
     } else {
       // Create new profile - let Supabase generate the ID
@@ -89,6 +106,7 @@ export const profileService = {
       }
 
       console.log('Profile created:', data);
+      invalidateBackendProfile(profile.user_id);
       return data;
     }
   },
@@ -113,6 +131,7 @@ export const profileService = {
     }
 
     console.log('Profile updated:', data);
+    invalidateBackendProfile(userId);
     return data;
   },
 